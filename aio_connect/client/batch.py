@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Deque,
+    Generic,
+    Iterable,
+    Optional,
+    TypeVar,
+    Union,
+)
+
+from ..enums import RequestPriority
+from ..methods import ConnectMethod
+from ..utils.bounded import iterate
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+T = TypeVar("T")
+
+MethodsSource = Union[Iterable[ConnectMethod[Any]], AsyncIterable[ConnectMethod[Any]]]
+
+DEFAULT_BATCH_CONCURRENCY = 10
+
+
+@dataclass(frozen=True)
+class BatchResult(Generic[T]):
+    index: int
+    """Position of the method in the batch"""
+    method: ConnectMethod[T]
+    result: Optional[T] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def _execute(
+    bot: Bot,
+    index: int,
+    method: ConnectMethod[Any],
+    request_timeout: Optional[int],
+    priority: Optional[RequestPriority],
+) -> BatchResult[Any]:
+    try:
+        result = await bot(method, request_timeout=request_timeout, priority=priority)
+    except Exception as e:
+        return BatchResult(index=index, method=method, error=e)
+    return BatchResult(index=index, method=method, result=result)
+
+
+async def stream_batch(
+    bot: Bot,
+    methods: MethodsSource,
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    ordered: bool = False,
+    request_timeout: Optional[int] = None,
+    priority: Optional[RequestPriority] = None,
+) -> AsyncIterator[BatchResult[Any]]:
+    """
+    Execute methods with sliding window of concurrent requests
+
+    Failed method does not cancel the rest of the batch, its error is returned in the result.
+    In ordered mode the window also bounds the number of results waiting for slower predecessors.
+    Requests inherit priority of the caller unless :code:`priority` is given.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be positive")
+    source = iterate(methods)
+    window: Deque[asyncio.Task[BatchResult[Any]]] = deque()
+    index = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(window) < concurrency:
+                try:
+                    method = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                window.append(asyncio.ensure_future(_execute(bot, index, method, request_timeout, priority)))
+                index += 1
+            if not window:
+                return
+            if ordered:
+                yield await window.popleft()
+            else:
+                done, _ = await asyncio.wait(window, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=window.index):
+                    window.remove(task)
+                    yield task.result()
+    finally:
+        for task in window:
+            task.cancel()
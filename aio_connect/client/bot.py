@@ -1,20 +1,27 @@
 from __future__ import annotations
 
+import aiofiles
+import aiofiles.os
 import aiohttp
+from aiohttp.hdrs import AUTHORIZATION
 
 import pathlib
 from contextlib import asynccontextmanager
 from typing import (
     Any,
+    AsyncGenerator,
     AsyncIterator,
     List,
     Optional,
     TypeVar,
     Union,
     Dict,
-    Literal
+    Literal,
+    cast,
 )
 
+from .. import loggers
+from ..enums import RequestPriority
 from ..methods import (
     ConnectMethod,
     # 4.2.1 Команды к механизму трансляции
@@ -64,8 +71,12 @@ from ..types import (
     # 4.3.2. Структуры данных для ботов
     Button,
 )
+from ..types.input_file import DEFAULT_CHUNK_SIZE
+from .cache.base import BaseCache
+from .batch import DEFAULT_BATCH_CONCURRENCY, BatchResult, MethodsSource, stream_batch
 from .session.aiohttp import AiohttpSession
-from .session.base import BaseSession
+from .session.base import BaseSession, _get_result_adapter
+from .session.priority import request_priority
 
 T = TypeVar("T")
 
@@ -79,6 +90,7 @@ class Bot:
         base: str,
 
         session: Optional[BaseSession] = None,
+        cache: Optional[BaseCache] = None,
     ) -> None:
         """
         Bot class
@@ -87,6 +99,8 @@ class Bot:
         :param api_password:
         :param line_id:
         :param base: API server
+        :param session: HTTP Client session
+        :param cache: Cache for results of read-only methods
         """
 
         if api_login and api_password:
@@ -100,6 +114,7 @@ class Bot:
         self.line_id = line_id
         self.base = base
         self.session = session
+        self.cache = cache
 
     @asynccontextmanager
     async def context(self, auto_close: bool = True) -> AsyncIterator[Bot]:
@@ -114,50 +129,176 @@ class Bot:
         finally:
             if auto_close:
                 await self.session.close()
+                if self.cache is not None:
+                    await self.cache.close()
 
     async def __call__(
         self,
         method: ConnectMethod[T],
-        type_request: Literal["POST", "GET", "DELETE", "PUT", "POST-With-Attach"],
-        path: str,
-        request_timeout: Optional[int] = None
+        type_request: Optional[Literal["POST", "GET", "DELETE", "PUT", "POST-With-Attach"]] = None,
+        path: Optional[str] = None,
+        request_timeout: Optional[int] = None,
+        priority: Optional[RequestPriority] = None,
     ) -> T:
         """
         Call API method
 
         :param method:
-        :param type_request: тип запроса
-        :param path: URL после обращения к API
+        :param type_request: тип запроса, по умолчанию :code:`method.__type_request__`
+        :param path: URL после обращения к API, по умолчанию :code:`method.api_path`
+        :param priority: Priority of the request (see :class:`PriorityLanes`),
+            same as :func:`request_priority` around the call
         :return:
         """
+        if priority is not None:
+            with request_priority(priority):
+                return await self(method, type_request=type_request, path=path, request_timeout=request_timeout)
+        if type_request is None:
+            type_request = method.__type_request__
+        if path is None:
+            path = method.api_path
+        if self.cache is not None and type_request == "GET":
+            ttl = self.cache.resolve_ttl(method)
+            if ttl > 0:
+                key = self.cache.build_key(method, path)
+                adapter = _get_result_adapter(type(method))
+                data = await self.cache.get(key)
+                if data is not None:
+                    # Objects are built for each call, so the caller can't change the cached result
+                    return cast(T, adapter.validate_python(data, context={"bot": self}))
+                result = await self.session(self, method, timeout=request_timeout,
+                                            type_request=type_request, path=path)
+                if result is not None:
+                    await self.cache.set(key, adapter.dump_python(result), ttl)
+                return result
         return await self.session(self, method, timeout=request_timeout, type_request=type_request, path=path)
 
+    async def warm_up(self, connections: int = 1, keepalive: bool = True) -> None:
+        """
+        Resolve API server and open connections in advance,
+        so the first calls from handlers do not wait for DNS, TCP and TLS handshakes
+
+        :param connections: Number of pooled connections to open
+        :param keepalive: Keep connections alive while the bot is idle
+        """
+        await self.session.warm_up(self.base, connections=connections, keepalive=keepalive)
+
+    async def stream_results(
+        self,
+        methods: MethodsSource,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        ordered: bool = False,
+        request_timeout: Optional[int] = None,
+        priority: Optional[RequestPriority] = None,
+    ) -> AsyncIterator[BatchResult[Any]]:
+        """
+        Execute batch of methods and yield results as soon as they are ready
+
+        Methods are taken from the source lazily, no more than :code:`concurrency` requests are in flight.
+        Errors do not cancel the batch, they are returned in :attr:`BatchResult.error`.
+
+        :param methods: Methods or async iterable of methods
+        :param concurrency: Number of simultaneous requests
+        :param ordered: Yield results in order of methods
+        :param request_timeout: Request timeout
+        :param priority: Priority of requests (see :class:`PriorityLanes`), by default priority of the caller
+        """
+        async for result in stream_batch(
+            self,
+            methods,
+            concurrency=concurrency,
+            ordered=ordered,
+            request_timeout=request_timeout,
+            priority=priority,
+        ):
+            yield result
+
+    async def execute_many(
+        self,
+        methods: MethodsSource,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        request_timeout: Optional[int] = None,
+        priority: Optional[RequestPriority] = None,
+    ) -> List[BatchResult[Any]]:
+        """
+        Execute batch of methods, see :meth:`stream_results`
+
+        :return: Results in order of methods
+        """
+        results = [
+            result
+            async for result in self.stream_results(
+                methods, concurrency=concurrency, request_timeout=request_timeout, priority=priority
+            )
+        ]
+        results.sort(key=lambda result: result.index)
+        return results
+
+    async def stream_file(
+        self,
+        file_path: str,
+        timeout: int = 30,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        offset: int = 0,
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Stream file by file_path chunk by chunk, e.g. for piping attachment to another service.
+
+        :param file_path: Ссылка на скачивание
+        :param timeout: Total timeout in seconds, defaults to 30
+        :param chunk_size: Size of chunks
+        :param offset: Start streaming from this byte
+        """
+        headers = {AUTHORIZATION: self.auth.encode()}
+        async for chunk in self.session.stream_content(
+            url=file_path,
+            headers=headers,
+            timeout=timeout,
+            chunk_size=chunk_size,
+            raise_for_status=True,
+            offset=offset,
+        ):
+            yield chunk
+
     async def download_file(
         self,
         file_path: str,
         destination: Union[pathlib.Path, str],
         timeout: int = 30,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        resume: bool = True,
     ) -> bool:
         """
         Download file by file_path to destination.
 
+        File is streamed to "<destination>.part" and renamed to destination when it is complete,
+        so memory usage doesn't depend on the file size and destination never contains a partial file.
+
         :param file_path: Ссылка на скачивание
         :param destination: Путь и (или) имя файла
         :param timeout: Total timeout in seconds, defaults to 30
+        :param chunk_size: Size of chunks
+        :param resume: Continue interrupted download from "<destination>.part"
         """
+        partial_path = f"{destination}.part"
+        offset = 0
+        if resume and await aiofiles.os.path.exists(partial_path):
+            offset = await aiofiles.os.path.getsize(partial_path)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                    auth=self.auth, url=file_path, timeout=timeout if timeout is None else timeout
-            ) as resp:
-                if resp.status == 200:
-                    content = await resp.read()
-                    with open(destination, 'wb') as file:
-                        file.write(content)
-                    return True
-                else:
-                    print(f'Ошибка скачивания файла. Код статуса: {resp.status}')
-        return False
+        try:
+            async with aiofiles.open(partial_path, "ab" if offset else "wb") as file:
+                async for chunk in self.stream_file(
+                    file_path=file_path, timeout=timeout, chunk_size=chunk_size, offset=offset
+                ):
+                    await file.write(chunk)
+        except aiohttp.ClientResponseError as e:
+            loggers.client.error("Ошибка скачивания файла. Код статуса: %s", e.status)
+            if not offset:
+                await aiofiles.os.remove(partial_path)
+            return False
+
+        await aiofiles.os.replace(partial_path, destination)
+        return True
 
     """
     4.2.1 Команды к механизму трансляции
@@ -191,8 +332,7 @@ class Bot:
             type=type,
             id=is_valid_uuid(id),
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST", path="/v1/hook/")
+        return await self(call, request_timeout=request_timeout)
 
     async def del_all_hook(
         self,
@@ -208,8 +348,7 @@ class Bot:
         """
 
         call = DelAllHook()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="DELETE", path="/v1/hook/")
+        return await self(call, request_timeout=request_timeout)
 
     async def del_hook(
         self,
@@ -228,9 +367,8 @@ class Bot:
         :return: Нет тела
         """
 
-        call = DelHook()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="DELETE", path=f"/v1/hook/{type}/{is_valid_uuid(id)}/")
+        call = DelHook(id=is_valid_uuid(id), type=type)
+        return await self(call, request_timeout=request_timeout)
 
     """
     4.2.3 Команды для уточнения информации
@@ -243,7 +381,7 @@ class Bot:
         line_id: Optional[UUID] = None,
         user_id: Optional[UUID] = None,
         request_timeout: Optional[int] = None,
-    ) -> Treatments:
+    ) -> List[Treatments]:
         """
         Метод возвращает список открытых обращений.
         Принимает два необязательных параметра line_id и user_id.
@@ -260,8 +398,7 @@ class Bot:
             line_id=is_valid_uuid(line_id),
             user_id=is_valid_uuid(user_id)
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path="/v1/line/treatment/")
+        return await self(call, request_timeout=request_timeout)
 
     async def get_subscriber(
         self,
@@ -278,14 +415,13 @@ class Bot:
         :return: Return :code:`User`.
         """
 
-        call = GetSubscriber()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path=f"/v1/line/subscriber/{is_valid_uuid(user_id)}/")
+        call = GetSubscriber(user_id=is_valid_uuid(user_id))
+        return await self(call, request_timeout=request_timeout)
 
     async def get_subscribers(
         self,
         request_timeout: Optional[int] = None,
-    ) -> Users:
+    ) -> List[Users]:
         """
         Метод возвращает информацию о пользователях
 
@@ -296,8 +432,7 @@ class Bot:
         """
 
         call = GetSubscribers()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path="/v1/line/subscribers/")
+        return await self(call, request_timeout=request_timeout)
 
     async def get_subscriptions(
         self,
@@ -305,7 +440,7 @@ class Bot:
         client_id: Optional[UUID] = None,
         line_id: Optional[UUID] = None,
         request_timeout: Optional[int] = None,
-    ) -> Subscriptions:
+    ) -> List[Subscriptions]:
         """
         Метод возвращает информацию о получаемым линиям пользователями,
         с возможностью отфильтровать по пользователю, линии или клиенту.
@@ -324,13 +459,12 @@ class Bot:
             client_id=is_valid_uuid(client_id),
             line_id=is_valid_uuid(line_id)
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path="/v1/line/subscriptions/")
+        return await self(call, request_timeout=request_timeout)
 
     async def get_lines(
         self,
         request_timeout: Optional[int] = None,
-    ) -> Lines:
+    ) -> List[Lines]:
         """
         Метод возвращает список линий поддержки.
 
@@ -341,8 +475,7 @@ class Bot:
         """
 
         call = GetLines()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path="/v1/line/")
+        return await self(call, request_timeout=request_timeout)
 
     async def get_specialist(
         self,
@@ -359,14 +492,13 @@ class Bot:
         :return: Return :code:`User`.
         """
 
-        call = GetSpecialist()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path=f"/v1/line/specialist/{is_valid_uuid(user_id)}/")
+        call = GetSpecialist(user_id=is_valid_uuid(user_id))
+        return await self(call, request_timeout=request_timeout)
 
     async def get_specialists(
         self,
         request_timeout: Optional[int] = None,
-    ) -> Users:
+    ) -> List[Users]:
         """
         Метод возвращает информацию о специалистах
 
@@ -377,8 +509,7 @@ class Bot:
         """
 
         call = GetSpecialists()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path="/v1/line/specialists/")
+        return await self(call, request_timeout=request_timeout)
 
     async def get_specialists_available(
         self,
@@ -396,16 +527,15 @@ class Bot:
         :return: Return :code:`Array[UUID]`.
         """
 
-        call = GetSpecialistsAvailable()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path=f"/v1/line/specialists/{is_valid_uuid(line_id)}/available/")
+        call = GetSpecialistsAvailable(line_id=is_valid_uuid(line_id))
+        return await self(call, request_timeout=request_timeout)
 
     async def get_competences(
         self,
         user_id: Optional[UUID] = None,
         line_id: Optional[UUID] = None,
         request_timeout: Optional[int] = None,
-    ) -> Competences:
+    ) -> List[Competences]:
         """
         Метод возвращает список компетенций специалистов, с возможностью отфильтровать по специалисту и линии.
 
@@ -421,8 +551,7 @@ class Bot:
             user_id=is_valid_uuid(user_id),
             line_id=is_valid_uuid(line_id),
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path="/v1/line/competences/")
+        return await self(call, request_timeout=request_timeout)
 
     async def get_ticket(
         self,
@@ -439,9 +568,8 @@ class Bot:
         :return: Return :code:`TicketShort`.
         """
 
-        call = GetTicket()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path=f"/v1/ticket/{is_valid_uuid(id)}/")
+        call = GetTicket(id=is_valid_uuid(id))
+        return await self(call, request_timeout=request_timeout)
 
     async def get_ticket_by_number(
         self,
@@ -458,9 +586,8 @@ class Bot:
         :return: Return :code:`TicketShort`.
         """
 
-        call = GetTicketByNumber()
-        return await self(call, request_timeout=request_timeout,
-                          type_request="GET", path=f"/v1/ticket/number/{number}/")
+        call = GetTicketByNumber(number=number)
+        return await self(call, request_timeout=request_timeout)
 
     """
     4.3.1. Команды внешних ботов
@@ -489,8 +616,7 @@ class Bot:
             line_id=is_valid_uuid(line_id),
             user_id=is_valid_uuid(user_id),
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST", path="/v1/line/appoint/start/")
+        return await self(call, request_timeout=request_timeout)
 
     async def appoint_spec(
         self,
@@ -519,8 +645,7 @@ class Bot:
             spec_id=is_valid_uuid(spec_id),
             author_id=is_valid_uuid(author_id),
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST", path="/v1/line/appoint/spec/")
+        return await self(call, request_timeout=request_timeout)
 
     async def drop_treatment(
         self,
@@ -546,8 +671,7 @@ class Bot:
             user_id=is_valid_uuid(user_id),
             author_id=is_valid_uuid(author_id),
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST", path="/v1/line/drop/treatment/")
+        return await self(call, request_timeout=request_timeout)
 
     async def send_message_line(
         self,
@@ -592,8 +716,7 @@ class Bot:
             notification_only=notification_only,
             keyboard=keyboard
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST", path="/v1/line/send/message/")
+        return await self(call, request_timeout=request_timeout)
 
     async def send_file_line(
         self,
@@ -644,8 +767,7 @@ class Bot:
             keyboard=keyboard,
             file=file
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST-With-Attach", path="/v1/line/send/file/")
+        return await self(call, request_timeout=request_timeout)
 
     async def send_image_line(
         self,
@@ -696,8 +818,7 @@ class Bot:
             keyboard=keyboard,
             file=file
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST-With-Attach", path="/v1/line/send/image/")
+        return await self(call, request_timeout=request_timeout)
 
     async def drop_keyboard(
         self,
@@ -720,8 +841,7 @@ class Bot:
             line_id=is_valid_uuid(line_id),
             user_id=is_valid_uuid(user_id)
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST", path="/v1/line/drop/keyboard/")
+        return await self(call, request_timeout=request_timeout)
 
     async def send_message_colleague(
         self,
@@ -747,8 +867,7 @@ class Bot:
             author_id=is_valid_uuid(author_id),
             text=text,
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST", path="/v1/colleague/send/message/")
+        return await self(call, request_timeout=request_timeout)
 
     async def send_file_collegue(
         self,
@@ -780,8 +899,7 @@ class Bot:
             comment=comment,
             file=file
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST-With-Attach", path="/v1/colleague/send/file/")
+        return await self(call, request_timeout=request_timeout)
 
     async def send_image_collegue(
         self,
@@ -813,8 +931,7 @@ class Bot:
             comment=comment,
             file=file
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST-With-Attach", path="/v1/colleague/send/image/")
+        return await self(call, request_timeout=request_timeout)
 
     async def send_message_conference(
         self,
@@ -840,8 +957,7 @@ class Bot:
             author_id=is_valid_uuid(author_id),
             text=text,
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST", path="/v1/conference/send/message/")
+        return await self(call, request_timeout=request_timeout)
 
     async def send_file_conference(
         self,
@@ -873,8 +989,7 @@ class Bot:
             comment=comment,
             file=file
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST-With-Attach", path="/v1/conference/send/file/")
+        return await self(call, request_timeout=request_timeout)
 
     async def send_image_conference(
         self,
@@ -906,8 +1021,7 @@ class Bot:
             comment=comment,
             file=file
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST-With-Attach", path="/v1/conference/send/image/")
+        return await self(call, request_timeout=request_timeout)
 
     async def question_and_answering(
         self,
@@ -936,8 +1050,7 @@ class Bot:
             skip_greetings=skip_greetings,
             skip_goodbyes=skip_goodbyes,
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="POST", path="/v1/line/qna/")
+        return await self(call, request_timeout=request_timeout)
 
     async def question_and_answering_selected(
         self,
@@ -960,5 +1073,4 @@ class Bot:
             request_id=is_valid_uuid(request_id),
             result_id=is_valid_uuid(result_id),
         )
-        return await self(call, request_timeout=request_timeout,
-                          type_request="PUT", path="/v1/line/qna/selected/")
+        return await self(call, request_timeout=request_timeout)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple, Type
+
+from ...methods import (
+    ConnectMethod,
+    GetCompetences,
+    GetLines,
+    GetSpecialist,
+    GetSpecialists,
+    GetSubscriber,
+    GetSubscriptions,
+)
+
+DEFAULT_CACHE_TTL: Dict[Type[ConnectMethod[Any]], float] = {
+    GetLines: 300.0,
+    GetSpecialists: 300.0,
+    GetSpecialist: 300.0,
+    GetSubscriber: 300.0,
+    GetCompetences: 300.0,
+    GetSubscriptions: 300.0,
+}
+"""Read-only methods which are cached by default and their TTL, seconds"""
+
+
+@dataclass(frozen=True)
+class CacheKey:
+    method: str
+    path: str
+    params: Tuple[Tuple[str, Any], ...] = ()
+
+    def matches(self, params: Optional[Mapping[str, Any]] = None) -> bool:
+        """
+        Check whether the result may contain data of the given parameters:
+        each of them is either not set in the request or has the same value
+        """
+        if not params:
+            return True
+        own = dict(self.params)
+        return all(
+            name not in own or str(own[name]).lower() == str(value).lower() for name, value in params.items()
+        )
+
+
+class BaseCache(ABC):
+    """
+    Base class for all response caches
+
+    Results are stored as plain data (dicts and lists) and validated again on every hit,
+    so each caller gets its own objects and can't change the cached result.
+    """
+
+    def __init__(self, ttl: Optional[Mapping[Type[ConnectMethod[Any]], float]] = None) -> None:
+        """
+
+        :param ttl: TTL for methods, seconds. Merged with :obj:`DEFAULT_CACHE_TTL`,
+            use 0 to disable caching of a method
+        """
+        self.ttl: Dict[Type[ConnectMethod[Any]], float] = {**DEFAULT_CACHE_TTL, **(ttl or {})}
+
+    def resolve_ttl(self, method: ConnectMethod[Any]) -> float:
+        """
+        Get TTL for method, 0 means method is not cached
+        """
+        return self.ttl.get(type(method), 0.0)
+
+    @classmethod
+    def build_key(cls, method: ConnectMethod[Any], path: str) -> CacheKey:
+        params = method.model_dump(exclude_none=True)
+        return CacheKey(method=type(method).__name__, path=path, params=tuple(sorted(params.items())))
+
+    @abstractmethod
+    async def get(self, key: CacheKey) -> Optional[Any]:
+        """
+        Get cached result
+
+        :param key: cache key
+        :return: plain data of the result or None if there is no actual entry
+        """
+        pass
+
+    @abstractmethod
+    async def set(self, key: CacheKey, value: Any, ttl: float) -> None:
+        """
+        Store result
+
+        :param key: cache key
+        :param value: plain data of the result
+        :param ttl: time to live, seconds
+        """
+        pass
+
+    @abstractmethod
+    async def invalidate(self, method: str, params: Optional[Mapping[str, Any]] = None) -> None:
+        """
+        Drop entries of the method
+
+        :param method: method name (:code:`CacheKey.method`)
+        :param params: Drop only entries which may contain data of these parameters
+            (see :meth:`CacheKey.matches`), all entries of the method by default
+        """
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:  # pragma: no cover
+        """
+        Close cache (database connection, file or etc.)
+        """
+        pass
@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from typing import Any, Mapping, Optional, Tuple, Type
+
+from .base import BaseCache, CacheKey
+from ...methods import ConnectMethod
+
+
+class MemoryCache(BaseCache):
+    """
+    In-memory LRU cache with TTL, entries are lost on shutdown
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[Mapping[Type[ConnectMethod[Any]], float]] = None,
+    ) -> None:
+        """
+
+        :param maxsize: Maximum number of entries, least recently used are evicted first
+        :param ttl: TTL for methods, seconds
+        """
+        super().__init__(ttl=ttl)
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: CacheKey) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: CacheKey, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def invalidate(self, method: str, params: Optional[Mapping[str, Any]] = None) -> None:
+        for key in [key for key in self._entries if key.method == method and key.matches(params)]:
+            del self._entries[key]
+
+    async def close(self) -> None:
+        self._entries.clear()
@@ -8,10 +8,13 @@ if TYPE_CHECKING:
 
 
 class BotContextController(BaseModel):
-    _bot: Optional["Bot"] = PrivateAttr()
+    _bot: Optional["Bot"] = PrivateAttr(default=None)
 
     def model_post_init(self, __context: Any) -> None:
-        self._bot = __context.get("bot") if __context else None
+        if __context:
+            # Private attribute is set directly, regular assignment costs
+            # more than validation of a small object
+            self.__pydantic_private__["_bot"] = __context.get("bot")
 
     def as_(self, bot: Optional["Bot"]) -> Self:
         """
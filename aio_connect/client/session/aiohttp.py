@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import ssl
+import time
+from functools import lru_cache
+from http import HTTPStatus
 from typing import (
     TYPE_CHECKING,
     Any,
     AsyncGenerator,
     Dict,
+    FrozenSet,
     Iterable,
     List,
+    NamedTuple,
     Optional,
     Tuple,
     Type,
@@ -16,15 +21,26 @@ from typing import (
     cast,
 )
 
-from aiohttp import BasicAuth, ClientError, ClientSession, FormData, TCPConnector
-from aiohttp.hdrs import USER_AGENT
+from aiohttp import (
+    BasicAuth,
+    ClientConnectorError,
+    ClientError,
+    ClientSession,
+    ClientTimeout,
+    FormData,
+    TCPConnector,
+)
+from aiohttp.abc import AbstractStreamWriter
+from aiohttp.hdrs import CONTENT_LENGTH, CONTENT_TYPE, RANGE, RETRY_AFTER, USER_AGENT
 from aiohttp.http import SERVER_SOFTWARE
+from aiohttp.payload import Payload
 
-from .base import BaseSession
+from .base import BaseSession, parse_retry_after
+from ... import loggers
 from ...methods import ConnectMethod
-from ...methods.base import ConnectType
+from ...methods.base import ConnectType, get_path_fields
 from ...types import InputFile
-from ...exceptions import ConnectNetworkError
+from ...exceptions import ConnectConnectionError, ConnectNetworkError
 
 if TYPE_CHECKING:
     from ..bot import Bot
@@ -78,14 +94,99 @@ def _prepare_connector(chain_or_plain: _ProxyType) -> Tuple[Type["TCPConnector"]
     return ChainProxyConnector, {"proxy_infos": infos}
 
 
+_HTTP_METHODS: Dict[str, str] = {
+    "GET": "GET",
+    "DELETE": "DELETE",
+    "POST": "POST",
+    "PUT": "PUT",
+    "POST-With-Attach": "POST",
+}
+
+
+class _RequestPlan(NamedTuple):
+    has_fields: bool
+    """Method has fields besides path parameters"""
+    exclude: Optional[FrozenSet[str]]
+    """Path parameters, they are not sent in query or body"""
+
+
+@lru_cache(maxsize=None)
+def _get_request_plan(method_type: Type[ConnectMethod[Any]]) -> _RequestPlan:
+    """
+    Resolve encoding plan once per method class
+    """
+    path_fields = get_path_fields(method_type)
+    return _RequestPlan(
+        has_fields=bool(method_type.model_fields.keys() - path_fields),
+        exclude=path_fields or None,
+    )
+
+
+class InputFilePayload(Payload):
+    """
+    Upload payload of :class:`InputFile`
+
+    Chunks produced by the file are written to the connection as is,
+    size of the file (when it is known) lets aiohttp send the body without chunked encoding.
+    """
+
+    def __init__(self, value: InputFile, bot: Bot, **kwargs: Any) -> None:
+        super().__init__(value, filename=value.filename, **kwargs)
+        self._bot = bot
+        self._size = value.size
+
+    async def write(self, writer: AbstractStreamWriter) -> None:
+        async for chunk in self._value.read(self._bot):
+            await writer.write(chunk)
+
+
+DEFAULT_CONNECTION_LIMIT = 100
+DEFAULT_KEEPALIVE_TIMEOUT = 15.0
+DEFAULT_DNS_CACHE_TTL = 300
+
+
 class AiohttpSession(BaseSession):
-    def __init__(self, proxy: Optional[_ProxyType] = None, **kwargs: Any) -> None:
+    def __init__(
+        self,
+        proxy: Optional[_ProxyType] = None,
+        limit: int = DEFAULT_CONNECTION_LIMIT,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache: Optional[int] = DEFAULT_DNS_CACHE_TTL,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        force_close: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        """
+
+        :param proxy: Proxy URL, (URL, BasicAuth) pair or chain of them
+        :param limit: Total number of simultaneous connections in the pool (0 - unlimited)
+        :param limit_per_host: Number of simultaneous connections to one host (0 - unlimited)
+        :param keepalive_timeout: Idle timeout of a pooled connection, ignored when force_close is set
+        :param ttl_dns_cache: Lifetime of resolved DNS entries in seconds (None - cache forever)
+        :param ssl_context: SSL context shared by all connections of the session
+        :param force_close: Close underlying connection after each request
+        """
         super().__init__(**kwargs)
 
         self._session: Optional[ClientSession] = None
         self._connector_type: Type[TCPConnector] = TCPConnector
+        self._connector_options: Dict[str, Any] = {
+            "limit": limit,
+            "limit_per_host": limit_per_host,
+            "ttl_dns_cache": ttl_dns_cache,
+            "ssl": ssl_context or ssl.create_default_context(),
+            "force_close": force_close,
+        }
+        if not force_close:
+            # aiohttp refuses keepalive_timeout together with force_close
+            self._connector_options["keepalive_timeout"] = keepalive_timeout
+        self._connector_init: Dict[str, Any] = dict(self._connector_options)
         self._should_reset_connector = True  # flag determines connector state
         self._proxy: Optional[_ProxyType] = None
+        self._keepalive_timeout = None if force_close else keepalive_timeout
+        self._keepalive_tasks: Dict[str, asyncio.Task[None]] = {}
+        self._last_activity = 0.0
 
         if proxy is not None:
             try:
@@ -97,6 +198,8 @@ class AiohttpSession(BaseSession):
                 ) from exc
 
     def _setup_proxy_connector(self, proxy: _ProxyType) -> None:
+        self._connector_type, proxy_init = _prepare_connector(proxy)
+        self._connector_init = {**self._connector_options, **proxy_init}
         self._proxy = proxy
 
     @property
@@ -110,10 +213,12 @@ class AiohttpSession(BaseSession):
 
     async def create_session(self) -> ClientSession:
         if self._should_reset_connector:
-            await self.close()
+            await self._close_session()
 
         if self._session is None or self._session.closed:
             self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                json_serialize=self.json_dumps,
                 headers={
                     USER_AGENT: f"{SERVER_SOFTWARE}",
                 },
@@ -123,6 +228,12 @@ class AiohttpSession(BaseSession):
         return self._session
 
     async def close(self) -> None:
+        for task in self._keepalive_tasks.values():
+            task.cancel()
+        self._keepalive_tasks.clear()
+        await self._close_session()
+
+    async def _close_session(self) -> None:
         if self._session is not None and not self._session.closed:
             await self._session.close()
 
@@ -138,58 +249,67 @@ class AiohttpSession(BaseSession):
         for key, value in method.model_dump(warnings=False, exclude_none=True).items():
             value = self.prepare_value(value, bot=bot, files=files)
             new_json.update({key: value})
-        form.add_field('meta', json.dumps(new_json), content_type='application/json')
+        form.add_field('meta', self.json_dumps(new_json), content_type='application/json')
 
         for key, value in files.items():
-            form.add_field("file", value.read(bot), filename=value.filename or key)
+            form.add_field("file", InputFilePayload(value, bot=bot), filename=value.filename or key)
         return form
 
+    def build_request_kwargs(
+        self, bot: Bot, method: ConnectMethod[ConnectType], type_request: str
+    ) -> Dict[str, Any]:
+        """
+        Encode method for the given request type
+
+        Method is serialized only once and multipart body is built only for "POST-With-Attach"
+        """
+        if type_request == "POST-With-Attach":
+            return {"data": self.build_form_data(bot=bot, method=method)}
+        plan = _get_request_plan(type(method))
+        if type_request in ("GET", "DELETE"):
+            if not plan.has_fields and not method.model_extra:
+                return {}
+            return {"params": method.model_dump(exclude_none=True, exclude=plan.exclude)}
+        return {
+            "data": self.json_dumpb(method.model_dump(exclude=plan.exclude)),
+            "headers": {CONTENT_TYPE: "application/json"},
+        }
+
     async def make_request(
         self, bot: Bot, method: ConnectMethod[ConnectType], type_request: str, path: str, timeout: Optional[int] = None
     ) -> ConnectType:
+        try:
+            http_method = _HTTP_METHODS[type_request]
+        except KeyError:
+            raise ValueError(f"Unsupported request type: {type_request!r}")
+
         session = await self.create_session()
 
         url = bot.base + path
-        form = self.build_form_data(bot=bot, method=method)
-        json_data = method.model_dump()
+        self._last_activity = time.monotonic()
+        request_kwargs = self.build_request_kwargs(bot=bot, method=method, type_request=type_request)
 
         try:
-            if type_request == "POST-With-Attach":
-                async with session.post(
-                    auth=bot.auth, url=url, data=form,
-                        timeout=self.timeout if timeout is None else timeout
-                ) as resp:
-                    raw_result = await resp.text()
-            if type_request == "POST":
-                async with session.post(
-                    auth=bot.auth, url=url, json=json_data,
-                        timeout=self.timeout if timeout is None else timeout
-                ) as resp:
-                    raw_result = await resp.text()
-            elif type_request == "DELETE":
-                async with session.delete(
-                    auth=bot.auth, url=url, params=method.model_dump(exclude_none=True),
-                        timeout=self.timeout if timeout is None else timeout
-                ) as resp:
-                    raw_result = await resp.text()
-            elif type_request == "GET":
-                async with session.get(
-                    auth=bot.auth, url=url, params=method.model_dump(exclude_none=True),
-                        timeout=self.timeout if timeout is None else timeout
-                ) as resp:
-                    raw_result = await resp.text()
-            elif type_request == "PUT":
-                async with session.put(
-                    auth=bot.auth, url=url, json=json_data,
-                        timeout=self.timeout if timeout is None else timeout
-                ) as resp:
-                    raw_result = await resp.text()
+            async with self.request_slot(), session.request(
+                http_method, url, auth=bot.auth,
+                timeout=self.timeout if timeout is None else timeout,
+                **request_kwargs,
+            ) as resp:
+                raw_result = await resp.read()
         except asyncio.TimeoutError:
             raise ConnectNetworkError(method=method, message="Request timeout error")
+        except ClientConnectorError as e:
+            raise ConnectConnectionError(method=method, message=f"{type(e).__name__}: {e}")
         except ClientError as e:
             raise ConnectNetworkError(method=method, message=f"{type(e).__name__}: {e}")
+        if self.metrics is not None:
+            self.metrics.transferred(
+                type(method).__name__, path,
+                sent=int(resp.request_info.headers.get(CONTENT_LENGTH, 0)), received=len(raw_result),
+            )
         response = self.check_response(
-            bot=bot, method=method, status_code=resp.status, content=raw_result
+            bot=bot, method=method, status_code=resp.status, content=raw_result,
+            retry_after=parse_retry_after(resp.headers.get(RETRY_AFTER)),
         )
         return cast(ConnectType, response.result)
 
@@ -200,18 +320,87 @@ class AiohttpSession(BaseSession):
         timeout: int = 30,
         chunk_size: int = 65536,
         raise_for_status: bool = True,
+        offset: int = 0,
     ) -> AsyncGenerator[bytes, None]:
         if headers is None:
             headers = {}
+        if offset:
+            headers = {**headers, RANGE: f"bytes={offset}-"}
 
         session = await self.create_session()
+        self._last_activity = time.monotonic()
+
+        async with self.request_slot(), session.get(url, timeout=timeout, headers=headers) as resp:
+            if offset and resp.status == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                # Everything before the offset is all the content
+                return
+            if raise_for_status:
+                resp.raise_for_status()
 
-        async with session.get(
-            url, timeout=timeout, headers=headers, raise_for_status=raise_for_status
-        ) as resp:
+            # Server may ignore Range header and send the whole content
+            skip = offset if resp.status != HTTPStatus.PARTIAL_CONTENT else 0
             async for chunk in resp.content.iter_chunked(chunk_size):
+                if skip:
+                    if len(chunk) <= skip:
+                        skip -= len(chunk)
+                        continue
+                    chunk, skip = chunk[skip:], 0
                 yield chunk
 
+    async def warm_up(self, url: str, connections: int = 1, keepalive: bool = True) -> None:
+        """
+        Resolve host and open pooled connections before the first call
+
+        Connections are opened by concurrent OPTIONS requests, so each of them gets own connection
+        which is returned to the pool afterward. When keepalive is set, the same requests are repeated
+        while the session is idle, so pooled connections are not closed by keepalive_timeout.
+
+        :param url: Any URL of API server, usually :code:`bot.base`
+        :param connections: Number of connections to open
+        :param keepalive: Keep connections alive while the session is idle
+        """
+        await self._ping(url, connections)
+        if keepalive and self._keepalive_timeout and url not in self._keepalive_tasks:
+            task = asyncio.create_task(self._keep_alive(url, connections, self._keepalive_timeout * 0.8))
+            self._keepalive_tasks[url] = task
+            task.add_done_callback(lambda t: self._keepalive_tasks.pop(url, None))
+
+    async def _ping(self, url: str, connections: int) -> None:
+        session = await self.create_session()
+
+        async def ping() -> None:
+            # aiohttp does not return connection to the pool after HEAD response, OPTIONS is used instead
+            async with session.options(url, timeout=ClientTimeout(total=self.timeout), allow_redirects=False) as resp:
+                await resp.read()
+
+        started_at = self._last_activity = time.monotonic()
+        results = await asyncio.gather(*(ping() for _ in range(connections)), return_exceptions=True)
+        ready = 0
+        for result in results:
+            if result is None:
+                ready += 1
+            elif isinstance(result, (ClientError, asyncio.TimeoutError)):
+                # Warm-up is optimization only, the first real request will try again
+                loggers.client.warning("Failed to warm up connection to %s: %s: %s", url, type(result).__name__, result)
+            else:
+                raise result
+        loggers.client.debug(
+            "%d/%d connection(s) to %s are ready in %.3f s", ready, connections, url, time.monotonic() - started_at
+        )
+
+    async def _keep_alive(self, url: str, connections: int, interval: float) -> None:
+        while True:
+            idle = time.monotonic() - self._last_activity
+            if idle < interval:
+                await asyncio.sleep(interval - idle)
+                continue
+            try:
+                await self._ping(url, connections)
+            except Exception:
+                # Keep-alive must survive any failure, only cancellation stops it
+                loggers.client.exception("Failed to keep connections to %s alive", url)
+                await asyncio.sleep(interval)
+
     async def __aenter__(self) -> AiohttpSession:
         await self.create_session()
         return self
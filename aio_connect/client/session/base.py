@@ -1,25 +1,32 @@
 from __future__ import annotations
 
 import abc
+import asyncio
 import datetime
-import json
 import secrets
+import time
+from email.utils import parsedate_to_datetime
 from enum import Enum
+from functools import lru_cache, partial
 from http import HTTPStatus
 from types import TracebackType
 from typing import (
     TYPE_CHECKING,
     Any,
+    AsyncContextManager,
     AsyncGenerator,
+    Awaitable,
     Callable,
     Dict,
     Final,
+    Hashable,
     Optional,
     Type,
+    Union,
     cast,
 )
 
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 
 from ...exceptions import (
     ClientDecodeError,
@@ -30,14 +37,18 @@ from ...exceptions import (
     ConnectEntityTooLarge,
     ConnectForbiddenError,
     ConnectNotFound,
+    ConnectRetryAfter,
     ConnectServerError,
     ConnectUnauthorizedError, UnprocessalbleEntity,
 )
 
+from .metrics import RequestMetrics
+from .priority import NO_SLOT, PriorityLanes
 from .middlewares.manager import RequestMiddlewareManager
 from ...methods import Response, ConnectMethod
 from ...methods.base import ConnectType
 from ...types import InputFile
+from ...utils.json_backend import JsonBackend, get_json_backend
 
 if TYPE_CHECKING:
     from ..bot import Bot
@@ -48,6 +59,33 @@ _JsonDumps = Callable[..., str]
 DEFAULT_TIMEOUT: Final[float] = 60.0
 
 
+@lru_cache(maxsize=None)
+def _get_result_adapter(method_type: Type[ConnectMethod[Any]]) -> TypeAdapter[Any]:
+    """
+    Build validator of the method result once per method class
+    """
+    return TypeAdapter(method_type.__returning__)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse Retry-After header value (delay in seconds or HTTP-date) into seconds
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max((date - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+
 class BaseSession(abc.ABC):
     """
     This is base class for all HTTP sessions in aio-connect.
@@ -57,52 +95,63 @@ class BaseSession(abc.ABC):
 
     def __init__(
         self,
-        json_loads: _JsonLoads = json.loads,
-        json_dumps: _JsonDumps = json.dumps,
+        json_loads: Optional[_JsonLoads] = None,
+        json_dumps: Optional[_JsonDumps] = None,
         timeout: float = DEFAULT_TIMEOUT,
+        coalesce_requests: bool = True,
+        json_backend: Optional[Union[JsonBackend, str]] = None,
+        collect_metrics: bool = True,
+        lanes: Optional[PriorityLanes] = None,
     ) -> None:
         """
 
-        :param json_loads: JSON loader
-        :param json_dumps: JSON dumper
+        :param json_loads: JSON loader, by default json_backend is used
+        :param json_dumps: JSON dumper, by default json_backend is used
         :param timeout: Session scope request timeout
+        :param coalesce_requests: Share one in-flight request between concurrent identical GET calls
+        :param json_backend: JSON backend or its name (see :func:`get_json_backend`), stdlib json by default.
+            Pass :code:`"orjson"` to use orjson installed by the :code:`fast` extra
+        :param collect_metrics: Collect metrics of requests into :attr:`metrics`
+        :param lanes: Limit simultaneous requests and share them between priority classes
+            (see :func:`request_priority`)
         """
-        self.json_loads = json_loads
-        self.json_dumps = json_dumps
+        if not isinstance(json_backend, JsonBackend):
+            json_backend = get_json_backend(json_backend)
+        self.json_backend = json_backend
+        self.json_loads = json_loads or self.json_backend.loads
+        self.json_dumps = json_dumps or self.json_backend.dumps
         self.timeout = timeout
+        self.coalesce_requests = coalesce_requests
 
+        self.metrics: Optional[RequestMetrics] = RequestMetrics() if collect_metrics else None
+        self.lanes = lanes
         self.middleware = RequestMiddlewareManager()
+        self._inflight_requests: Dict[Hashable, asyncio.Future[Any]] = {}
 
     def check_response(
-        self, bot: Bot, method: ConnectMethod[ConnectType], status_code: int, content: str
-    ) -> Response[Any]:
+        self,
+        bot: Bot,
+        method: ConnectMethod[ConnectType],
+        status_code: int,
+        content: Union[bytes, str],
+        retry_after: Optional[float] = None,
+    ) -> Response[ConnectType]:
         """
         Check response status
+
+        :param retry_after: Delay from Retry-After header, seconds
         """
-        try:
-            json_data = {'ok': False, 'result': False, 'error_code': None}
-            if status_code == HTTPStatus.OK:
-                json_data['ok'] = True
-                json_data['result'] = True
-            else:
-                json_data['error_code'] = status_code
-            if content:
-                json_data['result'] = self.json_loads(content)
-        except Exception as e:
-            # Handled error type can't be classified as specific error
-            # in due to decoder can be customized and raise any exception
-            raise ClientDecodeError("Failed to decode object", e, content)
+        if HTTPStatus.OK <= status_code <= HTTPStatus.IM_USED:
+            result = self.decode_result(bot=bot, method=method, content=content)
+            return Response[ConnectType].model_construct(ok=True, result=result)
 
         try:
-            response_type = Response[Any]  # type: ignore
-            response = response_type.model_validate(json_data, context={"bot": bot})
-        except ValidationError as e:
-            raise ClientDecodeError("Failed to deserialize object", e, json_data)
-
-        if HTTPStatus.OK <= status_code <= HTTPStatus.IM_USED and response.ok:
-            return response
-
-        result = cast(str, response.result)
+            result = self.json_loads(content) if content else ""
+        except Exception:
+            # Error pages of proxies and balancers are not JSON,
+            # raw text is enough for classifying the error below
+            result = content.decode(errors="replace") if isinstance(content, bytes) else content
+        result = cast(str, result)
 
         if status_code == HTTPStatus.BAD_REQUEST:
             raise ConnectBadRequest(method=method, message=result)
@@ -118,16 +167,61 @@ class BaseSession(abc.ABC):
             raise UnprocessalbleEntity(method=method, message=result)
         if status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE:
             raise ConnectEntityTooLarge(method=method, message=result)
+        if status_code == HTTPStatus.TOO_MANY_REQUESTS:
+            raise ConnectRetryAfter(method=method, message=result, retry_after=retry_after)
         if status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
             if "restart" in result:
-                raise RestartingConnect(method=method, message=result)
-            raise ConnectServerError(method=method, message=result)
+                raise RestartingConnect(method=method, message=result, retry_after=retry_after)
+            raise ConnectServerError(method=method, message=result, retry_after=retry_after)
 
         raise ConnectAPIError(
             method=method,
             message=result,
         )
 
+    def decode_result(
+        self,
+        bot: Bot,
+        method: ConnectMethod[ConnectType],
+        content: Union[bytes, str],
+    ) -> ConnectType:
+        """
+        Validate successful response body straight into :code:`method.__returning__`
+
+        Methods returning :class:`bool` have no body, any successful response means :code:`True`.
+        """
+        returning = type(method).__returning__
+        if returning is bool or not content:
+            return cast(ConnectType, True)
+        try:
+            data = self.json_loads(content)
+        except Exception as e:
+            # Handled error type can't be classified as specific error
+            # in due to decoder can be customized and raise any exception
+            raise ClientDecodeError("Failed to decode object", e, content)
+        try:
+            # Validation in python mode keeps IDs as strings, same as in webhook updates
+            result = _get_result_adapter(type(method)).validate_python(data, context={"bot": bot})
+        except ValidationError as e:
+            raise ClientDecodeError("Failed to deserialize object", e, data)
+        return cast(ConnectType, result)
+
+    def request_slot(self) -> AsyncContextManager[None]:
+        """
+        Slot of priority lane for the request made in the current context
+        """
+        if self.lanes is None:
+            return NO_SLOT
+        return self.lanes.slot()
+
+    def json_dumpb(self, value: Any) -> bytes:
+        """
+        Serialize value to JSON bytes
+        """
+        if self.json_dumps == self.json_backend.dumps:
+            return self.json_backend.dumpb(value)
+        return self.json_dumps(value).encode()
+
     @abc.abstractmethod
     async def close(self) -> None:  # pragma: no cover
         """
@@ -157,6 +251,16 @@ class BaseSession(abc.ABC):
         """
         pass
 
+    async def warm_up(self, url: str, connections: int = 1, keepalive: bool = True) -> None:
+        """
+        Prepare connections to the API server before the first call.
+        Does nothing by default, sessions with connection pool should override it
+
+        :param url: Any URL of API server, usually :code:`bot.base`
+        :param connections: Number of connections to open
+        :param keepalive: Keep connections alive while the session is idle
+        """
+
     @abc.abstractmethod
     async def stream_content(
         self,
@@ -165,9 +269,13 @@ class BaseSession(abc.ABC):
         timeout: int = 30,
         chunk_size: int = 65536,
         raise_for_status: bool = True,
+        offset: int = 0,
     ) -> AsyncGenerator[bytes, None]:  # pragma: no cover
         """
         Stream reader
+
+        :param offset: Start reading from this byte (HTTP Range request).
+            Stream always starts from the offset, even if the server ignores the Range header
         """
         yield b""
 
@@ -236,11 +344,68 @@ class BaseSession(abc.ABC):
         type_request: str,
         path: str,
         timeout: Optional[int] = None
+    ) -> ConnectType:
+        metrics = self.metrics
+        if metrics is None:
+            return await self._call(bot, method, type_request, path, timeout)
+        stats = metrics.started(type(method).__name__, path)
+        started_at = time.perf_counter()
+        try:
+            result = await self._call(bot, method, type_request, path, timeout)
+        except BaseException as e:
+            metrics.finished(stats, time.perf_counter() - started_at, e)
+            raise
+        metrics.finished(stats, time.perf_counter() - started_at)
+        return result
+
+    async def _call(
+        self,
+        bot: Bot,
+        method: ConnectMethod[ConnectType],
+        type_request: str,
+        path: str,
+        timeout: Optional[int] = None
     ) -> ConnectType:
         middleware = self.middleware.wrap_middlewares(self.make_request, timeout=timeout,
                                                       type_request=type_request, path=path)
+        if self.coalesce_requests and type_request == "GET":
+            key = self._coalescing_key(bot=bot, method=method, path=path)
+            if key is not None:
+                return cast(ConnectType, await self._single_flight(key, partial(middleware, bot, method)))
         return cast(ConnectType, await middleware(bot, method))
 
+    @classmethod
+    def _coalescing_key(cls, bot: Bot, method: ConnectMethod[Any], path: str) -> Optional[Hashable]:
+        params = method.model_dump(exclude_none=True)
+        key = (bot, path, tuple(sorted(params.items())))
+        try:
+            hash(key)
+        except TypeError:
+            # Unhashable params (lists, dicts) are not coalesced
+            return None
+        return key
+
+    async def _single_flight(self, key: Hashable, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run request once for all concurrent callers with the same key
+
+        Request is executed in a separate task, so cancellation of one caller
+        does not break the result of others.
+        """
+        future = self._inflight_requests.get(key)
+        if future is None:
+            future = asyncio.ensure_future(request())
+            self._inflight_requests[key] = future
+            future.add_done_callback(partial(self._release_inflight, key))
+        return await asyncio.shield(future)
+
+    def _release_inflight(self, key: Hashable, future: asyncio.Future[Any]) -> None:
+        if self._inflight_requests.get(key) is future:
+            del self._inflight_requests[key]
+        if not future.cancelled():
+            # Mark exception as retrieved when every caller has been cancelled
+            future.exception()
+
     async def __aenter__(self) -> BaseSession:
         return self
 
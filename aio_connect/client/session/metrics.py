@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+from ...utils.metrics import DEFAULT_LATENCY_BUCKETS, Histogram, MetricFamily
+
+_ID_SEGMENT = re.compile(
+    r"/(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)(?=/|$)"
+)
+
+
+@lru_cache(maxsize=4096)
+def normalize_path(path: str) -> str:
+    """
+    Replace IDs in the path with placeholder to keep the number of series bounded
+
+    "/v1/line/subscriber/<uuid>/" -> "/v1/line/subscriber/{id}/"
+    """
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    """Number of calls"""
+    errors: Dict[str, int] = field(default_factory=dict)
+    """Number of failed calls by exception class"""
+    latency: Histogram = field(default_factory=Histogram)
+    """Call duration, seconds"""
+    in_flight: int = 0
+    """Calls waiting for response right now"""
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+    def merge(self, other: EndpointStats) -> None:
+        self.requests += other.requests
+        for name, count in other.errors.items():
+            self.errors[name] = self.errors.get(name, 0) + count
+        self.latency.merge(other.latency)
+        self.in_flight += other.in_flight
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": dict(self.errors),
+            "in_flight": self.in_flight,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_sum": self.latency.sum,
+            "latency_p50": self.latency.quantile(0.5),
+            "latency_p95": self.latency.quantile(0.95),
+            "latency_p99": self.latency.quantile(0.99),
+        }
+
+
+class RequestMetrics:
+    """
+    Metrics of outgoing requests of the session by method and path
+
+    Calls joined to a coalesced request are counted as calls,
+    bytes are counted only for requests which were actually sent.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        """
+
+        :param buckets: Upper bounds of latency histogram buckets, seconds
+        """
+        self.buckets = tuple(buckets)
+        self.in_flight = 0
+        self.endpoints: Dict[Tuple[str, str], EndpointStats] = {}
+        """Stats by (method name, normalized path)"""
+
+    def get(self, method: str, path: str) -> EndpointStats:
+        key = (method, normalize_path(path))
+        stats = self.endpoints.get(key)
+        if stats is None:
+            stats = self.endpoints[key] = EndpointStats(latency=Histogram(self.buckets))
+        return stats
+
+    def started(self, method: str, path: str) -> EndpointStats:
+        """
+        Register started call
+
+        :return: stats which should be passed to :meth:`finished`
+        """
+        self.in_flight += 1
+        stats = self.get(method, path)
+        stats.requests += 1
+        stats.in_flight += 1
+        return stats
+
+    def finished(self, stats: EndpointStats, duration: float, error: Optional[BaseException] = None) -> None:
+        self.in_flight -= 1
+        stats.in_flight -= 1
+        stats.latency.observe(duration)
+        if error is not None:
+            name = type(error).__name__
+            stats.errors[name] = stats.errors.get(name, 0) + 1
+
+    def transferred(self, method: str, path: str, sent: int, received: int) -> None:
+        """
+        Register bytes of sent request and received response
+        """
+        stats = self.get(method, path)
+        stats.bytes_sent += sent
+        stats.bytes_received += received
+
+    def _group(self, index: int) -> Dict[str, EndpointStats]:
+        result: Dict[str, EndpointStats] = {}
+        for key, stats in self.endpoints.items():
+            target = result.get(key[index])
+            if target is None:
+                target = result[key[index]] = EndpointStats(latency=Histogram(self.buckets))
+            target.merge(stats)
+        return result
+
+    def by_method(self) -> Dict[str, EndpointStats]:
+        return self._group(0)
+
+    def by_path(self) -> Dict[str, EndpointStats]:
+        return self._group(1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current values as plain dict
+        """
+        return {
+            "in_flight": self.in_flight,
+            "methods": {name: stats.as_dict() for name, stats in self.by_method().items()},
+            "paths": {path: stats.as_dict() for path, stats in self.by_path().items()},
+        }
+
+    def reset(self) -> None:
+        self.endpoints.clear()
+
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        labels = dict(labels or {})
+        requests = MetricFamily("connect_requests_total", "counter", "Calls of Connect API")
+        errors = MetricFamily("connect_request_errors_total", "counter", "Failed calls of Connect API")
+        latency = MetricFamily("connect_request_duration_seconds", "histogram", "Call duration")
+        in_flight = MetricFamily("connect_requests_in_flight", "gauge", "Calls waiting for response")
+        sent = MetricFamily("connect_request_bytes_total", "counter", "Bytes of request bodies")
+        received = MetricFamily("connect_response_bytes_total", "counter", "Bytes of response bodies")
+
+        for (method, path), stats in self.endpoints.items():
+            item_labels = {**labels, "method": method, "path": path}
+            requests.add(stats.requests, item_labels)
+            for error, count in stats.errors.items():
+                errors.add(count, {**item_labels, "error": error})
+            latency.add_histogram(stats.latency, item_labels)
+            in_flight.add(stats.in_flight, item_labels)
+            sent.add(stats.bytes_sent, item_labels)
+            received.add(stats.bytes_received, item_labels)
+        return [requests, errors, latency, in_flight, sent, received]
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, List, Mapping, Optional, Type
+
+from .base import BaseRequestMiddleware, NextRequestMiddlewareType
+from ....enums import CircuitState
+from ....exceptions import (
+    ConnectAPIError,
+    ConnectCircuitOpen,
+    ConnectEntityTooLarge,
+    ConnectNetworkError,
+    ConnectServerError,
+)
+from ....loggers import middlewares as logger
+from ....methods import ConnectMethod, Response
+from ....methods.base import ConnectType
+from ....utils.metrics import MetricFamily
+
+if TYPE_CHECKING:
+    from ...bot import Bot
+
+# Value of connect_circuit_state gauge
+STATE_VALUES: Dict[CircuitState, int] = {
+    CircuitState.CLOSED: 0,
+    CircuitState.HALF_OPEN: 1,
+    CircuitState.OPEN: 2,
+}
+
+_WINDOW_BUCKETS = 10
+
+
+@dataclass(frozen=True)
+class BreakerPolicy:
+    failure_rate: float = 0.5
+    """Share of failed calls in the window which opens the circuit"""
+    slow_call_rate: Optional[float] = 0.8
+    """Share of slow calls in the window which opens the circuit, None - don't track latency"""
+    slow_call_duration: float = 10.0
+    """Calls longer than this are slow, seconds"""
+    min_calls: int = 20
+    """Minimum number of calls in the window before rates are evaluated"""
+    window: float = 30.0
+    """Length of the sliding window, seconds"""
+    open_duration: float = 15.0
+    """Time before the first probe after opening, seconds"""
+    half_open_calls: int = 3
+    """Number of probes, all of them must succeed to close the circuit"""
+
+
+class _RollingWindow:
+    """
+    Counts of calls in the sliding window split into fixed buckets
+    """
+
+    __slots__ = ("window", "width", "buckets")
+
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self.width = window / _WINDOW_BUCKETS
+        # [start, calls, failures, slow calls]
+        self.buckets: Deque[List[float]] = deque()
+
+    def _expire(self, now: float) -> None:
+        while self.buckets and self.buckets[0][0] <= now - self.window:
+            self.buckets.popleft()
+
+    def add(self, now: float, failed: bool, slow: bool) -> None:
+        start = now - now % self.width
+        if not self.buckets or self.buckets[-1][0] != start:
+            self.buckets.append([start, 0, 0, 0])
+        bucket = self.buckets[-1]
+        bucket[1] += 1
+        bucket[2] += failed
+        bucket[3] += slow
+        self._expire(now)
+
+    def totals(self, now: float) -> List[float]:
+        self._expire(now)
+        return [sum(bucket[i] for bucket in self.buckets) for i in (1, 2, 3)]
+
+    def clear(self) -> None:
+        self.buckets.clear()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a single endpoint
+    """
+
+    def __init__(self, endpoint: str, policy: BreakerPolicy) -> None:
+        self.endpoint = endpoint
+        self.policy = policy
+        self.state = CircuitState.CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        """Number of calls rejected without request"""
+        self.opened = 0
+        """Number of times the circuit was opened"""
+        self._window = _RollingWindow(policy.window)
+        self._probes = 0
+        self._probe_successes = 0
+
+    def retry_after(self, now: float) -> Optional[float]:
+        """
+        Time before the next probe can be sent, None if it depends on probes in flight
+        """
+        if self.state is CircuitState.OPEN:
+            return max(0.0, self.opened_at + self.policy.open_duration - now)
+        return None
+
+    def acquire(self, now: float) -> Optional[bool]:
+        """
+        Admit the call
+
+        :return: None if the call is rejected, otherwise whether the call is a probe
+        """
+        if self.state is CircuitState.OPEN:
+            if now < self.opened_at + self.policy.open_duration:
+                return None
+            self._transition(CircuitState.HALF_OPEN)
+        if self.state is CircuitState.HALF_OPEN:
+            if self._probes + self._probe_successes >= self.policy.half_open_calls:
+                return None
+            self._probes += 1
+            return True
+        return False
+
+    def record(self, now: float, duration: float, failed: bool, probe: bool) -> None:
+        """
+        Register outcome of the admitted call
+        """
+        policy = self.policy
+        slow = policy.slow_call_rate is not None and duration >= policy.slow_call_duration
+        if probe:
+            self._probes -= 1
+            if self.state is not CircuitState.HALF_OPEN:
+                return
+            if failed or slow:
+                self._open(now)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= policy.half_open_calls:
+                    self._transition(CircuitState.CLOSED)
+            return
+
+        self._window.add(now, failed, slow)
+        if self.state is not CircuitState.CLOSED:
+            # Call was admitted before the circuit has been opened
+            return
+        calls, failures, slow_calls = self._window.totals(now)
+        if calls < policy.min_calls:
+            return
+        if failures / calls >= policy.failure_rate or (
+            policy.slow_call_rate is not None and slow_calls / calls >= policy.slow_call_rate
+        ):
+            self._open(now)
+
+    def cancel(self, probe: bool) -> None:
+        """
+        Release the call which finished without outcome (e.g. cancelled)
+        """
+        if probe:
+            self._probes -= 1
+
+    def _open(self, now: float) -> None:
+        self.opened_at = now
+        self.opened += 1
+        self._transition(CircuitState.OPEN)
+
+    def _transition(self, state: CircuitState) -> None:
+        logger.warning("Circuit of %s is %s (was %s)", self.endpoint, state.value, self.state.value)
+        self.state = state
+        self._probe_successes = 0
+        if state is CircuitState.CLOSED:
+            self._window.clear()
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        if now is None:
+            now = time.monotonic()
+        calls, failures, slow_calls = self._window.totals(now)
+        return {
+            "state": self.state.value,
+            "calls": int(calls),
+            "failures": int(failures),
+            "slow_calls": int(slow_calls),
+            "rejected": self.rejected,
+            "opened": self.opened,
+            "retry_after": self.retry_after(now),
+        }
+
+
+class CircuitBreakerMiddleware(BaseRequestMiddleware):
+    """
+    Fail fast while an endpoint of Connect is degraded
+
+    Every endpoint (URL template of the method) has its own circuit. It opens when
+    the share of failed or slow calls in the sliding window exceeds the policy,
+    then calls are rejected with :class:`ConnectCircuitOpen` without waiting for timeouts.
+    After :attr:`BreakerPolicy.open_duration` a few probes are let through,
+    the circuit closes if all of them succeed.
+
+    Network errors, timeouts and 5xx responses are failures, other API errors mean
+    that the endpoint works. Register it after :class:`RetryMiddleware`,
+    so each attempt is counted and rejected calls are not retried.
+    """
+
+    def __init__(
+        self,
+        policy: Optional[BreakerPolicy] = None,
+        policies: Optional[Dict[Type[ConnectMethod[Any]], BreakerPolicy]] = None,
+    ) -> None:
+        """
+
+        :param policy: Default breaker policy
+        :param policies: Breaker policies for specific methods
+        """
+        self.policy = policy or BreakerPolicy()
+        self.policies = policies or {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        """Circuits by endpoint"""
+
+    @classmethod
+    def resolve_endpoint(cls, method: ConnectMethod[Any]) -> str:
+        return method.__api_path__
+
+    def get_breaker(self, method: ConnectMethod[Any]) -> CircuitBreaker:
+        endpoint = self.resolve_endpoint(method)
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            policy = self.policies.get(type(method), self.policy)
+            breaker = self.breakers[endpoint] = CircuitBreaker(endpoint, policy)
+        return breaker
+
+    @classmethod
+    def is_failure(cls, error: ConnectAPIError) -> bool:
+        if isinstance(error, ConnectEntityTooLarge):
+            return False
+        return isinstance(error, (ConnectNetworkError, ConnectServerError))
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[ConnectType],
+        bot: Bot,
+        method: ConnectMethod[ConnectType],
+    ) -> Response[ConnectType]:
+        breaker = self.get_breaker(method)
+        started_at = time.monotonic()
+        probe = breaker.acquire(started_at)
+        if probe is None:
+            breaker.rejected += 1
+            raise ConnectCircuitOpen(
+                method=method,
+                message=f"{breaker.endpoint} is unavailable",
+                endpoint=breaker.endpoint,
+                retry_after=breaker.retry_after(started_at),
+            )
+
+        try:
+            response = await make_request(bot, method)
+        except ConnectAPIError as e:
+            now = time.monotonic()
+            breaker.record(now, now - started_at, failed=self.is_failure(e), probe=probe)
+            raise
+        except BaseException:
+            breaker.cancel(probe)
+            raise
+        now = time.monotonic()
+        breaker.record(now, now - started_at, failed=False, probe=probe)
+        return response
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        return {endpoint: breaker.snapshot(now) for endpoint, breaker in self.breakers.items()}
+
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        labels = dict(labels or {})
+        state = MetricFamily(
+            "connect_circuit_state", "gauge", "Circuit state: 0 - closed, 1 - half-open, 2 - open"
+        )
+        rejected = MetricFamily("connect_circuit_rejected_total", "counter", "Calls rejected by open circuit")
+        opened = MetricFamily("connect_circuit_opened_total", "counter", "Number of times circuit was opened")
+        for endpoint, breaker in self.breakers.items():
+            item_labels = {**labels, "path": endpoint}
+            state.add(STATE_VALUES[breaker.state], item_labels)
+            rejected.add(breaker.rejected, item_labels)
+            opened.add(breaker.opened, item_labels)
+        return [state, rejected, opened]
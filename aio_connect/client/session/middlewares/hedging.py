@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Mapping,
+    Optional,
+    Type,
+)
+
+from .base import BaseRequestMiddleware, NextRequestMiddlewareType
+from .retry import IDEMPOTENT_METHODS, RetryBudget
+from ....loggers import middlewares as logger
+from ....methods import ConnectMethod, Response
+from ....methods.base import ConnectType
+from ....utils.metrics import MetricFamily
+
+if TYPE_CHECKING:
+    from ...bot import Bot
+
+HEDGED_METHODS: FrozenSet[Type[ConnectMethod[Any]]] = frozenset(
+    method for method in IDEMPOTENT_METHODS if method.__type_request__ == "GET"
+)
+"""Methods which are hedged by default"""
+
+
+class LatencyTracker:
+    """
+    Recent latencies of an endpoint and the hedging delay derived from them
+    """
+
+    __slots__ = ("percentile", "samples", "refresh", "min_samples", "_pending", "_delay")
+
+    def __init__(self, percentile: float, window: int, min_samples: int, refresh: int = 10) -> None:
+        """
+
+        :param percentile: Percentile of latency used as delay, 0..1
+        :param window: Number of recent latencies
+        :param min_samples: Number of latencies before the delay is known
+        :param refresh: Delay is recalculated after this number of new latencies
+        """
+        self.percentile = percentile
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.refresh = refresh
+        self.min_samples = min_samples
+        self._pending = 0
+        self._delay: Optional[float] = None
+
+    def observe(self, latency: float) -> None:
+        self.samples.append(latency)
+        self._pending += 1
+        if self._pending >= self.refresh and len(self.samples) >= self.min_samples:
+            self._pending = 0
+            ordered = sorted(self.samples)
+            self._delay = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    @property
+    def delay(self) -> Optional[float]:
+        return self._delay
+
+
+@dataclass
+class HedgingStats:
+    calls: int = 0
+    """Number of hedgeable calls"""
+    hedged: int = 0
+    """Number of calls which sent the second request"""
+    hedge_wins: int = 0
+    """Number of calls answered by the second request"""
+    budget_exhausted: int = 0
+    """Number of calls which were not hedged because of the budget"""
+
+
+class HedgingMiddleware(BaseRequestMiddleware):
+    """
+    Cut tail latency of idempotent GET methods
+
+    If the request has not been answered within the percentile of recent latencies
+    of the endpoint, the same request is sent once more. The first successful response wins,
+    the other request is cancelled. Extra requests are limited by the budget,
+    so hedging can't multiply load of the slow server.
+
+    Register it after :class:`RetryMiddleware`, so each attempt can be hedged.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay: float = 0.05,
+        window: int = 200,
+        min_samples: int = 20,
+        budget_ratio: float = 0.05,
+        budget_reserve: int = 10,
+        methods: Optional[Iterable[Type[ConnectMethod[Any]]]] = None,
+    ) -> None:
+        """
+
+        :param percentile: Percentile of recent latencies after which the request is hedged
+        :param min_delay: Lower bound of the hedging delay, seconds
+        :param window: Number of recent latencies of each endpoint
+        :param min_samples: Requests are not hedged until the endpoint has this number of latencies
+        :param budget_ratio: Hedges earned by every call, i.e. the maximum share of extra requests
+        :param budget_reserve: Maximum number of accumulated hedges
+        :param methods: Hedged methods, :obj:`HEDGED_METHODS` by default
+        """
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.methods = frozenset(methods) if methods is not None else HEDGED_METHODS
+        self.budget = RetryBudget(ratio=budget_ratio, reserve=budget_reserve)
+        self.trackers: Dict[str, LatencyTracker] = {}
+        """Latencies by endpoint"""
+        self.stats: Dict[str, HedgingStats] = {}
+        """Stats by endpoint"""
+
+    def get_tracker(self, endpoint: str) -> LatencyTracker:
+        tracker = self.trackers.get(endpoint)
+        if tracker is None:
+            tracker = self.trackers[endpoint] = LatencyTracker(
+                percentile=self.percentile, window=self.window, min_samples=self.min_samples
+            )
+            self.stats[endpoint] = HedgingStats()
+        return tracker
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[ConnectType],
+        bot: Bot,
+        method: ConnectMethod[ConnectType],
+    ) -> Response[ConnectType]:
+        if type(method) not in self.methods:
+            return await make_request(bot, method)
+
+        endpoint = method.__api_path__
+        tracker = self.get_tracker(endpoint)
+        stats = self.stats[endpoint]
+        stats.calls += 1
+        self.budget.deposit()
+        delay = tracker.delay
+        started_at = time.monotonic()
+        if delay is None:
+            response = await make_request(bot, method)
+            tracker.observe(time.monotonic() - started_at)
+            return response
+
+        delay = max(delay, self.min_delay)
+        primary = asyncio.ensure_future(make_request(bot, method))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                tracker.observe(time.monotonic() - started_at)
+                return primary.result()
+            if not self.budget.withdraw():
+                stats.budget_exhausted += 1
+                response = await primary
+                tracker.observe(time.monotonic() - started_at)
+                return response
+
+            stats.hedged += 1
+            logger.debug("%s is not answered in %.3f s, hedging", type(method).__name__, delay)
+            hedge = asyncio.ensure_future(make_request(bot, method))
+            try:
+                pending = {primary, hedge}
+                while True:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    # Prefer successful response, the error is raised only if both requests failed
+                    for task in sorted(done, key=lambda t: (t.exception() is not None, t is hedge)):
+                        if task.exception() is None or not pending:
+                            if task is hedge:
+                                stats.hedge_wins += 1
+                            # Latency of the primary request even if the hedge won: it is a lower bound
+                            # of the cancelled request, latency of the hedge would push tail out of the window
+                            tracker.observe(time.monotonic() - started_at)
+                            return task.result()
+            finally:
+                hedge.cancel()
+        finally:
+            primary.cancel()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            endpoint: {
+                "delay": self.trackers[endpoint].delay,
+                "calls": stats.calls,
+                "hedged": stats.hedged,
+                "hedge_wins": stats.hedge_wins,
+                "budget_exhausted": stats.budget_exhausted,
+            }
+            for endpoint, stats in self.stats.items()
+        }
+
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        labels = dict(labels or {})
+        hedged = MetricFamily("connect_hedged_requests_total", "counter", "Calls which sent the second request")
+        wins = MetricFamily("connect_hedge_wins_total", "counter", "Calls answered by the second request")
+        delay = MetricFamily("connect_hedge_delay_seconds", "gauge", "Current hedging delay")
+        for endpoint, stats in self.stats.items():
+            item_labels = {**labels, "path": endpoint}
+            hedged.add(stats.hedged, item_labels)
+            wins.add(stats.hedge_wins, item_labels)
+            current = self.trackers[endpoint].delay
+            if current is not None:
+                delay.add(max(current, self.min_delay), item_labels)
+        return [hedged, wins, delay]
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple, Type
+
+from .base import BaseRequestMiddleware, NextRequestMiddlewareType
+from ....methods import ConnectMethod, Response
+from ....methods.base import ConnectType
+from ....utils.metrics import Histogram, MetricFamily
+
+if TYPE_CHECKING:
+    from ...bot import Bot
+
+GLOBAL_SCOPE = "global"
+LINE_SCOPE = "line"
+ENDPOINT_SCOPE = "endpoint"
+USER_SCOPE = "user"
+
+# Number of created buckets after which idle per-key buckets are dropped
+_PRUNE_THRESHOLD = 1024
+
+
+@dataclass(frozen=True)
+class Rate:
+    limit: float
+    """Number of requests allowed per period"""
+    period: float = 1.0
+    """Period, seconds"""
+    burst: Optional[float] = None
+    """Number of requests which can be sent at once, defaults to limit"""
+
+
+class TokenBucket:
+    """
+    Token bucket which lets the caller reserve a token in advance
+
+    Tokens can go below zero, the debt is the queue of reserved calls,
+    so waiters are served in order of arrival without any lock.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: Rate) -> None:
+        self.rate = rate.limit / rate.period
+        self.capacity = float(rate.burst if rate.burst is not None else rate.limit)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """
+        Take a token
+
+        :param now: current monotonic time
+        :return: delay in seconds before the token becomes available
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def refund(self) -> None:
+        """
+        Give back the token reserved by a call which was not made
+        """
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def is_idle(self, now: float) -> bool:
+        return self.tokens + (now - self.updated_at) * self.rate >= self.capacity
+
+
+@dataclass
+class RateLimitStats:
+    calls: int = 0
+    """Number of calls passed through the limiter"""
+    delayed: int = 0
+    """Number of calls which were queued"""
+    total_wait: float = 0.0
+    """Total time spent in the queue, seconds"""
+    max_wait: float = 0.0
+    """Longest time spent in the queue, seconds"""
+    cancelled: int = 0
+    """Number of queued calls which were cancelled before they were sent"""
+    wait_time: Histogram = field(default_factory=Histogram)
+    """Time spent in the queue by delayed calls, seconds"""
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.delayed if self.delayed else 0.0
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Client-side rate limiter
+
+    Calls above the limit are not rejected, they are queued until a token
+    is available in every matching scope: global, line_id, endpoint and user_id.
+    Endpoint is identified by the method class because every method has a single URL.
+    Token of a queued call which is cancelled is given back to every scope.
+    """
+
+    def __init__(
+        self,
+        global_rate: Optional[Rate] = None,
+        line_rate: Optional[Rate] = None,
+        endpoint_rate: Optional[Rate] = None,
+        user_rate: Optional[Rate] = None,
+        endpoint_rates: Optional[Dict[Type[ConnectMethod[Any]], Rate]] = None,
+    ) -> None:
+        """
+
+        :param global_rate: Limit for all requests of the session
+        :param line_rate: Limit for requests with the same line_id
+        :param endpoint_rate: Limit for requests to the same endpoint
+        :param user_rate: Limit for requests with the same user_id
+        :param endpoint_rates: Limits for specific endpoints, override endpoint_rate
+        """
+        self.line_rate = line_rate
+        self.endpoint_rate = endpoint_rate
+        self.user_rate = user_rate
+        self.endpoint_rates = endpoint_rates or {}
+
+        self._global = TokenBucket(global_rate) if global_rate else None
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._created = 0
+        self.stats: Dict[str, RateLimitStats] = {
+            scope: RateLimitStats()
+            for scope in (GLOBAL_SCOPE, LINE_SCOPE, ENDPOINT_SCOPE, USER_SCOPE)
+        }
+
+    def _bucket(self, key: Hashable, rate: Rate, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._created += 1
+            if self._created >= _PRUNE_THRESHOLD:
+                self._prune(now)
+            bucket = self._buckets[key] = TokenBucket(rate)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        self._created = 0
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if not bucket.is_idle(now)
+        }
+
+    def resolve_buckets(self, method: ConnectMethod[Any], now: float) -> List[Tuple[str, TokenBucket]]:
+        buckets: List[Tuple[str, TokenBucket]] = []
+        if self._global is not None:
+            buckets.append((GLOBAL_SCOPE, self._global))
+        if self.line_rate is not None:
+            line_id = getattr(method, "line_id", None)
+            if line_id is not None:
+                buckets.append((LINE_SCOPE, self._bucket((LINE_SCOPE, line_id), self.line_rate, now)))
+        endpoint_rate = self.endpoint_rates.get(type(method), self.endpoint_rate)
+        if endpoint_rate is not None:
+            buckets.append(
+                (ENDPOINT_SCOPE, self._bucket((ENDPOINT_SCOPE, type(method)), endpoint_rate, now))
+            )
+        if self.user_rate is not None:
+            user_id = getattr(method, "user_id", None)
+            if user_id is not None:
+                buckets.append((USER_SCOPE, self._bucket((USER_SCOPE, user_id), self.user_rate, now)))
+        return buckets
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[ConnectType],
+        bot: Bot,
+        method: ConnectMethod[ConnectType],
+    ) -> Response[ConnectType]:
+        now = time.monotonic()
+        delay = 0.0
+        limiting_scope = None
+        buckets = self.resolve_buckets(method, now)
+        for scope, bucket in buckets:
+            self.stats[scope].calls += 1
+            wait = bucket.reserve(now)
+            if wait > delay:
+                delay, limiting_scope = wait, scope
+
+        if limiting_scope is not None:
+            stats = self.stats[limiting_scope]
+            stats.delayed += 1
+            stats.total_wait += delay
+            stats.max_wait = max(stats.max_wait, delay)
+            stats.wait_time.observe(delay)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Request is not sent, so it should not take a place of the next calls
+                for _, bucket in buckets:
+                    bucket.refund()
+                stats.cancelled += 1
+                raise
+
+        return await make_request(bot, method)
+
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        labels = dict(labels or {})
+        calls = MetricFamily("connect_rate_limit_calls_total", "counter", "Calls passed through the rate limiter")
+        throttled = MetricFamily(
+            "connect_rate_limit_throttled_total", "counter", "Calls queued by the rate limiter"
+        )
+        cancelled = MetricFamily(
+            "connect_rate_limit_cancelled_total", "counter", "Queued calls cancelled before they were sent"
+        )
+        wait = MetricFamily(
+            "connect_rate_limit_wait_seconds", "histogram", "Time spent by queued calls in the rate limiter"
+        )
+        configured = {
+            GLOBAL_SCOPE: self._global is not None,
+            LINE_SCOPE: self.line_rate is not None,
+            ENDPOINT_SCOPE: self.endpoint_rate is not None or bool(self.endpoint_rates),
+            USER_SCOPE: self.user_rate is not None,
+        }
+        for scope, stats in self.stats.items():
+            if not configured[scope]:
+                continue
+            scope_labels = {**labels, "scope": scope}
+            calls.add(stats.calls, scope_labels)
+            throttled.add(stats.delayed, scope_labels)
+            cancelled.add(stats.cancelled, scope_labels)
+            wait.add_histogram(stats.wait_time, scope_labels)
+        return [calls, throttled, cancelled, wait]
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Optional, Type
+from weakref import WeakKeyDictionary
+
+from .base import BaseRequestMiddleware, NextRequestMiddlewareType
+from ....exceptions import (
+    ConnectAPIError,
+    ConnectConnectionError,
+    ConnectEntityTooLarge,
+    ConnectNetworkError,
+    ConnectRetryAfter,
+    ConnectServerError,
+)
+from ....loggers import middlewares as logger
+from ....methods import (
+    ConnectMethod,
+    Response,
+    SetHook,
+    DelAllHook,
+    DelHook,
+    GetTreatments,
+    GetSubscriber,
+    GetSubscribers,
+    GetSubscriptions,
+    GetLines,
+    GetSpecialist,
+    GetSpecialists,
+    GetSpecialistsAvailable,
+    GetCompetences,
+    GetTicket,
+    GetTicketByNumber,
+    DropKeyboard,
+    QuestionAndAnsweringSelected,
+)
+from ....methods.base import ConnectType
+
+if TYPE_CHECKING:
+    from ...bot import Bot
+
+IDEMPOTENT_METHODS: FrozenSet[Type[ConnectMethod[Any]]] = frozenset({
+    SetHook,
+    DelAllHook,
+    DelHook,
+    GetTreatments,
+    GetSubscriber,
+    GetSubscribers,
+    GetSubscriptions,
+    GetLines,
+    GetSpecialist,
+    GetSpecialists,
+    GetSpecialistsAvailable,
+    GetCompetences,
+    GetTicket,
+    GetTicketByNumber,
+    DropKeyboard,
+    QuestionAndAnsweringSelected,
+})
+"""Methods which can be safely repeated after the server has received them"""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    """Total number of attempts including the first one"""
+    base_delay: float = 0.5
+    """Delay before the first retry, doubled on every next one"""
+    max_delay: float = 30.0
+    """Upper bound of a single delay, longer Retry-After is not waited"""
+    jitter: float = 0.5
+    """Part of the delay which is randomized"""
+    idempotent: Optional[bool] = None
+    """Override method idempotency, by default resolved from :obj:`IDEMPOTENT_METHODS`"""
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.base_delay * (2 ** (attempt - 1)), self.max_delay)
+        return delay - delay * self.jitter * random.random()
+
+
+class RetryBudget:
+    """
+    Limits retries to a share of the regular traffic, so retries can't multiply
+    load on the server during an outage
+    """
+
+    def __init__(self, ratio: float = 0.2, reserve: int = 10) -> None:
+        """
+
+        :param ratio: Retries earned by every first attempt
+        :param reserve: Maximum number of accumulated retries
+        """
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = float(reserve)
+
+    def deposit(self) -> None:
+        self.balance = min(self.balance + self.ratio, float(self.reserve))
+
+    def withdraw(self) -> bool:
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+class RetryMiddleware(BaseRequestMiddleware):
+    """
+    Retry transient Connect errors with exponential backoff and jitter
+
+    Non-idempotent methods (for example :class:`SendMessageLine`) are retried only when
+    the request did not reach the server.
+    """
+
+    def __init__(
+        self,
+        policy: Optional[RetryPolicy] = None,
+        policies: Optional[Dict[Type[ConnectMethod[Any]], RetryPolicy]] = None,
+        budget_ratio: float = 0.2,
+        budget_reserve: int = 10,
+    ) -> None:
+        """
+
+        :param policy: Default retry policy
+        :param policies: Retry policies for specific methods
+        :param budget_ratio: Retries earned by every first attempt of a bot
+        :param budget_reserve: Maximum number of accumulated retries of a bot
+        """
+        self.policy = policy or RetryPolicy()
+        self.policies = policies or {}
+        self.budget_ratio = budget_ratio
+        self.budget_reserve = budget_reserve
+        self._budgets: WeakKeyDictionary[Bot, RetryBudget] = WeakKeyDictionary()
+
+    def resolve_policy(self, method: ConnectMethod[Any]) -> RetryPolicy:
+        return self.policies.get(type(method), self.policy)
+
+    def get_budget(self, bot: Bot) -> RetryBudget:
+        budget = self._budgets.get(bot)
+        if budget is None:
+            budget = self._budgets[bot] = RetryBudget(
+                ratio=self.budget_ratio, reserve=self.budget_reserve
+            )
+        return budget
+
+    @classmethod
+    def is_retryable(cls, error: ConnectAPIError, idempotent: bool) -> bool:
+        if isinstance(error, (ConnectConnectionError, ConnectRetryAfter)):
+            # Request was rejected before processing
+            return True
+        if not idempotent:
+            return False
+        if isinstance(error, ConnectEntityTooLarge):
+            return False
+        return isinstance(error, (ConnectNetworkError, ConnectServerError))
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[ConnectType],
+        bot: Bot,
+        method: ConnectMethod[ConnectType],
+    ) -> Response[ConnectType]:
+        policy = self.resolve_policy(method)
+        idempotent = policy.idempotent
+        if idempotent is None:
+            idempotent = type(method) in IDEMPOTENT_METHODS
+        budget = self.get_budget(bot)
+        budget.deposit()
+
+        attempt = 1
+        while True:
+            try:
+                return await make_request(bot, method)
+            except ConnectAPIError as e:
+                if attempt >= policy.max_attempts or not self.is_retryable(e, idempotent):
+                    raise
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is not None and retry_after > policy.max_delay:
+                    raise
+                if not budget.withdraw():
+                    logger.warning("Retry budget is exhausted, %s is not retried", type(method).__name__)
+                    raise
+                delay = policy.backoff(attempt) if retry_after is None else retry_after
+                logger.warning(
+                    "%s failed with %s: %s, retry %d/%d in %.2f s",
+                    type(method).__name__,
+                    type(e).__name__,
+                    e,
+                    attempt,
+                    policy.max_attempts - 1,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
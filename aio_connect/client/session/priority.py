@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Iterator, Mapping, Optional
+
+from ...enums import RequestPriority
+from ...utils.metrics import MetricFamily
+
+PRIORITY_ORDER = (RequestPriority.INTERACTIVE, RequestPriority.BACKGROUND, RequestPriority.BULK)
+
+DEFAULT_RESERVED_SHARE: Dict[RequestPriority, float] = {
+    RequestPriority.INTERACTIVE: 0.3,
+    RequestPriority.BACKGROUND: 0.1,
+    RequestPriority.BULK: 0.1,
+}
+"""Share of slots which can be used only by the priority class"""
+
+_explicit_priority: ContextVar[Optional[RequestPriority]] = ContextVar("explicit_priority", default=None)
+_implicit_priority: ContextVar[Optional[RequestPriority]] = ContextVar("implicit_priority", default=None)
+
+
+@contextmanager
+def request_priority(priority: RequestPriority) -> Iterator[None]:
+    """
+    Set priority of requests made inside the block
+
+    Explicit priority overrides priority derived from the context (handlers, broadcasts, downloads).
+
+    >>> with request_priority(RequestPriority.BULK):
+    ...     await bot.get_lines()
+    """
+    token = _explicit_priority.set(priority)
+    try:
+        yield
+    finally:
+        _explicit_priority.reset(token)
+
+
+@contextmanager
+def default_request_priority(priority: RequestPriority) -> Iterator[None]:
+    """
+    Set priority derived from the context, used by aio-connect itself:
+    dispatcher handlers are interactive, broadcasts and bulk downloads are bulk
+    """
+    token = _implicit_priority.set(priority)
+    try:
+        yield
+    finally:
+        _implicit_priority.reset(token)
+
+
+def get_request_priority() -> RequestPriority:
+    """
+    Priority of requests made in the current context, background by default
+    """
+    return _explicit_priority.get() or _implicit_priority.get() or RequestPriority.BACKGROUND
+
+
+class _NoSlot:
+    async def __aenter__(self) -> None:
+        return None
+
+    async def __aexit__(self, *args: Any) -> None:
+        return None
+
+
+NO_SLOT = _NoSlot()
+"""Slot of session without priority lanes"""
+
+
+@dataclass
+class LaneStats:
+    reserved: int = 0
+    """Slots reserved for the class"""
+    in_use: int = 0
+    """Requests in flight"""
+    waiting: int = 0
+    """Requests waiting for a slot"""
+    queued: int = 0
+    """Number of requests which had to wait for a slot"""
+
+
+class PriorityLanes:
+    """
+    Limits the number of simultaneous requests of the session and shares slots between priority classes
+
+    Each class has reserved slots which can't be taken by other classes, the rest of the slots are shared.
+    When a slot is released, waiting requests are admitted in order of priority,
+    so interactive replies do not queue behind broadcasts and bulk downloads.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        reserved: Optional[Mapping[RequestPriority, int]] = None,
+    ) -> None:
+        """
+
+        :param limit: Number of simultaneous requests, should not exceed the connection pool limit
+        :param reserved: Slots reserved for each class, by default :obj:`DEFAULT_RESERVED_SHARE` of the limit
+        """
+        if reserved is None:
+            reserved = {
+                priority: max(1, int(limit * share)) for priority, share in DEFAULT_RESERVED_SHARE.items()
+            }
+        if sum(reserved.values()) > limit:
+            raise ValueError("Reserved slots exceed the limit")
+        self.limit = limit
+        self.stats: Dict[RequestPriority, LaneStats] = {
+            priority: LaneStats(reserved=reserved.get(priority, 0)) for priority in PRIORITY_ORDER
+        }
+        self._in_use = 0
+        self._waiters: Dict[RequestPriority, Deque[asyncio.Future[None]]] = {
+            priority: deque() for priority in PRIORITY_ORDER
+        }
+
+    def _can_admit(self, priority: RequestPriority) -> bool:
+        free = self.limit - self._in_use
+        # Unused reservations of other classes are not available
+        for other, stats in self.stats.items():
+            if other is not priority:
+                free -= max(0, stats.reserved - stats.in_use)
+        return free > 0
+
+    def _take(self, priority: RequestPriority) -> None:
+        self._in_use += 1
+        self.stats[priority].in_use += 1
+
+    def _wake(self) -> None:
+        for priority in PRIORITY_ORDER:
+            waiters = self._waiters[priority]
+            while waiters and self._can_admit(priority):
+                waiter = waiters.popleft()
+                if waiter.done():
+                    # Cancelled, the waiting task updates stats itself
+                    continue
+                self.stats[priority].waiting -= 1
+                self._take(priority)
+                waiter.set_result(None)
+
+    async def acquire(self, priority: RequestPriority) -> None:
+        # Waiters are woken up as soon as possible, so waiting higher classes
+        # have no free slots which this request could take from them
+        if not self._waiters[priority] and self._can_admit(priority):
+            self._take(priority)
+            return
+        stats = self.stats[priority]
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        stats.waiting += 1
+        stats.queued += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was given right before cancellation
+                self.release(priority)
+            else:
+                # Cancelled waiter may be already dropped by release() before this task resumed
+                with suppress(ValueError):
+                    self._waiters[priority].remove(waiter)
+                stats.waiting -= 1
+            raise
+
+    def release(self, priority: RequestPriority) -> None:
+        self._in_use -= 1
+        self.stats[priority].in_use -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[RequestPriority] = None) -> AsyncIterator[None]:
+        """
+        Hold a slot while the request is in flight
+
+        :param priority: priority class, by default :func:`get_request_priority`
+        """
+        if priority is None:
+            priority = get_request_priority()
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_use": self._in_use,
+            "lanes": {
+                priority.value: {
+                    "reserved": stats.reserved,
+                    "in_use": stats.in_use,
+                    "waiting": stats.waiting,
+                    "queued": stats.queued,
+                }
+                for priority, stats in self.stats.items()
+            },
+        }
+
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        labels = dict(labels or {})
+        in_use = MetricFamily("connect_priority_in_use", "gauge", "Requests in flight by priority")
+        waiting = MetricFamily("connect_priority_waiting", "gauge", "Requests waiting for a slot by priority")
+        queued = MetricFamily("connect_priority_queued_total", "counter", "Requests which had to wait for a slot")
+        for priority, stats in self.stats.items():
+            item_labels = {**labels, "priority": priority.value}
+            in_use.add(stats.in_use, item_labels)
+            waiting.add(stats.waiting, item_labels)
+            queued.add(stats.queued, item_labels)
+        return [in_use, waiting, queued]
@@ -7,6 +7,8 @@ from typing import Any, Dict, Optional, Set
 
 from .. import loggers
 from ..client.bot import Bot
+from ..client.session.priority import default_request_priority
+from ..enums import RequestPriority
 from ..exceptions import ConnectAPIError
 from ..fsm.middleware import FSMContextMiddleware
 from ..fsm.storage.base import BaseEventIsolation, BaseStorage
@@ -16,6 +18,7 @@ from ..types import Update
 from ..types.update import UpdateTypeLookupError
 from .event.bases import UNHANDLED, SkipHandler
 from .event.connect import ConnectEventObserver
+from .middlewares.cache import CacheInvalidationMiddleware
 from .middlewares.error import ErrorsMiddleware
 from .middlewares.user_context import UserContextMiddleware
 from .router import Router
@@ -68,6 +71,10 @@ class Dispatcher(Router):
         # middlewares via caching the user and chat instances in the event context
         self.update.outer_middleware(UserContextMiddleware())
 
+        # Directory events make cached results of the bot outdated,
+        # so cache should be invalidated before handlers are called
+        self.update.outer_middleware(CacheInvalidationMiddleware())
+
         # FSM middleware should always be registered after User context middleware
         # because here is used context from previous step
         self.fsm = FSMContextMiddleware(
@@ -144,15 +151,17 @@ class Dispatcher(Router):
             update = Update.model_validate(update.model_dump(), context={"bot": bot})
 
         try:
-            response = await self.update.wrap_outer_middleware(
-                self.update.trigger,
-                update,
-                {
-                    **self.workflow_data,
-                    **kwargs,
-                    "bot": bot,
-                },
-            )
+            # Requests of handlers are replies to users, they go ahead of background traffic
+            with default_request_priority(RequestPriority.INTERACTIVE):
+                response = await self.update.wrap_outer_middleware(
+                    self.update.trigger,
+                    update,
+                    {
+                        **self.workflow_data,
+                        **kwargs,
+                        "bot": bot,
+                    },
+                )
             handled = response is not UNHANDLED
             return response
         finally:
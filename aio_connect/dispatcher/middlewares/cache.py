@@ -0,0 +1,71 @@
+from typing import Any, Awaitable, Callable, Dict, Tuple, Type
+
+from .base import BaseMiddleware
+from ...methods import (
+    ConnectMethod,
+    GetCompetences,
+    GetLines,
+    GetSpecialist,
+    GetSpecialists,
+    GetSubscriber,
+    GetSubscribers,
+    GetSubscriptions,
+)
+from ...types import ConnectObject, Update
+
+INVALIDATED_METHODS: Dict[str, Tuple[Type[ConnectMethod[Any]], ...]] = {
+    "support_line": (GetLines,),
+    "competence": (GetCompetences,),
+    "subscriber": (GetSubscriber, GetSubscribers, GetSpecialist, GetSpecialists),
+    "subscription": (GetSubscriptions,),
+}
+"""Cached methods which become outdated by the event type"""
+
+INVALIDATED_PARAMS: Dict[str, Tuple[str, Dict[str, str]]] = {
+    "support_line": ("line", {"line_id": "line_id"}),
+    "competence": ("competence", {"line_id": "line_id"}),
+    "subscriber": ("user", {"user_id": "user_id"}),
+    "subscription": ("subscription", {"line_id": "service_id", "user_id": "service_user_id"}),
+}
+"""Changed entity of the event type and its fields by parameters of requests.
+Only results of requests for the same values of these parameters or without them are dropped"""
+
+
+def invalidated_params(update: Update) -> Dict[str, Any]:
+    """
+    Parameters of requests whose cached results become outdated by the update
+
+    :return: parameter values, empty if results of all requests are outdated
+    """
+    entity_field, fields = INVALIDATED_PARAMS.get(update.event_type, ("", {}))
+    entity = getattr(getattr(update, update.event_type, None), entity_field, None)
+    if entity is None:
+        return {}
+    params = {param: getattr(entity, field, None) for param, field in fields.items()}
+    return {param: value for param, value in params.items() if value is not None}
+
+
+class CacheInvalidationMiddleware(BaseMiddleware):
+    """
+    Drop cached results of the bot when Connect reports changes of the directory data
+
+    Results are dropped only for requests related to the changed entity, e.g. competences
+    of other lines stay in the cache.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[ConnectObject, Dict[str, Any]], Awaitable[Any]],
+        event: ConnectObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            raise RuntimeError("CacheInvalidationMiddleware got an unexpected event type!")
+        bot = data.get("bot")
+        cache = getattr(bot, "cache", None)
+        if cache is not None:
+            methods = INVALIDATED_METHODS.get(event.event_type, ())
+            params = invalidated_params(event) if methods else {}
+            for method in methods:
+                await cache.invalidate(method.__name__, params)
+        return await handler(event, data)
@@ -1,7 +1,13 @@
 from .update_type import UpdateType
 from .content_type import ContentType
+from .request_priority import RequestPriority
+from .circuit_state import CircuitState
+from .overload_policy import OverloadPolicy
 
 __all__ = (
     "UpdateType",
     "ContentType",
+    "RequestPriority",
+    "CircuitState",
+    "OverloadPolicy",
 )
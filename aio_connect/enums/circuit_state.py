@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class CircuitState(str, Enum):
+    """
+    State of circuit breaker of an endpoint
+    """
+
+    CLOSED = "closed"  # Запросы проходят
+    OPEN = "open"  # Запросы отклоняются без обращения к серверу
+    HALF_OPEN = "half_open"  # Пробные запросы проверяют, восстановился ли сервер
@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class OverloadPolicy(str, Enum):
+    """
+    Behaviour of webhook ingestion queue when it is full
+    """
+
+    REJECT = "reject"  # Ответить 503, Connect доставит событие повторно
+    BLOCK = "block"  # Не отвечать, пока в очереди не освободится место
+    DROP = "drop"  # Ответить 200 и отбросить событие
@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class RequestPriority(str, Enum):
+    """
+    Priority class of outgoing request
+    """
+
+    INTERACTIVE = "interactive"  # Ответы пользователям из обработчиков событий
+    BACKGROUND = "background"  # Фоновые задачи, по умолчанию
+    BULK = "bulk"  # Рассылки и массовые загрузки
@@ -64,6 +64,14 @@ class ConnectNetworkError(ConnectAPIError):
     label = "HTTP Client says"
 
 
+class ConnectConnectionError(ConnectNetworkError):
+    """
+    Exception raised when connection to Connect server can't be established.
+
+    Request was not sent, so it is always safe to repeat it.
+    """
+
+
 class ConnectBadRequest(ConnectAPIError):
     """
     400 - Запрос содержит ошибку
@@ -100,11 +108,56 @@ class ConnectConflictError(ConnectAPIError):
     """
 
 
+class ConnectRetryAfter(ConnectAPIError):
+    """
+    429 - Слишком много запросов
+    """
+
+    def __init__(
+        self,
+        method: ConnectMethod[ConnectType],
+        message: Optional[str],
+        retry_after: Optional[float] = None,
+    ) -> None:
+        super().__init__(method=method, message=message)
+        self.retry_after = retry_after
+
+
+class ConnectCircuitOpen(ConnectAPIError):
+    """
+    Exception raised when circuit breaker of the endpoint is open.
+
+    Request was not sent, Connect is considered unavailable until :attr:`retry_after` seconds pass.
+    """
+
+    label = "Circuit breaker says"
+
+    def __init__(
+        self,
+        method: ConnectMethod[ConnectType],
+        message: Optional[str],
+        endpoint: str,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        super().__init__(method=method, message=message)
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
 class ConnectServerError(ConnectAPIError):
     """
     Exception raised when Connect server returns 5xx error.
     """
 
+    def __init__(
+        self,
+        method: ConnectMethod[ConnectType],
+        message: Optional[str],
+        retry_after: Optional[float] = None,
+    ) -> None:
+        super().__init__(method=method, message=message)
+        self.retry_after = retry_after
+
 
 class RestartingConnect(ConnectServerError):
     """
@@ -1,5 +1,6 @@
 import logging
 
+client = logging.getLogger("aio_connect.client")
 dispatcher = logging.getLogger("aio_connect.dispatcher")
 event = logging.getLogger("aio_connect.event")
 middlewares = logging.getLogger("aio_connect.middlewares")
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from functools import lru_cache
+from string import Formatter
 from typing import (
     TYPE_CHECKING,
     Any,
     ClassVar,
     Dict,
+    FrozenSet,
     Generator,
     Generic,
     Optional,
+    Type,
     TypeVar,
 )
 
@@ -25,6 +29,14 @@ if TYPE_CHECKING:
 ConnectType = TypeVar("ConnectType", bound=Any)
 
 
+@lru_cache(maxsize=None)
+def get_path_fields(method_type: Type[ConnectMethod[Any]]) -> FrozenSet[str]:
+    """
+    Names of fields which are passed in the URL of the method instead of query or body
+    """
+    return frozenset(name for _, name, _, _ in Formatter().parse(method_type.__api_path__) if name)
+
+
 class Request(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
@@ -64,6 +76,8 @@ class ConnectMethod(BotContextController, BaseModel, Generic[ConnectType], ABC):
 
     if TYPE_CHECKING:
         __returning__: ClassVar[type]
+        __type_request__: ClassVar[str]
+        __api_path__: ClassVar[str]
     else:
 
         @property
@@ -71,6 +85,28 @@ class ConnectMethod(BotContextController, BaseModel, Generic[ConnectType], ABC):
         def __returning__(self) -> type:
             pass
 
+        @property
+        @abstractmethod
+        def __type_request__(self) -> str:
+            """Тип запроса: GET, POST, PUT, DELETE или POST-With-Attach"""
+            pass
+
+        @property
+        @abstractmethod
+        def __api_path__(self) -> str:
+            """Шаблон URL, параметры пути подставляются из одноименных полей"""
+            pass
+
+    @property
+    def api_path(self) -> str:
+        """
+        URL of the method with path parameters taken from fields
+        """
+        path_fields = get_path_fields(type(self))
+        if not path_fields:
+            return self.__api_path__
+        return self.__api_path__.format(**{name: getattr(self, name) for name in path_fields})
+
     async def emit(self, bot: Bot) -> ConnectType:
         return await bot(self)
 
@@ -15,3 +15,5 @@ class DelAllHook(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "DELETE"
+    __api_path__ = "/v1/hook/"
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any
+
 from .base import ConnectMethod
 
+from ..types import UUID
+
 
 class DelHook(ConnectMethod[bool]):
     """
@@ -20,3 +24,31 @@ class DelHook(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "DELETE"
+    __api_path__ = "/v1/hook/{type}/{id}/"
+
+    id: UUID
+    """ID объекта"""
+    type: str
+    """Тип WebHook: bot (на события для чат бота), line (все события по линии(ям) поддержки)"""
+
+    if TYPE_CHECKING:
+        # DO NOT EDIT MANUALLY!!!
+        # This section was auto-generated via `butcher`
+
+        def __init__(
+            __pydantic__self__,
+            *,
+            id: UUID,
+            type: str,
+            **__pydantic_kwargs: Any,
+        ) -> None:
+            # DO NOT EDIT MANUALLY!!!
+            # This method was auto-generated via `butcher`
+            # Is needed only for type checking and IDE support without any additional plugins
+
+            super().__init__(
+                id=id,
+                type=type,
+                **__pydantic_kwargs,
+            )
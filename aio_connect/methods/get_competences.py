@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Optional
+from typing import TYPE_CHECKING, Any, List, Optional
 
 from .base import ConnectMethod
 
 from ..types import Competences, UUID
 
 
-class GetCompetences(ConnectMethod[Competences]):
+class GetCompetences(ConnectMethod[List[Competences]]):
     """
     Типы запросов: GET
     Описание: Получение списка компетенций специалистов
@@ -18,7 +18,9 @@ class GetCompetences(ConnectMethod[Competences]):
     Source: https://1c-connect.atlassian.net/wiki/spaces/PUBLIC/pages/2490302465/4.2.3.9.
     """
 
-    __returning__ = Competences
+    __returning__ = List[Competences]
+    __type_request__ = "GET"
+    __api_path__ = "/v1/line/competences/"
 
     user_id: Optional[UUID] = None
     """ID пользователя (специалиста)"""
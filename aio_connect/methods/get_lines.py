@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+from typing import List
+
 from .base import ConnectMethod
 
 from ..types import Lines
 
 
-class GetLines(ConnectMethod[Lines]):
+class GetLines(ConnectMethod[List[Lines]]):
     """
     Типы запросов: GET
     Описание: Получение доступных линий поддержки
@@ -16,4 +18,6 @@ class GetLines(ConnectMethod[Lines]):
     Source: https://1c-connect.atlassian.net/wiki/spaces/PUBLIC/pages/2156429313/4.2.3.5.
     """
 
-    __returning__ = Lines
+    __returning__ = List[Lines]
+    __type_request__ = "GET"
+    __api_path__ = "/v1/line/"
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any
+
 from .base import ConnectMethod
 
-from ..types import User
+from ..types import UUID, User
 
 
 class GetSpecialist(ConnectMethod[User]):
@@ -19,3 +21,27 @@ class GetSpecialist(ConnectMethod[User]):
     """
 
     __returning__ = User
+    __type_request__ = "GET"
+    __api_path__ = "/v1/line/specialist/{user_id}/"
+
+    user_id: UUID
+    """ID пользователя, являющегося специалистом по любой линии поддержки"""
+
+    if TYPE_CHECKING:
+        # DO NOT EDIT MANUALLY!!!
+        # This section was auto-generated via `butcher`
+
+        def __init__(
+            __pydantic__self__,
+            *,
+            user_id: UUID,
+            **__pydantic_kwargs: Any,
+        ) -> None:
+            # DO NOT EDIT MANUALLY!!!
+            # This method was auto-generated via `butcher`
+            # Is needed only for type checking and IDE support without any additional plugins
+
+            super().__init__(
+                user_id=user_id,
+                **__pydantic_kwargs,
+            )
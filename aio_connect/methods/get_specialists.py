@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+from typing import List
+
 from .base import ConnectMethod
 
 from ..types import Users
 
 
-class GetSpecialists(ConnectMethod[Users]):
+class GetSpecialists(ConnectMethod[List[Users]]):
     """
     Типы запросов: GET
     Описание: Получение информации о специалистах
@@ -16,4 +18,6 @@ class GetSpecialists(ConnectMethod[Users]):
     Source: https://1c-connect.atlassian.net/wiki/spaces/PUBLIC/pages/2167373825/4.2.3.7.
     """
 
-    __returning__ = Users
+    __returning__ = List[Users]
+    __type_request__ = "GET"
+    __api_path__ = "/v1/line/specialists/"
@@ -3,7 +3,7 @@ from __future__ import annotations
 from .base import ConnectMethod
 
 from ..types import UUID
-from typing import List
+from typing import TYPE_CHECKING, Any, List
 
 
 class GetSpecialistsAvailable(ConnectMethod[List[UUID]]):
@@ -21,3 +21,27 @@ class GetSpecialistsAvailable(ConnectMethod[List[UUID]]):
     """
 
     __returning__ = List[UUID]
+    __type_request__ = "GET"
+    __api_path__ = "/v1/line/specialists/{line_id}/available/"
+
+    line_id: UUID
+    """ID линии поддержки"""
+
+    if TYPE_CHECKING:
+        # DO NOT EDIT MANUALLY!!!
+        # This section was auto-generated via `butcher`
+
+        def __init__(
+            __pydantic__self__,
+            *,
+            line_id: UUID,
+            **__pydantic_kwargs: Any,
+        ) -> None:
+            # DO NOT EDIT MANUALLY!!!
+            # This method was auto-generated via `butcher`
+            # Is needed only for type checking and IDE support without any additional plugins
+
+            super().__init__(
+                line_id=line_id,
+                **__pydantic_kwargs,
+            )
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-from typing import Optional, TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, List, Optional
 
 from .base import ConnectMethod
 
 from ..types import Subscriptions, UUID
 
 
-class GetSubscriptions(ConnectMethod[Subscriptions]):
+class GetSubscriptions(ConnectMethod[List[Subscriptions]]):
     """
     Типы запросов: GET
     Описание: Получение списка линий, подключенных пользователям
@@ -23,7 +23,9 @@ class GetSubscriptions(ConnectMethod[Subscriptions]):
     Source: https://1c-connect.atlassian.net/wiki/spaces/PUBLIC/pages/2322923521/4.2.3.4.
     """
 
-    __returning__ = Subscriptions
+    __returning__ = List[Subscriptions]
+    __type_request__ = "GET"
+    __api_path__ = "/v1/line/subscriptions/"
 
     user_id: Optional[UUID] = None
     """ID пользователя"""
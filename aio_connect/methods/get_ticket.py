@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any
+
 from .base import ConnectMethod
 
-from ..types import TicketShort
+from ..types import UUID, TicketShort
 
 
 class GetTicket(ConnectMethod[TicketShort]):
@@ -19,3 +21,27 @@ class GetTicket(ConnectMethod[TicketShort]):
     """
 
     __returning__ = TicketShort
+    __type_request__ = "GET"
+    __api_path__ = "/v1/ticket/{id}/"
+
+    id: UUID
+    """ID заявки"""
+
+    if TYPE_CHECKING:
+        # DO NOT EDIT MANUALLY!!!
+        # This section was auto-generated via `butcher`
+
+        def __init__(
+            __pydantic__self__,
+            *,
+            id: UUID,
+            **__pydantic_kwargs: Any,
+        ) -> None:
+            # DO NOT EDIT MANUALLY!!!
+            # This method was auto-generated via `butcher`
+            # Is needed only for type checking and IDE support without any additional plugins
+
+            super().__init__(
+                id=id,
+                **__pydantic_kwargs,
+            )
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any
+
 from .base import ConnectMethod
 
 from ..types import TicketShort
@@ -19,3 +21,27 @@ class GetTicketByNumber(ConnectMethod[TicketShort]):
     """
 
     __returning__ = TicketShort
+    __type_request__ = "GET"
+    __api_path__ = "/v1/ticket/number/{number}/"
+
+    number: int
+    """№ заявки"""
+
+    if TYPE_CHECKING:
+        # DO NOT EDIT MANUALLY!!!
+        # This section was auto-generated via `butcher`
+
+        def __init__(
+            __pydantic__self__,
+            *,
+            number: int,
+            **__pydantic_kwargs: Any,
+        ) -> None:
+            # DO NOT EDIT MANUALLY!!!
+            # This method was auto-generated via `butcher`
+            # Is needed only for type checking and IDE support without any additional plugins
+
+            super().__init__(
+                number=number,
+                **__pydantic_kwargs,
+            )
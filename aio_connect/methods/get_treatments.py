@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Optional
+from typing import TYPE_CHECKING, Any, List, Optional
 
 from .base import ConnectMethod
 
 from ..types import UUID, Treatments
 
 
-class GetTreatments(ConnectMethod[Treatments]):
+class GetTreatments(ConnectMethod[List[Treatments]]):
     """
     Типы запросов: GET
     Описание: Получение открытых обращений
@@ -19,7 +19,9 @@ class GetTreatments(ConnectMethod[Treatments]):
     Source: https://1c-connect.atlassian.net/wiki/spaces/PUBLIC/pages/1289355600/4.2.3.1.
     """
 
-    __returning__ = Treatments
+    __returning__ = List[Treatments]
+    __type_request__ = "GET"
+    __api_path__ = "/v1/line/treatment/"
 
     line_id: Optional[UUID] = None
     """ID линии поддержки"""
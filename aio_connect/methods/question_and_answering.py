@@ -19,6 +19,8 @@ class QuestionAndAnswering(ConnectMethod[Answering]):
     """
 
     __returning__ = Answering
+    __type_request__ = "POST"
+    __api_path__ = "/v1/line/qna/"
 
     line_id: UUID
     """ID линии поддержки"""
@@ -67,6 +69,8 @@ class QuestionAndAnsweringSelected(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "PUT"
+    __api_path__ = "/v1/line/qna/selected/"
 
     request_id: UUID
     """ID запроса"""
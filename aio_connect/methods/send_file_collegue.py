@@ -18,6 +18,8 @@ class SendFileCollegue(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "POST-With-Attach"
+    __api_path__ = "/v1/colleague/send/file/"
 
     recepient_id: UUID
     """ID получателя"""
@@ -18,6 +18,8 @@ class SendImageColleague(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "POST-With-Attach"
+    __api_path__ = "/v1/colleague/send/image/"
 
     recepient_id: UUID
     """ID получателя"""
@@ -18,6 +18,8 @@ class SendImageConference(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "POST-With-Attach"
+    __api_path__ = "/v1/conference/send/image/"
 
     conference_id: UUID
     """ID группы"""
@@ -18,6 +18,8 @@ class SendImageLine(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "POST-With-Attach"
+    __api_path__ = "/v1/line/send/image/"
 
     line_id: UUID
     """ID линии поддержки"""
@@ -19,6 +19,8 @@ class SendMessageColleague(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "POST"
+    __api_path__ = "/v1/colleague/send/message/"
 
     recepient_id: UUID
     """ID получателя"""
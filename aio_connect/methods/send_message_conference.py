@@ -19,6 +19,8 @@ class SendMessageConference(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "POST"
+    __api_path__ = "/v1/conference/send/message/"
 
     conference_id: UUID
     """ID группы"""
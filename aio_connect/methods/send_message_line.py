@@ -19,6 +19,8 @@ class SendMessageLine(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "POST"
+    __api_path__ = "/v1/line/send/message/"
 
     line_id: UUID
     """ID линии поддержки"""
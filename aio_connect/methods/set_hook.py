@@ -19,6 +19,8 @@ class SetHook(ConnectMethod[bool]):
     """
 
     __returning__ = bool
+    __type_request__ = "POST"
+    __api_path__ = "/v1/hook/"
 
     url: str
     """URL WebHook. На этот адрес будут прилетать все события POST-запросами."""
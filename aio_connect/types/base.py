@@ -30,7 +30,11 @@ class ConnectObject(BotContextController, BaseModel):
         """
         if not isinstance(values, dict):
             return values
-        return {k: v for k, v in values.items() if not isinstance(v, UNSET_TYPE)}
+        for value in values.values():
+            if isinstance(value, UNSET_TYPE):
+                return {k: v for k, v in values.items() if not isinstance(v, UNSET_TYPE)}
+        # Nothing to remove, e.g. any object received from Connect
+        return values
 
 
 class MutableConnectObject(ConnectObject):
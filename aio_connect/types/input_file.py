@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import io
 import os
 from abc import ABC, abstractmethod
 from pathlib import Path
@@ -12,6 +11,8 @@ if TYPE_CHECKING:
     from ..client.bot import Bot
 
 DEFAULT_CHUNK_SIZE = 64 * 1024  # 64 kb
+INLINE_READ_SIZE = 1024 * 1024  # 1 mb
+"""Files up to this size are read at once in the event loop, larger ones are read by chunks in the thread pool"""
 
 
 class InputFile(ABC):
@@ -31,8 +32,17 @@ class InputFile(ABC):
         self.filename = filename
         self.chunk_size = chunk_size
 
+    @property
+    def size(self) -> Optional[int]:
+        """
+        Size of the file in bytes, None when it is unknown before reading
+
+        Files with known size are uploaded with Content-Length instead of chunked transfer.
+        """
+        return None
+
     @abstractmethod
-    async def read(self, bot: "Bot") -> AsyncGenerator[bytes, None]:  # pragma: no cover
+    async def read(self, bot: "Bot") -> AsyncGenerator[Union[bytes, memoryview], None]:  # pragma: no cover
         yield b""
 
 
@@ -71,10 +81,14 @@ class BufferedInputFile(InputFile):
             data = f.read()
         return cls(data, filename=filename, chunk_size=chunk_size)
 
-    async def read(self, bot: "Bot") -> AsyncGenerator[bytes, None]:
-        buffer = io.BytesIO(self.data)
-        while chunk := buffer.read(self.chunk_size):
-            yield chunk
+    @property
+    def size(self) -> Optional[int]:
+        return len(self.data)
+
+    async def read(self, bot: "Bot") -> AsyncGenerator[Union[bytes, memoryview], None]:
+        view = memoryview(self.data)
+        for offset in range(0, len(view), self.chunk_size):
+            yield view[offset:offset + self.chunk_size]
 
 
 class FSInputFile(InputFile):
@@ -98,10 +112,23 @@ class FSInputFile(InputFile):
 
         self.path = path
 
-    async def read(self, bot: "Bot") -> AsyncGenerator[bytes, None]:
-        async with aiofiles.open(self.path, "rb") as f:
-            while chunk := await f.read(self.chunk_size):
-                yield chunk
+    @property
+    def size(self) -> Optional[int]:
+        return os.path.getsize(self.path)
+
+    async def read(self, bot: "Bot") -> AsyncGenerator[Union[bytes, memoryview], None]:
+        if os.path.getsize(self.path) > INLINE_READ_SIZE:
+            # Reads of a large file which is not in the page cache would block the event loop
+            async with aiofiles.open(self.path, "rb") as f:
+                while chunk := await f.read(self.chunk_size):
+                    yield chunk
+            return
+        # Small file is read by one call instead of a thread pool hop per chunk
+        with open(self.path, "rb") as f:
+            data = f.read()
+        view = memoryview(data)
+        for offset in range(0, len(view), self.chunk_size):
+            yield view[offset:offset + self.chunk_size]
 
 
 class URLInputFile(InputFile):
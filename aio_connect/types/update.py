@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any, Optional, cast
 
+from pydantic import model_validator
+
 from ..utils.mypy_hacks import lru_cache
 from .base import ConnectObject
 
@@ -13,6 +15,10 @@ if TYPE_CHECKING:
     from .type_support_line import TypeSupportLine
 
 
+_ENVELOPE_FIELDS = frozenset({"event_type", "event_source"})
+_EVENT_FIELDS = frozenset({"competence", "line", "subscriber", "subscription", "support_line"})
+
+
 class Update(ConnectObject):
     """
     This `object` represents an incoming update.
@@ -40,6 +46,28 @@ class Update(ConnectObject):
     subscription: Optional[TypeSubscription] = None
     support_line: Optional[TypeSupportLine] = None
 
+    @model_validator(mode="before")
+    @classmethod
+    def unwrap_envelope(cls, values: Any) -> Any:
+        """
+        Accept update as Connect sends it: fields of the event are placed
+        next to event_type and event_source instead of the field named by event_type
+        """
+        if not isinstance(values, dict):
+            return values
+        event_type = values.get("event_type")
+        if event_type not in _EVENT_FIELDS:
+            return values
+        # Events of competence and subscription have a field named as the event type,
+        # so the nested form (e.g. model_dump) is recognized by absence of other fields
+        if event_type in values and values.keys() <= _ENVELOPE_FIELDS | _EVENT_FIELDS:
+            return values
+        return {
+            "event_type": event_type,
+            "event_source": values.get("event_source"),
+            event_type: {key: value for key, value in values.items() if key not in _ENVELOPE_FIELDS},
+        }
+
     if TYPE_CHECKING:
         # DO NOT EDIT MANUALLY!!!
         # This section was auto-generated via `butcher`
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Optional,
+    TypeVar,
+    Union,
+)
+
+from ..client.session.priority import default_request_priority
+from ..enums import RequestPriority
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+async def iterate(items: Union[Iterable[T], AsyncIterable[T]]) -> AsyncIterator[T]:
+    """
+    Iterate regular or asynchronous iterable asynchronously
+    """
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def bounded_map(
+    items: Union[Iterable[T], AsyncIterable[T]],
+    func: Callable[[T], Awaitable[R]],
+    max_concurrency: int,
+    priority: RequestPriority = RequestPriority.BULK,
+) -> AsyncIterator[R]:
+    """
+    Call :code:`func` for each item by a fixed number of workers and yield results in order of completion
+
+    Items are taken from the source lazily, at most :code:`max_concurrency` items wait for a worker,
+    so the source can be an endless stream or a database cursor. When iteration is stopped
+    or :code:`func` raises, all workers are cancelled and awaited, the error is raised to the caller.
+
+    :param items: Source of items
+    :param func: Called for each item
+    :param max_concurrency: Number of workers
+    :param priority: Priority of requests made by :code:`func` unless :func:`request_priority` is set
+    """
+    queue: asyncio.Queue[Optional[T]] = asyncio.Queue(maxsize=max_concurrency)
+    # Results are limited by the slots, so the queue itself never blocks the sender
+    results: asyncio.Queue[Any] = asyncio.Queue()
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def produce() -> None:
+        async for item in iterate(items):
+            await queue.put(item)
+        for _ in range(max_concurrency):
+            await queue.put(None)
+
+    async def work() -> None:
+        while (item := await queue.get()) is not None:
+            result = await func(item)
+            await slots.acquire()
+            results.put_nowait(result)
+
+    async def run() -> None:
+        with default_request_priority(priority):
+            tasks = [asyncio.create_task(produce()), *(asyncio.create_task(work()) for _ in range(max_concurrency))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Error of one task or stopped iteration stops all of them
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            results.put_nowait(_DONE)
+
+    runner = asyncio.create_task(run())
+    try:
+        while (result := await results.get()) is not _DONE:
+            slots.release()
+            yield result
+        await runner
+    finally:
+        runner.cancel()
+        # Workers finish their cleanup before resources used by func are released by the caller
+        await asyncio.wait([runner])
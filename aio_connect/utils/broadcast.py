@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import aiofiles
+import aiofiles.os
+
+from .. import loggers
+from ..client.session.middlewares.rate_limit import Rate, TokenBucket
+from ..exceptions import ConnectConnectionError, ConnectRetryAfter
+from ..types import BufferedInputFile, InputFile
+from .bounded import bounded_map, iterate
+
+if TYPE_CHECKING:
+    from aiofiles.threadpool.text import AsyncTextIOWrapper
+
+    from ..client.bot import Bot
+
+DEFAULT_BROADCAST_RATE = Rate(limit=20, period=1.0)
+
+_CHECKPOINT_OK = "ok"
+_CHECKPOINT_FAILED = "failed"
+
+
+class Recipient(NamedTuple):
+    line_id: str
+    """ID линии поддержки"""
+    user_id: str
+    """ID пользователя"""
+
+
+RecipientLike = Union[Recipient, Tuple[str, str]]
+Template = Union[str, Callable[[Recipient], str]]
+"""Text or function which builds text for the recipient"""
+
+
+@dataclass
+class BroadcastProgress:
+    total: int = 0
+    """Number of recipients taken from the source, including skipped"""
+    sent: int = 0
+    """Number of delivered messages"""
+    failed: int = 0
+    """Number of recipients which were not reached after all attempts"""
+    skipped: int = 0
+    """Number of recipients already processed according to the checkpoint"""
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def in_progress(self) -> int:
+        return self.total - self.sent - self.failed - self.skipped
+
+    @property
+    def throughput(self) -> float:
+        """
+        Average number of processed recipients per second
+        """
+        elapsed = time.monotonic() - self.started_at
+        return (self.sent + self.failed) / elapsed if elapsed > 0 else 0.0
+
+
+@dataclass(frozen=True)
+class BroadcastResult:
+    recipient: Recipient
+    ok: bool
+    attempts: int
+    error: Optional[BaseException] = None
+
+
+class Broadcaster:
+    """
+    Sends the same message to many recipients of support lines
+
+    Sending is limited by the number of workers and by the rate limit. Only requests which
+    surely were not processed by Connect (429, connection errors) are retried,
+    so retries never deliver the same message twice.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        max_concurrency: int = 16,
+        rate: Optional[Rate] = DEFAULT_BROADCAST_RATE,
+        max_attempts: int = 3,
+        retry_delay: float = 1.0,
+        checkpoint: Optional[Union[Path, str]] = None,
+        on_progress: Optional[Callable[[BroadcastProgress], Any]] = None,
+    ) -> None:
+        """
+
+        :param bot: Bot instance
+        :param max_concurrency: Maximum number of simultaneous requests
+        :param rate: Limit of sent messages, None - unlimited
+        :param max_attempts: Attempts for each recipient
+        :param retry_delay: Delay before the next attempt when Connect did not give Retry-After, seconds
+        :param checkpoint: File with outcomes of processed recipients. Recipients delivered according to it
+            are skipped, so interrupted broadcast can be started again with the same arguments.
+            Failed recipients and recipients whose requests were in flight at the moment of interruption
+            are sent again
+        :param on_progress: Called after each processed recipient
+        """
+        self.bot = bot
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.checkpoint = Path(checkpoint) if checkpoint is not None else None
+        self.on_progress = on_progress
+        self.progress = BroadcastProgress()
+        """Progress of the current or the last run"""
+        self._bucket = TokenBucket(rate) if rate is not None else None
+
+    async def send_message(
+        self,
+        recipients: Union[Iterable[RecipientLike], AsyncIterable[RecipientLike]],
+        text: Template,
+        **kwargs: Any,
+    ) -> AsyncIterator[BroadcastResult]:
+        """
+        Send message to each recipient, see :meth:`Bot.send_message_line`
+
+        :param recipients: (line_id, user_id) pairs
+        :param text: Text or function which builds text for the recipient
+        :param kwargs: other arguments of :meth:`Bot.send_message_line`
+        """
+
+        async def send(recipient: Recipient) -> Any:
+            return await self.bot.send_message_line(
+                line_id=recipient.line_id,
+                user_id=recipient.user_id,
+                text=self._render(text, recipient),
+                **kwargs,
+            )
+
+        async for result in self.broadcast(recipients, send):
+            yield result
+
+    async def send_file(
+        self,
+        recipients: Union[Iterable[RecipientLike], AsyncIterable[RecipientLike]],
+        file: Union[InputFile, str],
+        file_name: str,
+        comment: Optional[Template] = None,
+        image: bool = False,
+        **kwargs: Any,
+    ) -> AsyncIterator[BroadcastResult]:
+        """
+        Send file to each recipient, see :meth:`Bot.send_file_line`
+
+        File is read once before sending and all uploads share the same buffer.
+
+        :param recipients: (line_id, user_id) pairs
+        :param file: File
+        :param file_name: Имя файла
+        :param comment: Comment or function which builds comment for the recipient
+        :param image: Send as image (:meth:`Bot.send_image_line`)
+        :param kwargs: other arguments of :meth:`Bot.send_file_line`
+        """
+        if isinstance(file, InputFile) and not isinstance(file, BufferedInputFile):
+            data = bytearray()
+            async for chunk in file.read(self.bot):
+                data += chunk
+            file = BufferedInputFile(bytes(data), filename=file.filename or file_name)
+        method = self.bot.send_image_line if image else self.bot.send_file_line
+
+        async def send(recipient: Recipient) -> Any:
+            return await method(
+                line_id=recipient.line_id,
+                user_id=recipient.user_id,
+                file=file,
+                file_name=file_name,
+                comment=self._render(comment, recipient) if comment is not None else None,
+                **kwargs,
+            )
+
+        async for result in self.broadcast(recipients, send):
+            yield result
+
+    @staticmethod
+    def _render(template: Template, recipient: Recipient) -> str:
+        if callable(template):
+            return template(recipient)
+        return template
+
+    async def _wait_rate(self) -> None:
+        if self._bucket is not None:
+            delay = self._bucket.reserve(time.monotonic())
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def _send(
+        self, recipient: Recipient, send: Callable[[Recipient], Awaitable[Any]]
+    ) -> BroadcastResult:
+        error: Optional[BaseException] = None
+        for attempt in range(1, self.max_attempts + 1):
+            await self._wait_rate()
+            try:
+                await send(recipient)
+                return BroadcastResult(recipient=recipient, ok=True, attempts=attempt)
+            except (ConnectRetryAfter, ConnectConnectionError) as e:
+                error = e
+                delay = getattr(e, "retry_after", None) or self.retry_delay * attempt
+            except Exception as e:
+                # Message might be already delivered or will never be, don't retry
+                return BroadcastResult(recipient=recipient, ok=False, attempts=attempt, error=e)
+            if attempt < self.max_attempts:
+                loggers.client.debug(
+                    "Broadcast to %s failed (attempt %d/%d): %s, retry in %.2f s",
+                    recipient, attempt, self.max_attempts, type(error).__name__, delay,
+                )
+                await asyncio.sleep(delay)
+        return BroadcastResult(recipient=recipient, ok=False, attempts=self.max_attempts, error=error)
+
+    async def _load_checkpoint(self) -> Set[Recipient]:
+        if self.checkpoint is None or not await aiofiles.os.path.exists(self.checkpoint):
+            return set()
+        async with aiofiles.open(self.checkpoint, "r", encoding="utf-8") as f:
+            content = await f.read()
+        sent = set()
+        for line in content.splitlines():
+            parts = line.split("\t")
+            # Last line may be incomplete after crash, failed recipients are sent again
+            if len(parts) == 3 and parts[2] == _CHECKPOINT_OK:
+                sent.add(Recipient(parts[0], parts[1]))
+        return sent
+
+    def _report(self, result: BroadcastResult) -> None:
+        if result.ok:
+            self.progress.sent += 1
+        else:
+            self.progress.failed += 1
+            loggers.client.warning(
+                "Broadcast to %s failed: %s: %s", result.recipient, type(result.error).__name__, result.error
+            )
+        if self.on_progress is not None:
+            self.on_progress(self.progress)
+
+    async def broadcast(
+        self,
+        recipients: Union[Iterable[RecipientLike], AsyncIterable[RecipientLike]],
+        send: Callable[[Recipient], Awaitable[Any]],
+    ) -> AsyncIterator[BroadcastResult]:
+        """
+        Call :code:`send` for each recipient and yield results in order of completion
+
+        Recipients are taken from the source lazily, so the source can be a database cursor.
+        Requests are sent with bulk priority unless :func:`request_priority` is set.
+        """
+        # Each run reports its own progress
+        self.progress = BroadcastProgress()
+        sent = await self._load_checkpoint()
+
+        async def take() -> AsyncIterator[Recipient]:
+            async for item in iterate(recipients):
+                recipient = Recipient(str(item[0]), str(item[1]))
+                self.progress.total += 1
+                if recipient in sent:
+                    self.progress.skipped += 1
+                    continue
+                yield recipient
+
+        async def process(recipient: Recipient) -> BroadcastResult:
+            result = await self._send(recipient, send)
+            if checkpoint is not None:
+                # Outcome is recorded before the result is consumed,
+                # so stopped iteration can't lead to the second delivery on resume
+                status = _CHECKPOINT_OK if result.ok else _CHECKPOINT_FAILED
+                async with checkpoint_lock:
+                    await checkpoint.write(f"{recipient.line_id}\t{recipient.user_id}\t{status}\n")
+                    await checkpoint.flush()
+            self._report(result)
+            return result
+
+        checkpoint: Optional[AsyncTextIOWrapper] = None
+        checkpoint_lock = asyncio.Lock()
+        if self.checkpoint is not None:
+            # File is written in the thread pool, so the loop is not blocked by the disk
+            await aiofiles.os.makedirs(self.checkpoint.parent, exist_ok=True)
+            checkpoint = await aiofiles.open(self.checkpoint, "a", encoding="utf-8")
+        try:
+            async for result in bounded_map(take(), process, self.max_concurrency):
+                yield result
+        finally:
+            if checkpoint is not None:
+                await checkpoint.close()
+
+    async def broadcast_all(
+        self,
+        recipients: Union[Iterable[RecipientLike], AsyncIterable[RecipientLike]],
+        send: Callable[[Recipient], Awaitable[Any]],
+    ) -> List[BroadcastResult]:
+        """
+        Call :code:`send` for each recipient and return all results
+        """
+        return [result async for result in self.broadcast(recipients, send)]
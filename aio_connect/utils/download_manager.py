@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+
+from aiohttp import ClientError
+
+from .. import loggers
+from ..exceptions import AioconnectError
+from ..types import File
+from .bounded import bounded_map, iterate
+
+if TYPE_CHECKING:
+    from ..client.bot import Bot
+
+DEFAULT_MAX_BYTES_IN_FLIGHT = 256 * 1024 * 1024  # 256 mb
+
+
+@dataclass
+class DownloadProgress:
+    total: int = 0
+    """Number of files taken from the source"""
+    completed: int = 0
+    """Number of downloaded files"""
+    failed: int = 0
+    """Number of files which were not downloaded after all attempts"""
+    bytes_downloaded: int = 0
+    """Size of downloaded files, bytes"""
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def in_progress(self) -> int:
+        return self.total - self.completed - self.failed
+
+    @property
+    def throughput(self) -> float:
+        """
+        Average download speed, bytes per second
+        """
+        elapsed = time.monotonic() - self.started_at
+        return self.bytes_downloaded / elapsed if elapsed > 0 else 0.0
+
+
+@dataclass(frozen=True)
+class DownloadResult:
+    file: File
+    destination: Path
+    ok: bool
+    attempts: int
+    error: Optional[BaseException] = None
+
+
+class _BytesLimiter:
+    """
+    Semaphore counted in bytes
+
+    Request larger than the limit waits until nothing else is in flight.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, size: int) -> int:
+        size = min(size, self.limit)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight + size <= self.limit)
+            self.in_flight += size
+        return size
+
+    async def release(self, size: int) -> None:
+        async with self._condition:
+            self.in_flight -= size
+            self._condition.notify_all()
+
+
+class DownloadManager:
+    """
+    Downloads stream of :class:`File` objects concurrently through the bot session
+
+    Concurrency is limited by the number of workers and by the total size of files in flight.
+    Files failed with network errors or timeouts are retried individually and partially downloaded
+    files are resumed, files which Connect refused to serve (e.g. 404) are not retried.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        directory: Union[Path, str],
+        max_concurrency: int = 4,
+        max_bytes_in_flight: int = DEFAULT_MAX_BYTES_IN_FLIGHT,
+        max_attempts: int = 3,
+        retry_delay: float = 1.0,
+        timeout: int = 300,
+        on_progress: Optional[Callable[[DownloadProgress], Any]] = None,
+        filename: Optional[Callable[[File], str]] = None,
+    ) -> None:
+        """
+
+        :param bot: Bot instance
+        :param directory: Directory for downloaded files
+        :param max_concurrency: Maximum number of simultaneous downloads
+        :param max_bytes_in_flight: Maximum total size of simultaneously downloaded files
+        :param max_attempts: Attempts for each file
+        :param retry_delay: Delay before the next attempt, seconds
+        :param timeout: Total timeout of a single attempt, seconds
+        :param on_progress: Called after each finished file
+        :param filename: Build file name from :class:`File`,
+            by default "<file_id>_<file_name>"
+        """
+        self.bot = bot
+        self.directory = Path(directory)
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.on_progress = on_progress
+        self.filename = filename or self._default_filename
+        self.progress = DownloadProgress()
+        """Progress of the current or the last run"""
+        self._bytes = _BytesLimiter(max_bytes_in_flight)
+
+    @staticmethod
+    def _default_filename(file: File) -> str:
+        return f"{file.file_id}_{os.path.basename(file.file_name)}"
+
+    async def _download_file(self, file: File) -> DownloadResult:
+        destination = self.directory / self.filename(file)
+        reserved = await self._bytes.acquire(file.file_size)
+        error: Optional[BaseException] = None
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    downloaded = await self.bot.download_file(
+                        file_path=file.file_path, destination=destination, timeout=self.timeout
+                    )
+                except (ClientError, OSError, asyncio.TimeoutError) as e:
+                    error = e
+                    loggers.client.warning(
+                        "Failed to download %s (attempt %d/%d): %s: %s",
+                        file.file_name, attempt, self.max_attempts, type(e).__name__, e,
+                    )
+                else:
+                    if downloaded:
+                        return DownloadResult(file=file, destination=destination, ok=True, attempts=attempt)
+                    # Connect answered with error status (e.g. file was deleted), next attempt gets the same
+                    error = AioconnectError(f"Connect refused to serve file {file.file_name} ({file.file_path})")
+                    return DownloadResult(
+                        file=file, destination=destination, ok=False, attempts=attempt, error=error
+                    )
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(self.retry_delay * attempt)
+            return DownloadResult(
+                file=file, destination=destination, ok=False, attempts=self.max_attempts, error=error
+            )
+        finally:
+            await self._bytes.release(reserved)
+
+    def _report(self, result: DownloadResult) -> None:
+        if result.ok:
+            self.progress.completed += 1
+            self.progress.bytes_downloaded += result.file.file_size
+        else:
+            self.progress.failed += 1
+        if self.on_progress is not None:
+            self.on_progress(self.progress)
+
+    async def download(
+        self, files: Union[Iterable[File], AsyncIterable[File]]
+    ) -> AsyncIterator[DownloadResult]:
+        """
+        Download files and yield results in order of completion
+
+        Files are taken from the source lazily, so the source can be an endless stream.
+        Files are downloaded with bulk priority unless :func:`request_priority` is set.
+        """
+        # Each run reports its own progress
+        self.progress = DownloadProgress()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        async def take() -> AsyncIterator[File]:
+            async for file in iterate(files):
+                self.progress.total += 1
+                yield file
+
+        async def process(file: File) -> DownloadResult:
+            result = await self._download_file(file)
+            self._report(result)
+            return result
+
+        async for result in bounded_map(take(), process, self.max_concurrency):
+            yield result
+
+    async def download_all(self, files: Union[Iterable[File], AsyncIterable[File]]) -> List[DownloadResult]:
+        """
+        Download files and return all results
+        """
+        return [result async for result in self.download(files)]
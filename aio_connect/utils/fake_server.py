@@ -0,0 +1,501 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import time
+import uuid
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from enum import Enum
+from http import HTTPStatus
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+)
+
+from aiohttp import BasicAuth, web
+from aiohttp.hdrs import AUTHORIZATION, CONTENT_RANGE, RANGE, RETRY_AFTER
+from pydantic import BaseModel, ValidationError
+
+from .. import loggers
+from ..client.session.middlewares.rate_limit import Rate, TokenBucket
+from ..methods import (
+    AppointSpec,
+    AppointStart,
+    ConnectMethod,
+    DelAllHook,
+    DelHook,
+    DropKeyboard,
+    DropTreatment,
+    GetCompetences,
+    GetLines,
+    GetSpecialist,
+    GetSpecialists,
+    GetSpecialistsAvailable,
+    GetSubscriber,
+    GetSubscribers,
+    GetSubscriptions,
+    GetTicket,
+    GetTicketByNumber,
+    GetTreatments,
+    QuestionAndAnswering,
+    QuestionAndAnsweringSelected,
+    SendFileCollegue,
+    SendFileConference,
+    SendFileLine,
+    SendImageColleague,
+    SendImageConference,
+    SendImageLine,
+    SendMessageColleague,
+    SendMessageConference,
+    SendMessageLine,
+    SetHook,
+)
+from ..types import BufferedInputFile
+from .json_backend import get_json_backend
+
+FAKE_METHODS: Tuple[Type[ConnectMethod[Any]], ...] = (
+    SetHook,
+    DelAllHook,
+    DelHook,
+    GetTreatments,
+    GetSubscriber,
+    GetSubscribers,
+    GetSubscriptions,
+    GetLines,
+    GetSpecialist,
+    GetSpecialists,
+    GetSpecialistsAvailable,
+    GetCompetences,
+    GetTicket,
+    GetTicketByNumber,
+    AppointStart,
+    AppointSpec,
+    DropTreatment,
+    SendMessageLine,
+    SendFileLine,
+    SendImageLine,
+    DropKeyboard,
+    SendMessageColleague,
+    SendFileCollegue,
+    SendImageColleague,
+    SendMessageConference,
+    SendFileConference,
+    SendImageConference,
+    QuestionAndAnswering,
+    QuestionAndAnsweringSelected,
+)
+"""Methods served by :class:`FakeConnectServer`"""
+
+FILES_PATH = "/files/"
+
+_HTTP_METHODS = {
+    "GET": "GET",
+    "DELETE": "DELETE",
+    "POST": "POST",
+    "POST-With-Attach": "POST",
+    "PUT": "PUT",
+}
+
+
+@dataclass(frozen=True)
+class Latency:
+    """
+    Distribution of response latency: log-normal body with rare spikes
+    """
+
+    median: float = 0.0
+    """Median latency, seconds"""
+    sigma: float = 0.0
+    """Standard deviation of log of latency, 0 - constant latency"""
+    spike_rate: float = 0.0
+    """Share of responses delayed by :attr:`spike`"""
+    spike: float = 0.0
+    """Extra delay of slow responses, seconds"""
+
+    def sample(self, rng: random.Random) -> float:
+        delay = self.median
+        if delay and self.sigma:
+            delay = rng.lognormvariate(math.log(delay), self.sigma)
+        if self.spike_rate and rng.random() < self.spike_rate:
+            delay += self.spike
+        return delay
+
+
+@dataclass(frozen=True)
+class ErrorInjection:
+    rate: float = 0.0
+    """Share of requests answered with error"""
+    status: int = HTTPStatus.INTERNAL_SERVER_ERROR
+    """Status of injected errors"""
+    retry_after: Optional[float] = None
+    """Value of Retry-After header, seconds"""
+    message: str = "Injected error"
+
+
+@dataclass
+class RouteConfig:
+    latency: Latency = field(default_factory=Latency)
+    errors: Optional[ErrorInjection] = None
+    rate: Optional[Rate] = None
+    """Limit of requests, requests above the limit are answered with 429"""
+
+
+@dataclass(frozen=True)
+class ReceivedRequest:
+    method: str
+    """Name of the method class"""
+    data: Dict[str, Any]
+    """Validated fields of the method"""
+    received_at: float
+
+
+@dataclass
+class FakeServerStats:
+    requests: Counter[str] = field(default_factory=Counter)
+    """Requests by method name"""
+    statuses: Counter[int] = field(default_factory=Counter)
+    """Responses by status"""
+    invalid: int = 0
+    """Requests rejected by validation"""
+    rate_limited: int = 0
+    """Requests rejected by rate limit"""
+    injected_errors: int = 0
+    bytes_received: int = 0
+    bytes_sent: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": dict(self.requests),
+            "statuses": dict(self.statuses),
+            "invalid": self.invalid,
+            "rate_limited": self.rate_limited,
+            "injected_errors": self.injected_errors,
+            "bytes_received": self.bytes_received,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+def sample_value(annotation: Any, rng: random.Random, name: str = "", list_size: int = 3, depth: int = 0) -> Any:
+    """
+    Build JSON value matching the type annotation of Connect object field
+    """
+    if isinstance(annotation, TypeVar):
+        # UUID of aio_connect.types
+        return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    origin = get_origin(annotation)
+    if origin is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return sample_value(args[0], rng, name, list_size, depth)
+    if origin is Literal:
+        return get_args(annotation)[0]
+    if origin in (list, List):
+        (item,) = get_args(annotation) or (Any,)
+        return [sample_value(item, rng, name, list_size, depth + 1) for _ in range(list_size)]
+    if origin in (dict, Dict):
+        return {}
+    if origin is not None:
+        # Annotated and other wrappers
+        return sample_value(get_args(annotation)[0], rng, name, list_size, depth)
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            if depth > 5:
+                return None
+            return {
+                key: sample_value(info.annotation, rng, key, list_size, depth + 1)
+                for key, info in annotation.model_fields.items()
+            }
+        if issubclass(annotation, Enum):
+            return next(iter(annotation)).value
+        if issubclass(annotation, bool):
+            return rng.random() < 0.5
+        if issubclass(annotation, int):
+            return rng.randint(1, 100000)
+        if issubclass(annotation, float):
+            return round(rng.uniform(0, 1000), 2)
+        if issubclass(annotation, datetime):
+            return datetime.now(timezone.utc).isoformat()
+        if issubclass(annotation, uuid.UUID):
+            return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        if issubclass(annotation, str):
+            return f"{name or 'value'} {rng.randint(1, 1000)}"
+    return None
+
+
+class FakeConnectServer:
+    """
+    Local stand-in of Connect API for benchmarks and integration tests
+
+    Serves every method of :obj:`FAKE_METHODS` on its real path: checks Basic auth,
+    validates the request with the method model and answers with payload
+    generated from :attr:`ConnectMethod.__returning__`. Path and query fields of the request
+    (e.g. ticket id) are echoed in the payload.
+    Latency, errors and rate limit can be set for all methods or for each method.
+
+    >>> async with FakeConnectServer(latency=Latency(median=0.05, sigma=0.5)) as server:
+    ...     bot = Bot(server.login, server.password, line_id, server.base)
+    ...     await bot.send_message_line(...)
+    ...     server.stats.requests["SendMessageLine"]
+    """
+
+    def __init__(
+        self,
+        login: str = "login",
+        password: str = "password",
+        latency: Optional[Latency] = None,
+        errors: Optional[ErrorInjection] = None,
+        rate: Optional[Rate] = None,
+        list_size: int = 3,
+        history: int = 1000,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+
+        :param login: Expected API login
+        :param password: Expected API password
+        :param latency: Latency of all methods
+        :param errors: Errors injected into all methods
+        :param rate: Limit of all requests, requests above the limit are answered with 429
+        :param list_size: Number of items in list results
+        :param history: Number of last valid requests kept in :attr:`received`
+        :param seed: Seed of latency, errors and payloads
+        """
+        self.login = login
+        self.password = password
+        self.default = RouteConfig(latency=latency or Latency(), errors=errors, rate=rate)
+        self.routes: Dict[Type[ConnectMethod[Any]], RouteConfig] = {}
+        self.list_size = list_size
+        self.stats = FakeServerStats()
+        self.received: Deque[ReceivedRequest] = deque(maxlen=history)
+        self.files: Dict[str, bytes] = {}
+        self.rng = random.Random(seed)
+
+        self._json = get_json_backend()
+        self._auth = BasicAuth(login, password).encode()
+        self._global_bucket = TokenBucket(rate) if rate is not None else None
+        self._buckets: Dict[Type[ConnectMethod[Any]], TokenBucket] = {}
+        self._payloads: Dict[Type[ConnectMethod[Any]], Any] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.base: Optional[str] = None
+        """Base URL of the running server, pass it to :class:`Bot`"""
+
+    def configure(
+        self,
+        method: Type[ConnectMethod[Any]],
+        latency: Optional[Latency] = None,
+        errors: Optional[ErrorInjection] = None,
+        rate: Optional[Rate] = None,
+    ) -> None:
+        """
+        Override latency, errors and rate limit of the method
+        """
+        self.routes[method] = RouteConfig(
+            latency=latency or self.default.latency,
+            errors=errors if errors is not None else self.default.errors,
+            rate=rate,
+        )
+        self._buckets.pop(method, None)
+        if rate is not None:
+            self._buckets[method] = TokenBucket(rate)
+
+    def set_payload(self, method: Type[ConnectMethod[Any]], payload: Any) -> None:
+        """
+        Answer the method with the given JSON payload instead of generated one
+        """
+        self._payloads[method] = payload
+
+    def add_file(self, name: str, data: bytes) -> str:
+        """
+        Serve file for :meth:`Bot.download_file`, Range requests are supported
+
+        :return: URL of the file
+        """
+        self.files[name] = data
+        return f"{self.base or ''}{FILES_PATH}{name}"
+
+    def reset(self) -> None:
+        self.stats = FakeServerStats()
+        self.received.clear()
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        for method in FAKE_METHODS:
+            app.router.add_route(
+                _HTTP_METHODS[method.__type_request__], method.__api_path__, self._make_handler(method)
+            )
+        app.router.add_get(FILES_PATH + "{name}", self._handle_file)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Start server
+
+        :param port: Port, 0 - any free port
+        :return: Base URL
+        """
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        address = self._runner.addresses[0]
+        self.base = f"http://{address[0]}:{address[1]}"
+        loggers.webhook.info("Fake Connect server is listening on %s", self.base)
+        return self.base
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> FakeConnectServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    def _reply(self, status: int, body: Any = None, headers: Optional[Dict[str, str]] = None) -> web.Response:
+        self.stats.statuses[int(status)] += 1
+        raw = self._json.dumpb(body) if body is not None else b""
+        self.stats.bytes_sent += len(raw)
+        return web.Response(
+            status=status, body=raw, headers=headers, content_type="application/json" if raw else None
+        )
+
+    def _throttled(self, method: Type[ConnectMethod[Any]]) -> Optional[float]:
+        now = time.monotonic()
+        for bucket in (self._global_bucket, self._buckets.get(method)):
+            if bucket is None:
+                continue
+            delay = bucket.reserve(now)
+            if delay:
+                # Rejected request does not take the token
+                bucket.tokens += 1
+                return delay
+        return None
+
+    async def _read_data(self, request: web.Request, method: Type[ConnectMethod[Any]]) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        if method.__type_request__ in ("GET", "DELETE"):
+            data.update(request.query)
+        elif method.__type_request__ == "POST-With-Attach":
+            form = await request.post()
+            meta = form.get("meta")
+            if isinstance(meta, web.FileField):
+                meta = meta.file.read()
+            if meta is not None:
+                data.update(self._json.loads(bytes(meta) if isinstance(meta, bytearray) else meta))
+            upload = form.get("file")
+            if isinstance(upload, web.FileField):
+                data["file"] = BufferedInputFile(upload.file.read(), filename=upload.filename)
+        else:
+            body = await request.read()
+            if body:
+                data.update(self._json.loads(body))
+        data.update(request.match_info)
+        return data
+
+    def _payload(self, method: Type[ConnectMethod[Any]], request: Dict[str, Any]) -> Any:
+        payload = self._payloads.get(method)
+        if payload is None:
+            payload = self._payloads[method] = sample_value(
+                method.__returning__, self.rng, list_size=self.list_size
+            )
+        # Echo requested identifiers, e.g. GetTicket returns the ticket with requested id
+        if isinstance(payload, dict):
+            return {**payload, **{k: request[k] for k in payload.keys() & request.keys()}}
+        if isinstance(payload, list) and payload and isinstance(payload[0], dict):
+            keys = payload[0].keys() & request.keys()
+            if keys:
+                return [{**item, **{k: request[k] for k in keys}} for item in payload]
+        return payload
+
+    def _make_handler(self, method: Type[ConnectMethod[Any]]) -> Any:
+        async def handle(request: web.Request) -> web.Response:
+            return await self._handle(request, method)
+
+        return handle
+
+    async def _handle(self, request: web.Request, method: Type[ConnectMethod[Any]]) -> web.Response:
+        name = method.__name__
+        self.stats.requests[name] += 1
+        self.stats.bytes_received += request.content_length or 0
+        config = self.routes.get(method, self.default)
+
+        if request.headers.get(AUTHORIZATION) != self._auth:
+            return self._reply(HTTPStatus.UNAUTHORIZED, {"error": "Unauthorized"})
+
+        retry_after = self._throttled(method)
+        if retry_after is not None:
+            self.stats.rate_limited += 1
+            return self._reply(
+                HTTPStatus.TOO_MANY_REQUESTS,
+                {"error": "Too many requests"},
+                headers={RETRY_AFTER: str(max(1, math.ceil(retry_after)))},
+            )
+
+        delay = config.latency.sample(self.rng)
+        if delay:
+            await asyncio.sleep(delay)
+
+        errors = config.errors
+        if errors is not None and errors.rate and self.rng.random() < errors.rate:
+            self.stats.injected_errors += 1
+            headers = {RETRY_AFTER: str(errors.retry_after)} if errors.retry_after is not None else None
+            return self._reply(errors.status, {"error": errors.message}, headers=headers)
+
+        try:
+            data = await self._read_data(request, method)
+            validated = method.model_validate(data)
+        except (ValidationError, ValueError) as e:
+            self.stats.invalid += 1
+            return self._reply(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+
+        self.received.append(
+            ReceivedRequest(
+                method=name,
+                data=validated.model_dump(exclude_none=True, exclude={"file"}),
+                received_at=time.time(),
+            )
+        )
+        if method.__returning__ is bool:
+            return self._reply(HTTPStatus.OK)
+        return self._reply(HTTPStatus.OK, self._payload(method, data))
+
+    async def _handle_file(self, request: web.Request) -> web.Response:
+        data = self.files.get(request.match_info["name"])
+        if data is None:
+            return self._reply(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+        range_header = request.headers.get(RANGE)
+        if range_header is None or not range_header.startswith("bytes="):
+            self.stats.statuses[int(HTTPStatus.OK)] += 1
+            self.stats.bytes_sent += len(data)
+            return web.Response(body=data)
+        start_raw, _, end_raw = range_header[len("bytes="):].partition("-")
+        start = int(start_raw or 0)
+        end = int(end_raw) if end_raw else len(data) - 1
+        if start >= len(data):
+            return self._reply(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        chunk = data[start:end + 1]
+        self.stats.statuses[int(HTTPStatus.PARTIAL_CONTENT)] += 1
+        self.stats.bytes_sent += len(chunk)
+        return web.Response(
+            status=HTTPStatus.PARTIAL_CONTENT,
+            body=chunk,
+            headers={CONTENT_RANGE: f"bytes {start}-{start + len(chunk) - 1}/{len(data)}"},
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.stats.as_dict()
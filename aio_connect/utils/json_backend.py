@@ -0,0 +1,120 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Type, Union
+
+JsonInput = Union[bytes, bytearray, memoryview, str]
+
+
+class JsonBackend(ABC):
+    """
+    JSON serializer used by sessions, webhooks and storages
+
+    Backends work with bytes natively, so payloads are not decoded to :class:`str` on the way.
+    Stdlib json is used by default, orjson and ujson are used only when they are requested
+    (:code:`pip install aio-1c-connect[fast]` installs orjson).
+    """
+
+    name: str
+
+    @abstractmethod
+    def loads(self, data: JsonInput) -> Any:
+        pass
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> str:
+        pass
+
+    @abstractmethod
+    def dumpb(self, obj: Any) -> bytes:
+        pass
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class StdlibJsonBackend(JsonBackend):
+    name = "json"
+
+    def loads(self, data: JsonInput) -> Any:
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj)
+
+    def dumpb(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+
+class OrjsonBackend(JsonBackend):
+    """
+    Output is compact and not ASCII-escaped, unlike :func:`json.dumps`
+    """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson  # type: ignore
+
+        self._orjson = orjson
+
+    def loads(self, data: JsonInput) -> Any:
+        return self._orjson.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        return self._orjson.dumps(obj).decode()
+
+    def dumpb(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj)
+
+
+class UjsonBackend(JsonBackend):
+    """
+    Output is compact and not ASCII-escaped, unlike :func:`json.dumps`
+    """
+
+    name = "ujson"
+
+    def __init__(self) -> None:
+        import ujson  # type: ignore
+
+        self._ujson = ujson
+
+    def loads(self, data: JsonInput) -> Any:
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return self._ujson.loads(data)
+
+    def dumps(self, obj: Any) -> str:
+        return self._ujson.dumps(obj, ensure_ascii=False)
+
+    def dumpb(self, obj: Any) -> bytes:
+        return self._ujson.dumps(obj, ensure_ascii=False).encode()
+
+
+JSON_BACKENDS: Dict[str, Type[JsonBackend]] = {
+    backend.name: backend for backend in (StdlibJsonBackend, OrjsonBackend, UjsonBackend)
+}
+
+_backends: Dict[str, JsonBackend] = {}
+
+
+def get_json_backend(name: Optional[str] = None) -> JsonBackend:
+    """
+    Get JSON backend by name
+
+    :param name: :code:`json`, :code:`orjson` or :code:`ujson`, stdlib json by default
+    :raise ImportError: if the requested library is not installed
+    """
+    if name is None:
+        name = StdlibJsonBackend.name
+    backend = _backends.get(name)
+    if backend is None:
+        if name not in JSON_BACKENDS:
+            raise ValueError(f"Unknown JSON backend {name!r}, expected one of {', '.join(JSON_BACKENDS)}")
+        try:
+            backend = _backends[name] = JSON_BACKENDS[name]()
+        except ImportError as e:
+            raise ImportError(f"JSON backend {name!r} requires {name} to be installed") from e
+    return backend
@@ -0,0 +1,141 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Optional, Protocol, Sequence, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+"""Upper bounds of latency histogram buckets, seconds"""
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets, compatible with Prometheus histograms
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Add observations of other histogram with the same buckets
+        """
+        if other.buckets != self.buckets:
+            raise ValueError("Histograms have different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """
+        Cumulative counts by upper bound, the last bound is :code:`inf`
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate quantile by linear interpolation inside the bucket
+
+        :param q: quantile, 0..1
+        :return: value or None if nothing was observed
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = 0.0
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            if total + count >= rank and count:
+                return lower + (bound - lower) * (rank - total) / count
+            total += count
+            lower = bound
+        return self.buckets[-1] if self.buckets else None
+
+
+@dataclass
+class MetricFamily:
+    """
+    Group of samples with the same name, rendered as one Prometheus metric
+    """
+
+    name: str
+    type: str
+    """counter, gauge or histogram"""
+    help: str
+    samples: List[Tuple[str, Labels, float]] = field(default_factory=list)
+    """Samples as (name suffix, labels, value)"""
+
+    def add(self, value: float, labels: Mapping[str, str], suffix: str = "") -> None:
+        self.samples.append((suffix, tuple(labels.items()), value))
+
+    def add_histogram(self, histogram: Histogram, labels: Mapping[str, str]) -> None:
+        for bound, count in histogram.cumulative():
+            self.add(count, {**labels, "le": _format_value(bound)}, suffix="_bucket")
+        self.add(histogram.sum, labels, suffix="_sum")
+        self.add(histogram.count, labels, suffix="_count")
+
+
+class MetricsCollector(Protocol):
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        """
+        Collect current values
+
+        :param labels: constant labels added to each sample
+        """
+        ...
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(families: Iterable[MetricFamily]) -> str:
+    """
+    Render metrics in Prometheus text exposition format
+
+    Families with the same name (e.g. from several sessions) are merged.
+    """
+    merged: Dict[str, MetricFamily] = {}
+    for family in families:
+        target = merged.get(family.name)
+        if target is None:
+            merged[family.name] = MetricFamily(family.name, family.type, family.help, list(family.samples))
+        else:
+            target.samples.extend(family.samples)
+
+    lines = []
+    for family in merged.values():
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for suffix, labels, value in family.samples:
+            if labels:
+                rendered = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels)
+                lines.append(f"{family.name}{suffix}{{{rendered}}} {_format_value(value)}")
+            else:
+                lines.append(f"{family.name}{suffix} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -1,20 +1,42 @@
 import asyncio
+import logging
+import random
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Set
+from functools import partial
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
 
 from aiohttp import web
 from aiohttp.abc import Application
+from aiohttp.hdrs import CONTENT_TYPE, RETRY_AFTER
 
-from .. import Bot, Dispatcher
+from .. import Bot, Dispatcher, loggers
 from ..methods import ConnectMethod
+from ..types import Update
+from ..utils.metrics import MetricFamily, MetricsCollector, render_prometheus
+from .dedup import UpdateDeduplicator, update_key
+from .ingestion import IngestionQueue, conversation_key
+from .journal import JournalEntry, UpdateJournal
 
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
-def setup_application(app: Application, dispatcher: Dispatcher, /, **kwargs: Any) -> None:
+
+def setup_application(
+    app: Application,
+    dispatcher: Dispatcher,
+    /,
+    metrics_path: Optional[str] = None,
+    warm_up_connections: int = 0,
+    **kwargs: Any,
+) -> None:
     """
     This function helps to configure a startup-shutdown process
 
     :param app: aiohttp application
     :param dispatcher: aio-connect dispatcher
+    :param metrics_path: Route for metrics in Prometheus text format,
+        request metrics of bots passed as :code:`bot` or :code:`bots` are exposed
+    :param warm_up_connections: Open connections of bots passed as :code:`bot` or :code:`bots`
+        on startup and keep them alive (see :meth:`Bot.warm_up`)
     :param kwargs: additional data
     :return:
     """
@@ -25,7 +47,13 @@ def setup_application(app: Application, dispatcher: Dispatcher, /, **kwargs: Any
         **kwargs,
     }
 
+    bots = list(workflow_data.get("bots", ()))
+    if "bot" in workflow_data:
+        bots.insert(0, workflow_data["bot"])
+
     async def on_startup(*a: Any, **kw: Any) -> None:  # pragma: no cover
+        if warm_up_connections:
+            await asyncio.gather(*(bot.warm_up(connections=warm_up_connections) for bot in bots))
         await dispatcher.emit_startup(**workflow_data)
 
     async def on_shutdown(*a: Any, **kw: Any) -> None:  # pragma: no cover
@@ -34,11 +62,59 @@ def setup_application(app: Application, dispatcher: Dispatcher, /, **kwargs: Any
     app.on_startup.append(on_startup)
     app.on_shutdown.append(on_shutdown)
 
+    if metrics_path is not None:
+        MetricsRequestHandler(*bots).register(app, path=metrics_path)
+
+
+class MetricsRequestHandler:
+    def __init__(self, *bots: Bot) -> None:
+        """
+        Handler that renders collected metrics in Prometheus text format
+
+        :param bots: bots whose session metrics are exposed, labeled by :code:`line_id`.
+            Priority lanes and request middlewares with :code:`collect` method are exposed too
+        """
+        self.collectors: List[Tuple[MetricsCollector, Mapping[str, str]]] = []
+        seen: Set[int] = set()
+        for bot in bots:
+            middlewares = [m for m in bot.session.middleware if callable(getattr(m, "collect", None))]
+            for collector in (bot.session.metrics, bot.session.lanes, *middlewares):
+                if collector is not None and id(collector) not in seen:
+                    seen.add(id(collector))
+                    self.add_collector(collector, line_id=str(bot.line_id))
+
+    def add_collector(self, collector: MetricsCollector, **labels: str) -> None:
+        """
+        Expose metrics of collector
+
+        :param collector: object with :code:`collect(labels)` method
+        :param labels: constant labels of collector samples
+        """
+        self.collectors.append((collector, labels))
+
+    def register(self, app: Application, /, path: str, **kwargs: Any) -> None:
+        app.router.add_route("GET", path, self.handle, **kwargs)
+
+    def render(self) -> str:
+        families: Iterable[MetricFamily] = (
+            family for collector, labels in self.collectors for family in collector.collect(labels)
+        )
+        return render_prometheus(families)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.render().encode(), headers={CONTENT_TYPE: PROMETHEUS_CONTENT_TYPE})
+
+    __call__ = handle
+
 
 class BaseRequestHandler(ABC):
     def __init__(
         self,
         dispatcher: Dispatcher,
+        ingestion: Optional[IngestionQueue] = None,
+        dedup: Optional[UpdateDeduplicator] = None,
+        journal: Optional[UpdateJournal] = None,
+        log_updates: float = 0.0,
         **data: Any,
     ) -> None:
         """
@@ -46,23 +122,49 @@ class BaseRequestHandler(ABC):
         and propagate it to the Dispatcher
 
         :param dispatcher: instance of :class:`aio_connect.dispatcher.dispatcher.Dispatcher`
+        :param ingestion: Queue with fixed pool of workers for updates,
+            by default each update is processed in its own task without any limit.
+            :class:`OrderedIngestionQueue` also keeps order of updates within a conversation.
+            Expose its metrics with :meth:`MetricsRequestHandler.add_collector`
+        :param dedup: Drop repeated deliveries of updates, duplicates are answered with 200.
+            Expose its metrics with :meth:`MetricsRequestHandler.add_collector`
+        :param journal: Write updates to the journal on disk before answering the webhook,
+            unprocessed updates are replayed on startup of the application.
+            Register the handler after :func:`setup_application`, so startup handlers of the dispatcher run first
+        :param log_updates: Share of incoming updates logged as is with DEBUG level, 0..1
         """
         self.dispatcher = dispatcher
+        self.ingestion = ingestion
+        self.dedup = dedup
+        self.journal = journal
+        self.log_updates = log_updates
         self.data = data
         self._background_feed_update_tasks: Set[asyncio.Task[Any]] = set()
 
     def register(self, app: Application, /, path: str, **kwargs: Any) -> None:
         """
-        Register route and shutdown callback
+        Register route, startup and shutdown callbacks
 
         :param app: instance of aiohttp Application
         :param path: route path
         :param kwargs:
         """
+        if self.journal is not None:
+            app.on_startup.append(self._handle_startup)
         app.on_shutdown.append(self._handle_close)
         app.router.add_route("POST", path, self.handle, **kwargs)
 
+    async def _handle_startup(self, app: Application) -> None:
+        if self.journal is not None:
+            await self.replay(await self.journal.open())
+
     async def _handle_close(self, app: Application) -> None:
+        if self.ingestion is not None:
+            await self.ingestion.close()
+        if self.journal is not None:
+            await self.journal.close()
+        if self.dedup is not None:
+            await self.dedup.close()
         await self.close()
 
     @abstractmethod
@@ -86,26 +188,137 @@ class BaseRequestHandler(ABC):
         if bot.auth:
             return True
 
-    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
-        result = await self.dispatcher.feed_raw_update(bot=bot, update=update, **self.data)
+    def journal_key(self, bot: Bot) -> str:
+        """
+        Key of the bot in the journal
+        """
+        return str(bot.line_id)
+
+    def resolve_journal_bot(self, key: str) -> Optional[Bot]:
+        """
+        Resolve Bot instance of the replayed update
+
+        :param key: key of the bot in the journal, see :meth:`journal_key`
+        :return: Bot instance or None if the bot is unknown, then the update stays in the journal
+        """
+        return None
+
+    async def replay(self, entries: Iterable[JournalEntry]) -> None:
+        """
+        Process updates which were journaled but not processed before restart
+        """
+        assert self.journal is not None
+        for entry in entries:
+            bot = self.resolve_journal_bot(entry.bot)
+            if bot is None:
+                loggers.webhook.warning("Bot %s of journaled update %d is unknown", entry.bot, entry.id)
+                continue
+            try:
+                update = Update.model_validate(bot.session.json_loads(entry.payload), context={"bot": bot})
+            except ValueError:
+                loggers.webhook.exception("Failed to parse journaled update %d", entry.id)
+                self.journal.ack(entry.id)
+                continue
+            dedup_key = None
+            if self.dedup is not None:
+                dedup_key = update_key(update)
+                if dedup_key is not None:
+                    # Key is claimed before the update is journaled, so a shared storage still has the claim
+                    # of the crashed process. The update is processed anyway, the claim is only renewed
+                    # for storages which did not survive the restart, so redeliveries are dropped
+                    await self.dedup.claim(dedup_key)
+            # Replayed updates can't be rejected, they wait for the queue
+            while not await self._dispatch_update(bot, update, dedup_key=dedup_key, entry_id=entry.id):
+                await asyncio.sleep(0.1)
+
+    async def _background_process_update(
+        self,
+        bot: Bot,
+        update: Update,
+        dedup_key: Optional[str] = None,
+        entry_id: Optional[int] = None,
+    ) -> None:
+        try:
+            result = await self.dispatcher.feed_update(bot=bot, update=update, **self.data)
+        except BaseException as e:
+            if dedup_key is not None and self.dedup is not None:
+                # Next delivery of the update should be processed
+                await self.dedup.release(dedup_key)
+            if entry_id is not None and self.journal is not None and not isinstance(e, asyncio.CancelledError):
+                # Failed update is not replayed, cancelled on shutdown is
+                self.journal.ack(entry_id)
+            raise
+        if entry_id is not None and self.journal is not None:
+            self.journal.ack(entry_id)
         if isinstance(result, ConnectMethod):
             await self.dispatcher.silent_call_request(bot=bot, result=result)
 
+    def _log_update(self, raw: bytes) -> None:
+        rate = self.log_updates
+        if rate and loggers.webhook.isEnabledFor(logging.DEBUG) and (rate >= 1 or random.random() < rate):
+            loggers.webhook.debug("Incoming update: %s", raw.decode(errors="replace"))
+
     async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
-        update = await request.json(loads=bot.session.json_loads)
-        new_update = {'event_type': update["event_type"], 'event_source': update["event_source"],
-                      update["event_type"]: {obj: update[obj] for obj in update if
-                                             obj not in ('event_type', 'event_source')}}
-        print("------")  # Fixme: remove
-        print(new_update)  # Fixme: remove
-        feed_update_task = asyncio.create_task(
-            self._background_feed_update(
-                bot=bot, update=new_update
-            )
+        raw = await request.read()
+        self._log_update(raw)
+        try:
+            # Flat envelope of Connect is unwrapped by the validator of Update, no intermediate dicts
+            update = Update.model_validate(bot.session.json_loads(raw), context={"bot": bot})
+        except ValueError:
+            loggers.webhook.exception("Failed to parse update")
+            return web.Response(body="Bad update", status=400)
+
+        dedup_key = None
+        if self.dedup is not None:
+            dedup_key = update_key(update)
+            if dedup_key is not None and not await self.dedup.claim(dedup_key):
+                # Already received, the answer stops redelivery
+                return web.json_response({}, dumps=bot.session.json_dumps)
+
+        entry_id = None
+        if self.journal is not None:
+            try:
+                # Waits for the group commit, the update is on disk before the answer
+                entry_id = await self.journal.append(self.journal_key(bot), raw)
+            except Exception:
+                loggers.webhook.exception("Failed to journal update")
+                if dedup_key is not None and self.dedup is not None:
+                    await self.dedup.release(dedup_key)
+                return web.Response(body="Journal is unavailable", status=503)
+
+        if not await self._dispatch_update(bot, update, dedup_key=dedup_key, entry_id=entry_id):
+            if dedup_key is not None and self.dedup is not None:
+                await self.dedup.release(dedup_key)
+            if entry_id is not None and self.journal is not None:
+                self.journal.ack(entry_id)
+            headers = None
+            if self.ingestion is not None and self.ingestion.retry_after is not None:
+                headers = {RETRY_AFTER: str(self.ingestion.retry_after)}
+            return web.Response(body="Overloaded", status=503, headers=headers)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _dispatch_update(
+        self,
+        bot: Bot,
+        update: Update,
+        dedup_key: Optional[str] = None,
+        entry_id: Optional[int] = None,
+    ) -> bool:
+        """
+        Start processing of the update in background
+
+        :return: False if the update is rejected by the ingestion queue
+        """
+        job = partial(
+            self._background_process_update, bot=bot, update=update, dedup_key=dedup_key, entry_id=entry_id
         )
+        if self.ingestion is not None:
+            key = conversation_key(update) if self.ingestion.ordered else None
+            return await self.ingestion.submit(job, key=key)
+        feed_update_task = asyncio.create_task(job())
         self._background_feed_update_tasks.add(feed_update_task)
         feed_update_task.add_done_callback(self._background_feed_update_tasks.discard)
-        return web.json_response({}, dumps=bot.session.json_dumps)
+        return True
 
     async def handle(self, request: web.Request) -> web.Response:
         bot = await self.resolve_bot(request)
@@ -144,3 +357,8 @@ class SimpleRequestHandler(BaseRequestHandler):
 
     async def resolve_bot(self, request: web.Request) -> Bot:
         return self.bot
+
+    def resolve_journal_bot(self, key: str) -> Optional[Bot]:
+        if key == self.journal_key(self.bot):
+            return self.bot
+        return None
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional
+
+from .. import loggers
+from ..types import ConnectObject, Update
+from ..utils.metrics import MetricFamily
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+
+def update_key(update: Update) -> Optional[str]:
+    """
+    Identity of the update which is the same for all deliveries of it
+
+    Messages are identified by :code:`message_id`. Other events are identified
+    by event type, action and ids of the changed entity. Connect may report several
+    changes of the same entity with the same action, so digest of the event is added.
+
+    :return: key or None if the update can't be identified
+    """
+    event_type = update.event_type
+    if update.line is not None:
+        return f"line:{update.line.message_id}"
+    event = getattr(update, event_type, None)
+    if not isinstance(event, ConnectObject):
+        return None
+    parts = [event_type, str(getattr(event, "action", ""))]
+    for value in event.__dict__.values():
+        if isinstance(value, ConnectObject):
+            parts.extend(
+                str(item) for name, item in value.__dict__.items() if name.endswith("_id") and item is not None
+            )
+    digest = hashlib.blake2b(event.model_dump_json().encode(), digest_size=8).hexdigest()
+    parts.append(digest)
+    return ":".join(parts)
+
+
+class BaseDedupStorage(ABC):
+    """
+    Base class for storages of processed update keys
+    """
+
+    @abstractmethod
+    async def claim(self, key: str, ttl: float) -> bool:
+        """
+        Atomically remember the key if it is not remembered yet
+
+        :param key: update key
+        :param ttl: time to remember the key, seconds
+        :return: True if the key is new, False if it is a duplicate
+        """
+        pass
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        """
+        Forget the key, so the next delivery of the update is processed
+
+        :param key: update key
+        """
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:  # pragma: no cover
+        """
+        Close storage (database connection, file or etc.)
+        """
+        pass
+
+
+class MemoryDedupStorage(BaseDedupStorage):
+    """
+    In-memory storage of update keys, not shared between processes
+
+    Keys are kept in order of expiration, so expired keys are removed
+    from the head without scanning. When :attr:`maxsize` is reached, the oldest keys are evicted.
+    """
+
+    def __init__(self, maxsize: int = 100000) -> None:
+        """
+
+        :param maxsize: Maximum number of keys
+        """
+        self.maxsize = maxsize
+        self.evicted = 0
+        """Number of keys evicted before expiration"""
+        self._keys: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _expire(self, now: float) -> None:
+        keys = self._keys
+        while keys:
+            key, expires_at = next(iter(keys.items()))
+            if expires_at > now:
+                break
+            del keys[key]
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        self._expire(now)
+        expires_at = self._keys.get(key)
+        if expires_at is not None and expires_at > now:
+            return False
+        self._keys[key] = now + ttl
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+            self.evicted += 1
+        return True
+
+    async def release(self, key: str) -> None:
+        self._keys.pop(key, None)
+
+    async def close(self) -> None:
+        self._keys.clear()
+
+
+class RedisDedupStorage(BaseDedupStorage):
+    """
+    Storage of update keys in Redis, shared by all processes and hosts of the bot
+
+    Claim is a single :code:`SET NX PX` command, so concurrent deliveries
+    of the same update to different processes are processed once.
+    """
+
+    def __init__(self, redis: Redis, prefix: str = "connect:dedup") -> None:
+        """
+
+        :param redis: Instance of :class:`redis.asyncio.Redis`
+        :param prefix: Prefix of keys
+        """
+        self.redis = redis
+        self.prefix = prefix
+
+    def build_key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        result = await self.redis.set(self.build_key(key), 1, nx=True, px=max(1, int(ttl * 1000)))
+        return bool(result)
+
+    async def release(self, key: str) -> None:
+        await self.redis.delete(self.build_key(key))
+
+    async def close(self) -> None:
+        close = getattr(self.redis, "aclose", None) or self.redis.close
+        await close()
+
+
+class UpdateDeduplicator:
+    """
+    Drops repeated deliveries of updates before they reach :meth:`Dispatcher.feed_update`
+
+    Connect delivers the update again when the webhook is answered too slowly,
+    so without deduplication handlers reply twice. The key of the update is claimed
+    when it is received and released if processing fails or the update is rejected,
+    so the next delivery is processed. When the storage is unavailable, updates are processed.
+    """
+
+    def __init__(self, storage: Optional[BaseDedupStorage] = None, ttl: float = 3600.0) -> None:
+        """
+
+        :param storage: Storage of keys, :class:`MemoryDedupStorage` by default.
+            Use a shared storage (:class:`RedisDedupStorage`) when the bot runs in several processes
+        :param ttl: Time to remember processed updates, should exceed the redelivery period of Connect, seconds
+        """
+        self.storage = storage if storage is not None else MemoryDedupStorage()
+        self.ttl = ttl
+        self.hits = 0
+        """Number of duplicates"""
+        self.misses = 0
+        """Number of new updates"""
+        self.released = 0
+        """Number of keys released after failure"""
+        self.errors = 0
+        """Number of storage errors"""
+
+    async def claim(self, key: str) -> bool:
+        """
+        Claim the update
+
+        :param key: key of the update, see :func:`update_key`
+        :return: False if the update is a duplicate
+        """
+        try:
+            claimed = await self.storage.claim(key, self.ttl)
+        except Exception:
+            # Duplicate reply is better than lost update
+            self.errors += 1
+            loggers.webhook.exception("Failed to check update %s for duplicates", key)
+            return True
+        if claimed:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return claimed
+
+    async def release(self, key: str) -> None:
+        """
+        Release the update, so its next delivery is processed
+        """
+        try:
+            await self.storage.release(key)
+        except Exception:
+            self.errors += 1
+            loggers.webhook.exception("Failed to release update %s", key)
+            return
+        self.released += 1
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "released": self.released,
+            "errors": self.errors,
+        }
+
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        labels = dict(labels or {})
+        hits = MetricFamily("connect_dedup_hits_total", "counter", "Repeated deliveries of updates")
+        misses = MetricFamily("connect_dedup_misses_total", "counter", "New updates")
+        released = MetricFamily("connect_dedup_released_total", "counter", "Updates released after failure")
+        errors = MetricFamily("connect_dedup_errors_total", "counter", "Errors of the deduplication storage")
+        hits.add(self.hits, labels)
+        misses.add(self.misses, labels)
+        released.add(self.released, labels)
+        errors.add(self.errors, labels)
+        families: List[MetricFamily] = [hits, misses, released, errors]
+        if isinstance(self.storage, MemoryDedupStorage):
+            keys = MetricFamily("connect_dedup_keys", "gauge", "Remembered update keys")
+            keys.add(len(self.storage), labels)
+            families.append(keys)
+        return families
+
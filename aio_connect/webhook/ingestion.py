@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from .. import loggers
+from ..dispatcher.middlewares.user_context import UserContextMiddleware
+from ..enums import OverloadPolicy
+from ..types import Update
+from ..utils.metrics import Histogram, MetricFamily
+
+Job = Callable[[], Awaitable[Any]]
+
+
+def conversation_key(update: Update) -> Optional[Hashable]:
+    """
+    Conversation of the update, the same as resolved by :class:`UserContextMiddleware`
+
+    :return: (line_id, user_id) or None if the update is not related to a conversation
+    """
+    line_id, user_id, _, _ = UserContextMiddleware.resolve_event_context(event=update)
+    if line_id is None or user_id is None:
+        return None
+    return line_id, user_id
+
+
+class IngestionQueue:
+    """
+    Bounded queue of incoming updates processed by a fixed pool of workers
+
+    Memory and the number of simultaneous handlers don't depend on the size of a burst.
+    When the queue is full, :attr:`policy` decides what happens with a new update:
+    reject it with 503 so Connect delivers it again, hold the webhook request
+    until there is a place in the queue, or drop it.
+    """
+
+    ordered = False
+    """Updates should be submitted with conversation key"""
+
+    def __init__(
+        self,
+        workers: int = 64,
+        max_queue: int = 10000,
+        policy: OverloadPolicy = OverloadPolicy.REJECT,
+        block_timeout: Optional[float] = None,
+        retry_after: Optional[int] = None,
+    ) -> None:
+        """
+
+        :param workers: Number of updates processed simultaneously
+        :param max_queue: Number of updates waiting for a worker
+        :param policy: Behaviour when the queue is full
+        :param block_timeout: With :code:`OverloadPolicy.BLOCK` reject the update after this time, seconds
+        :param retry_after: Retry-After of 503 response, seconds
+        """
+        if workers < 1 or max_queue < 1:
+            raise ValueError("workers and max_queue must be positive")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.policy = OverloadPolicy(policy)
+        self.block_timeout = block_timeout
+        self.retry_after = retry_after
+
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.failed = 0
+        """Number of updates whose processing raised an error"""
+        self.busy = 0
+        """Updates being processed right now"""
+        self.wait_time = Histogram()
+        """Time spent by updates in the queue, seconds"""
+
+        self._queue: Optional[asyncio.Queue[Tuple[float, Job]]] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task[None]] = []
+        self._pending = 0
+        self._overloaded = False
+
+    @property
+    def depth(self) -> int:
+        return self._pending
+
+    def start(self) -> None:
+        """
+        Start workers, called on the first update
+        """
+        if self._workers:
+            return
+        self._create_queue()
+        self._slots = asyncio.Semaphore(self.max_queue)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def _create_queue(self) -> None:
+        self._queue = asyncio.Queue()
+
+    def _put(self, item: Tuple[float, Job], key: Optional[Hashable]) -> None:
+        assert self._queue is not None
+        self._queue.put_nowait(item)
+
+    async def _get(self) -> Tuple[Tuple[float, Job], Any]:
+        """
+        :return: item and token passed to :meth:`_task_done`
+        """
+        assert self._queue is not None
+        return await self._queue.get(), None
+
+    def _task_done(self, token: Any) -> None:
+        pass
+
+    async def submit(self, job: Job, key: Optional[Hashable] = None) -> bool:
+        """
+        Put update processing into the queue
+
+        :param job: Update processing
+        :param key: Conversation of the update, used by :class:`OrderedIngestionQueue`
+        :return: False if the update is rejected and should be answered with 503
+        """
+        self.start()
+        slots = self._slots
+        assert slots is not None and self._idle is not None
+        if slots.locked():
+            if not self._overloaded:
+                # Logged once per overload, not for each update
+                self._overloaded = True
+                loggers.webhook.warning(
+                    "Ingestion queue is full (%d), overload policy: %s", self._pending, self.policy.value
+                )
+            if self.policy is OverloadPolicy.DROP:
+                self.dropped += 1
+                return True
+            if self.policy is OverloadPolicy.REJECT:
+                self.rejected += 1
+                return False
+            try:
+                await asyncio.wait_for(slots.acquire(), timeout=self.block_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return False
+        else:
+            # Never waits, there is a free slot
+            await slots.acquire()
+            if self._overloaded and self._pending <= self.max_queue // 2:
+                self._overloaded = False
+                loggers.webhook.info("Ingestion queue is not full anymore")
+        self._pending += 1
+        self._idle.clear()
+        self._put((time.monotonic(), job), key)
+        self.accepted += 1
+        return True
+
+    async def _work(self) -> None:
+        assert self._slots is not None and self._idle is not None
+        while True:
+            (enqueued_at, job), token = await self._get()
+            self._pending -= 1
+            self._slots.release()
+            self.wait_time.observe(time.monotonic() - enqueued_at)
+            self.busy += 1
+            try:
+                await job()
+            except Exception:
+                self.failed += 1
+                loggers.webhook.exception("Failed to process update")
+            finally:
+                self.busy -= 1
+                self._task_done(token)
+                if not self._pending and not self.busy:
+                    self._idle.set()
+
+    async def close(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Wait for queued updates and stop workers
+
+        :param timeout: Time to wait for queued updates, seconds
+        """
+        if not self._workers:
+            return
+        assert self._idle is not None
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            loggers.webhook.warning("%d updates are not processed on shutdown", self.depth + self.busy)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._pending = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "busy": self.busy,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "wait_p50": self.wait_time.quantile(0.5),
+            "wait_p99": self.wait_time.quantile(0.99),
+        }
+
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        labels = dict(labels or {})
+        depth = MetricFamily("connect_ingestion_queue_depth", "gauge", "Updates waiting for a worker")
+        busy = MetricFamily("connect_ingestion_busy_workers", "gauge", "Updates being processed")
+        updates = MetricFamily("connect_ingestion_updates_total", "counter", "Incoming updates by outcome")
+        wait = MetricFamily("connect_ingestion_wait_seconds", "histogram", "Time spent by updates in the queue")
+        depth.add(self.depth, labels)
+        busy.add(self.busy, labels)
+        for outcome, value in (
+            ("accepted", self.accepted),
+            ("rejected", self.rejected),
+            ("dropped", self.dropped),
+            ("failed", self.failed),
+        ):
+            updates.add(value, {**labels, "outcome": outcome})
+        wait.add_histogram(self.wait_time, labels)
+        return [depth, busy, updates, wait]
+
+
+class OrderedIngestionQueue(IngestionQueue):
+    """
+    Ingestion queue which keeps order of updates within a conversation
+
+    Each conversation (see :func:`conversation_key`) has its own FIFO mailbox
+    and is processed by at most one worker at a time, while different conversations
+    are processed in parallel by all workers. Unlike :class:`SimpleEventIsolation`,
+    waiting updates don't hold tasks or locks. Mailboxes are removed as soon as they are empty.
+    Updates without conversation are processed in any order.
+    """
+
+    ordered = True
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._mailboxes: Dict[Hashable, Deque[Tuple[float, Job]]] = {}
+        self._ready: Optional[asyncio.Queue[Hashable]] = None
+
+    @property
+    def conversations(self) -> int:
+        """
+        Number of conversations with queued or running updates
+        """
+        return len(self._mailboxes)
+
+    def _create_queue(self) -> None:
+        self._ready = asyncio.Queue()
+
+    def _put(self, item: Tuple[float, Job], key: Optional[Hashable]) -> None:
+        assert self._ready is not None
+        if key is None:
+            key = object()
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None:
+            # Conversation is not queued and not processed right now
+            mailbox = self._mailboxes[key] = deque()
+            self._ready.put_nowait(key)
+        mailbox.append(item)
+
+    async def _get(self) -> Tuple[Tuple[float, Job], Any]:
+        assert self._ready is not None
+        key = await self._ready.get()
+        return self._mailboxes[key].popleft(), key
+
+    def _task_done(self, token: Any) -> None:
+        assert self._ready is not None
+        if self._mailboxes[token]:
+            # Next update of the conversation goes behind other conversations
+            self._ready.put_nowait(token)
+        else:
+            del self._mailboxes[token]
+
+    async def close(self, timeout: Optional[float] = 10.0) -> None:
+        await super().close(timeout=timeout)
+        self._mailboxes.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), "conversations": self.conversations}
+
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        families = list(super().collect(labels))
+        conversations = MetricFamily(
+            "connect_ingestion_conversations", "gauge", "Conversations with queued or running updates"
+        )
+        conversations.add(self.conversations, dict(labels or {}))
+        families.append(conversations)
+        return families
@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import suppress
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from .. import loggers
+from ..utils.metrics import Histogram, MetricFamily
+
+COMMIT_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+"""Upper bounds of commit duration histogram buckets, seconds"""
+
+# crc32, size of body, kind, entry id
+_HEADER = struct.Struct("<IIBQ")
+_KIND_APPEND = 1
+_KIND_ACK = 2
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".log"
+
+_fsync = getattr(os, "fdatasync", os.fsync)
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    id: int
+    bot: str
+    """Key of the bot which received the update"""
+    payload: bytes
+    """Update as it was received"""
+
+
+def _encode(kind: int, entry_id: int, body: bytes = b"") -> bytes:
+    crc = zlib.crc32(body, zlib.crc32(struct.pack("<BQ", kind, entry_id)))
+    return _HEADER.pack(crc, len(body), kind, entry_id) + body
+
+
+def _decode(data: bytes) -> Tuple[List[Tuple[int, int, bytes]], int]:
+    """
+    :return: records (kind, id, body) and size of the valid part of data
+    """
+    records = []
+    offset = 0
+    size = len(data)
+    while offset + _HEADER.size <= size:
+        crc, length, kind, entry_id = _HEADER.unpack_from(data, offset)
+        end = offset + _HEADER.size + length
+        if end > size:
+            break
+        body = data[offset + _HEADER.size:end]
+        if zlib.crc32(body, zlib.crc32(struct.pack("<BQ", kind, entry_id))) != crc:
+            break
+        records.append((kind, entry_id, body))
+        offset = end
+    return records, offset
+
+
+class UpdateJournal:
+    """
+    Append-only journal of received updates on local disk
+
+    The webhook is answered after the update is written to the journal, so updates
+    received but not processed before a crash are replayed on the next start.
+    Writes of concurrent requests are committed together by one write and one fsync
+    (group commit), so durability costs one disk flush per batch, not per update.
+
+    The journal is split into segments, a segment is deleted
+    when it is not written anymore and all its updates are processed.
+    Marks of processed updates are not flushed to disk immediately,
+    so a few updates can be processed twice after a crash. Replayed updates are not checked
+    by :class:`UpdateDeduplicator`, it drops only repeated deliveries by Connect.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        segment_size: int = 64 * 1024 * 1024,
+        commit_delay: float = 0.0,
+        fsync: bool = True,
+        reopen_delay: float = 1.0,
+    ) -> None:
+        """
+
+        :param path: Directory of segments
+        :param segment_size: New segment is started after this size, bytes
+        :param commit_delay: Time to collect more updates into the batch, seconds.
+            Batches are collected anyway while the previous one is flushed
+        :param fsync: Flush segments to disk, without it updates survive crash of the process but not of the host
+        :param reopen_delay: Delay between attempts to start a new segment after a failed write, seconds.
+            Updates are not accepted until it is started
+        """
+        self.path = Path(path)
+        self.segment_size = segment_size
+        self.commit_delay = commit_delay
+        self.fsync = fsync
+        self.reopen_delay = reopen_delay
+
+        self.appended = 0
+        self.replayed = 0
+        """Number of updates replayed on start"""
+        self.commits = 0
+        self.commit_time = Histogram(COMMIT_BUCKETS)
+        """Duration of write and flush of batches, seconds"""
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[asyncio.Task[None]] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._buffer = bytearray()
+        self._batch: List[Tuple[int, asyncio.Future[int]]] = []
+        self._next_id = 1
+        self._closing = False
+        self._broken = False
+        """Failed write left a torn record at the end of the current segment"""
+        self._fd: Optional[int] = None
+        self._segment = 0
+        self._segment_bytes = 0
+        self._segment_of: Dict[int, int] = {}
+        """Segment of each unprocessed update"""
+        self._unprocessed: Dict[int, int] = {}
+        """Number of unprocessed updates in each segment"""
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of updates which are not processed yet
+        """
+        return len(self._segment_of)
+
+    @property
+    def segments(self) -> int:
+        return len(self._unprocessed)
+
+    @property
+    def broken(self) -> bool:
+        """
+        Updates are not accepted since a failed write until a new segment is started
+        """
+        return self._broken
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.path / f"{_SEGMENT_PREFIX}{segment:020d}{_SEGMENT_SUFFIX}"
+
+    def _list_segments(self) -> List[int]:
+        segments = []
+        for file in self.path.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"):
+            try:
+                segments.append(int(file.name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]))
+            except ValueError:
+                continue
+        return sorted(segments)
+
+    def _recover(self) -> List[JournalEntry]:
+        entries: Dict[int, JournalEntry] = {}
+        last_segment = 0
+        for segment in self._list_segments():
+            last_segment = segment
+            path = self._segment_path(segment)
+            data = path.read_bytes()
+            records, valid = _decode(data)
+            if valid < len(data):
+                # Torn write of the batch which was not acknowledged
+                loggers.webhook.warning("Journal segment %s is truncated at %d of %d bytes", path, valid, len(data))
+            self._unprocessed[segment] = 0
+            for kind, entry_id, body in records:
+                self._next_id = max(self._next_id, entry_id + 1)
+                if kind == _KIND_APPEND:
+                    bot, _, payload = body.partition(b"\n")
+                    entries[entry_id] = JournalEntry(id=entry_id, bot=bot.decode(), payload=payload)
+                    self._segment_of[entry_id] = segment
+                    self._unprocessed[segment] += 1
+                elif kind == _KIND_ACK and entry_id in entries:
+                    del entries[entry_id]
+                    self._unprocessed[self._segment_of.pop(entry_id)] -= 1
+        self._segment = last_segment
+        self._delete_processed_segments()
+        return sorted(entries.values(), key=lambda entry: entry.id)
+
+    def _create_segment(self, segment: int) -> int:
+        return os.open(self._segment_path(segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    async def _open_segment(self) -> None:
+        segment = self._segment + 1
+        self._fd = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._create_segment, segment
+        )
+        self._segment = segment
+        self._segment_bytes = 0
+        self._unprocessed[segment] = 0
+
+    def _delete_processed_segments(self) -> None:
+        # Segment may have marks of updates from older segments,
+        # so segments are deleted from the oldest one
+        segments = []
+        for segment, count in list(self._unprocessed.items()):
+            if count or segment == self._segment and self._fd is not None:
+                break
+            del self._unprocessed[segment]
+            segments.append(segment)
+        if segments and self._executor is not None:
+            # Deleted by the journal thread after scheduled writes,
+            # segments left by the closed journal are deleted on the next start
+            self._executor.submit(self._unlink_segments, segments)
+
+    def _unlink_segments(self, segments: List[int]) -> None:
+        for segment in segments:
+            try:
+                self._segment_path(segment).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                loggers.webhook.exception("Failed to delete journal segment %d", segment)
+
+    async def open(self) -> List[JournalEntry]:
+        """
+        Start the journal
+
+        :return: Updates which were received but not processed before, in order of receiving.
+            They should be processed and marked with :meth:`ack`
+        """
+        if self._writer is not None:
+            raise RuntimeError("Journal is already opened")
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Writes and flushes are made in order by the single thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="connect-journal")
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(self._executor, self._recover)
+        await self._open_segment()
+        self.replayed += len(entries)
+        if entries:
+            loggers.webhook.info("Journal has %d unprocessed updates", len(entries))
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_batches())
+        return entries
+
+    async def append(self, bot: str, payload: bytes) -> int:
+        """
+        Write the update to the journal
+
+        :param bot: Key of the bot which received the update
+        :param payload: Update as it was received
+        :return: Entry id, returned when the update is on disk
+        """
+        if self._wakeup is None or self._closing:
+            raise RuntimeError("Journal is not opened")
+        if self._broken:
+            raise RuntimeError("Journal is broken by a failed write")
+        entry_id = self._next_id
+        self._next_id += 1
+        self._buffer += _encode(_KIND_APPEND, entry_id, bot.encode() + b"\n" + payload)
+        waiter: asyncio.Future[int] = asyncio.get_running_loop().create_future()
+        self._batch.append((entry_id, waiter))
+        self._wakeup.set()
+        return await waiter
+
+    def ack(self, entry_id: int) -> None:
+        """
+        Mark the update as processed
+        """
+        segment = self._segment_of.pop(entry_id, None)
+        if segment is None:
+            return
+        self._buffer += _encode(_KIND_ACK, entry_id)
+        self._unprocessed[segment] -= 1
+        if not self._unprocessed[segment]:
+            self._delete_processed_segments()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _write(self, data: bytes, sync: bool) -> None:
+        assert self._fd is not None
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        if sync and self.fsync:
+            _fsync(self._fd)
+
+    async def _rotate(self) -> None:
+        previous_fd = self._fd
+        # If the new segment can't be created, writes go on to the current one
+        await self._open_segment()
+        if previous_fd is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, os.close, previous_fd)
+        self._delete_processed_segments()
+
+    def _drop_buffer(self) -> None:
+        # Marks of processed updates are lost, these updates can be replayed after restart
+        self._buffer = bytearray()
+        batch, self._batch = self._batch, []
+        for _, waiter in batch:
+            if not waiter.done():
+                waiter.set_exception(RuntimeError("Journal is broken by a failed write"))
+
+    async def _reopen(self) -> None:
+        assert self._wakeup is not None
+        self._broken = True
+        reopen_at = time.monotonic()
+        while not self._closing:
+            # Records written behind the torn one would be unreadable, nothing is written until a new segment
+            self._drop_buffer()
+            timeout = reopen_at - time.monotonic()
+            if timeout > 0:
+                self._wakeup.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                continue
+            try:
+                await self._rotate()
+            except OSError:
+                loggers.webhook.exception("Failed to start new journal segment")
+                reopen_at = time.monotonic() + self.reopen_delay
+                continue
+            self._broken = False
+            return
+        self._drop_buffer()
+
+    async def _write_batches(self) -> None:
+        assert self._wakeup is not None
+        loop = asyncio.get_running_loop()
+        while self._buffer or not self._closing:
+            if not self._buffer:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if self.commit_delay and not self._closing:
+                await asyncio.sleep(self.commit_delay)
+            data, self._buffer = bytes(self._buffer), bytearray()
+            batch, self._batch = self._batch, []
+            started_at = time.monotonic()
+            try:
+                # Marks of processed updates alone are not worth of flush
+                await loop.run_in_executor(self._executor, self._write, data, bool(batch))
+            except Exception as e:
+                loggers.webhook.exception("Failed to write journal")
+                for _, waiter in batch:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                # Partially written batch ends the segment, otherwise records behind it are unreadable
+                await self._reopen()
+                continue
+            if batch:
+                self.commits += 1
+                self.commit_time.observe(time.monotonic() - started_at)
+            self.appended += len(batch)
+            self._segment_bytes += len(data)
+            for entry_id, waiter in batch:
+                self._segment_of[entry_id] = self._segment
+                self._unprocessed[self._segment] += 1
+                if not waiter.done():
+                    waiter.set_result(entry_id)
+            if self._segment_bytes >= self.segment_size:
+                try:
+                    await self._rotate()
+                except OSError:
+                    loggers.webhook.exception("Failed to start new journal segment")
+
+    async def close(self) -> None:
+        """
+        Write marks of processed updates and close the journal
+        """
+        if self._writer is None or self._wakeup is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._writer
+        self._writer = None
+        self._wakeup = None
+        loop = asyncio.get_running_loop()
+        if self._fd is not None:
+            if self.fsync:
+                await loop.run_in_executor(self._executor, _fsync, self._fd)
+            await loop.run_in_executor(self._executor, os.close, self._fd)
+            self._fd = None
+        assert self._executor is not None
+        self._executor.shutdown()
+        self._executor = None
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "pending": self.pending,
+            "segments": self.segments,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "broken": self.broken,
+            "commits": self.commits,
+            "commit_p50": self.commit_time.quantile(0.5),
+            "commit_p99": self.commit_time.quantile(0.99),
+        }
+
+    def collect(self, labels: Optional[Mapping[str, str]] = None) -> Iterable[MetricFamily]:
+        labels = dict(labels or {})
+        pending = MetricFamily("connect_journal_pending", "gauge", "Journaled updates which are not processed yet")
+        segments = MetricFamily("connect_journal_segments", "gauge", "Segments of the journal on disk")
+        appended = MetricFamily("connect_journal_appended_total", "counter", "Updates written to the journal")
+        replayed = MetricFamily("connect_journal_replayed_total", "counter", "Updates replayed on start")
+        commit = MetricFamily("connect_journal_commit_seconds", "histogram", "Duration of group commits")
+        pending.add(self.pending, labels)
+        segments.add(self.segments, labels)
+        appended.add(self.appended, labels)
+        replayed.add(self.replayed, labels)
+        commit.add_histogram(self.commit_time, labels)
+        return [pending, segments, appended, replayed, commit]
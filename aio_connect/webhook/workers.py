@@ -0,0 +1,447 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import select
+import shutil
+import signal
+import socket
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import aiohttp
+from aiohttp import web
+from aiohttp.abc import Application
+from aiohttp.hdrs import CONTENT_TYPE, RETRY_AFTER
+
+from .. import loggers
+from ..utils.json_backend import get_json_backend
+from .aiohttp_server import BaseRequestHandler, setup_application
+
+FORWARD_PATH = "/update"
+"""Route of forwarded updates on the IPC socket of the worker"""
+
+
+def raw_conversation_key(data: Any) -> Optional[Tuple[str, str]]:
+    """
+    Conversation of the update as it was received, see :func:`conversation_key`
+
+    Works with raw JSON, so the update is not validated twice.
+
+    :return: (line_id, user_id) or None if the update is not related to a conversation
+    """
+    if not isinstance(data, dict) or data.get("event_type") != "line":
+        return None
+    event = data.get("line")
+    if not isinstance(event, dict):
+        # Flat envelope
+        event = data
+    line_id = event.get("line_id")
+    user_id = event.get("user_id")
+    if line_id is None or user_id is None:
+        return None
+    return str(line_id).lower(), str(user_id).lower()
+
+
+def conversation_owner(key: Tuple[str, str], workers: int) -> int:
+    """
+    Worker which owns the conversation, the same in every process
+    """
+    # hash() of str is salted per interpreter, crc32 is not
+    return zlib.crc32(f"{key[0]}:{key[1]}".encode()) % workers
+
+
+def ipc_path(ipc_dir: Union[str, Path], worker: int) -> Path:
+    return Path(ipc_dir) / f"worker-{worker}.sock"
+
+
+class AffinityRequestHandler:
+    """
+    Routes each update to the worker which owns its conversation
+
+    Updates of the conversation are processed by one worker, so FSM data
+    in :class:`MemoryStorage`, :class:`OrderedIngestionQueue` and :class:`MemoryDedupStorage`
+    work as in a single process. Updates of other workers are forwarded through their Unix sockets,
+    the answer of the owner is returned to Connect. Updates without conversation are processed locally.
+    """
+
+    def __init__(
+        self,
+        handler: BaseRequestHandler,
+        worker: int,
+        workers: int,
+        ipc_dir: Union[str, Path],
+        forward_wait: float = 5.0,
+    ) -> None:
+        """
+
+        :param handler: Handler which processes updates owned by this worker
+        :param worker: Index of this worker
+        :param workers: Number of workers
+        :param ipc_dir: Directory of IPC sockets of workers
+        :param forward_wait: Time to wait for the restarting owner, then the update is answered with 503, seconds
+        """
+        self.handler = handler
+        self.worker = worker
+        self.workers = workers
+        self.ipc_dir = Path(ipc_dir)
+        self.forward_wait = forward_wait
+        self.forwarded = 0
+        """Number of updates forwarded to other workers"""
+        self._sessions: Dict[int, aiohttp.ClientSession] = {}
+
+    def ipc_path(self, worker: int) -> Path:
+        return ipc_path(self.ipc_dir, worker)
+
+    def resolve_owner(self, raw: bytes) -> int:
+        try:
+            data = get_json_backend().loads(raw)
+        except ValueError:
+            # Local handler answers with 400
+            return self.worker
+        key = raw_conversation_key(data)
+        if key is None:
+            return self.worker
+        return conversation_owner(key, self.workers)
+
+    def _get_session(self, worker: int) -> aiohttp.ClientSession:
+        session = self._sessions.get(worker)
+        if session is None or session.closed:
+            session = self._sessions[worker] = aiohttp.ClientSession(
+                connector=aiohttp.UnixConnector(path=str(self.ipc_path(worker)))
+            )
+        return session
+
+    async def handle(self, request: web.Request) -> web.Response:
+        raw = await request.read()
+        owner = self.resolve_owner(raw)
+        if owner == self.worker:
+            return await self.handler.handle(request)
+        return await self.forward(owner, raw)
+
+    __call__ = handle
+
+    async def forward(self, owner: int, raw: bytes) -> web.Response:
+        deadline = time.monotonic() + self.forward_wait
+        while True:
+            try:
+                async with self._get_session(owner).post(
+                    f"http://worker-{owner}{FORWARD_PATH}", data=raw, headers={CONTENT_TYPE: "application/json"}
+                ) as response:
+                    body = await response.read()
+                    headers = {CONTENT_TYPE: response.headers.get(CONTENT_TYPE, "application/json")}
+                    if RETRY_AFTER in response.headers:
+                        headers[RETRY_AFTER] = response.headers[RETRY_AFTER]
+                    self.forwarded += 1
+                    return web.Response(body=body, status=response.status, headers=headers)
+            except aiohttp.ClientConnectionError:
+                # Owner is restarting, the update can't be processed here without breaking the order
+                if time.monotonic() >= deadline:
+                    loggers.webhook.warning("Worker %d is unavailable, update is rejected", owner)
+                    return web.Response(body="Worker is unavailable", status=503, headers={RETRY_AFTER: "1"})
+                await asyncio.sleep(0.05)
+
+    async def close(self, *args: Any) -> None:
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    def register(self, app: Application, /, path: str, **kwargs: Any) -> None:
+        """
+        Register public route of the webhook
+
+        :param app: instance of aiohttp Application
+        :param path: route path
+        """
+        app.on_cleanup.append(self.close)
+        app.router.add_route("POST", path, self.handle, **kwargs)
+
+
+class WebhookWorkers:
+    """
+    Serves the webhook by several processes, so processing of updates is not limited by one core
+
+    Every worker is a forked process with its own event loop, dispatcher and bot
+    created by the factory. Workers listen on the same port with :code:`SO_REUSEPORT`,
+    the kernel spreads connections between them, then :class:`AffinityRequestHandler`
+    routes each update to the owner of its conversation.
+
+    The supervisor restarts crashed workers. :code:`SIGHUP` restarts workers one by one:
+    the next worker is stopped only when the previous one is ready, updates of
+    the restarting worker wait for it. :code:`SIGTERM` and :code:`SIGINT` stop all workers.
+
+    >>> def create_handler(worker: int) -> SimpleRequestHandler:
+    ...     bot = Bot(...)
+    ...     journal = UpdateJournal(f"journal/{worker}")
+    ...     return SimpleRequestHandler(dp, bot, ingestion=OrderedIngestionQueue(), journal=journal)
+    >>> WebhookWorkers(create_handler, path="/webhook", port=8080, workers=4).run()
+
+    Metrics of each worker are exposed by the worker, i.e. a scrape gets metrics of a random worker.
+    Journals and other files should be separated by index of the worker.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[int], BaseRequestHandler],
+        path: str,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        workers: Optional[int] = None,
+        ipc_dir: Optional[Union[str, Path]] = None,
+        forward_wait: float = 5.0,
+        ready_timeout: float = 60.0,
+        shutdown_timeout: float = 60.0,
+        respawn_delay: float = 1.0,
+        **kwargs: Any,
+    ) -> None:
+        """
+
+        :param factory: Creates the handler with dispatcher and bot in the worker process, gets index of the worker
+        :param path: Route of the webhook
+        :param host: Host to listen on
+        :param port: Port to listen on
+        :param workers: Number of workers, number of CPUs by default
+        :param ipc_dir: Directory of IPC sockets, temporary directory by default
+        :param forward_wait: Time to wait for the restarting owner of the update, seconds
+        :param ready_timeout: Time to wait for the started worker, seconds
+        :param shutdown_timeout: Time to wait for the stopped worker before it is killed, seconds
+        :param respawn_delay: Delay before a crashed or not ready worker is started again, seconds
+        :param kwargs: Passed to :func:`setup_application`
+        """
+        if not hasattr(socket, "SO_REUSEPORT") or not hasattr(os, "fork"):
+            raise RuntimeError("WebhookWorkers requires fork and SO_REUSEPORT")
+        self.factory = factory
+        self.path = path
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.ipc_dir = Path(ipc_dir) if ipc_dir is not None else None
+        self.forward_wait = forward_wait
+        self.ready_timeout = ready_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.respawn_delay = respawn_delay
+        self.setup_data = kwargs
+        self.pids: Dict[int, int] = {}
+        """Process id of each worker"""
+        self._respawn_at: Dict[int, float] = {}
+        """Time to start again each crashed or not ready worker"""
+        self._restart_requested = False
+        self._stop_requested = False
+
+    # Worker process
+
+    async def _serve(self, worker: int, ready_fd: int) -> None:
+        assert self.ipc_dir is not None
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+
+        handler = self.factory(worker)
+        router = AffinityRequestHandler(
+            handler, worker=worker, workers=self.workers, ipc_dir=self.ipc_dir, forward_wait=self.forward_wait
+        )
+        public_app = web.Application()
+        setup_data = dict(self.setup_data)
+        if getattr(handler, "bot", None) is not None:
+            setup_data.setdefault("bot", getattr(handler, "bot"))
+        setup_application(public_app, handler.dispatcher, **setup_data)
+        router.register(public_app, path=self.path)
+        # Forwarded and local updates are processed by the same handler
+        ipc_app = web.Application()
+        handler.register(ipc_app, path=FORWARD_PATH)
+
+        public_runner = web.AppRunner(public_app, handle_signals=False)
+        # Forwarded updates are already in the access log of the receiving worker
+        ipc_runner = web.AppRunner(ipc_app, handle_signals=False, access_log=None)
+        # Startup of the dispatcher goes before replay of the journal
+        await public_runner.setup()
+        await ipc_runner.setup()
+        path = ipc_path(self.ipc_dir, worker)
+        if path.exists():
+            path.unlink()
+        await web.UnixSite(ipc_runner, str(path)).start()
+        public_site = web.TCPSite(public_runner, self.host, self.port, reuse_port=True)
+        await public_site.start()
+        os.write(ready_fd, b"1")
+        os.close(ready_fd)
+        loggers.webhook.info("Worker %d (pid %d) is ready", worker, os.getpid())
+
+        await stop.wait()
+        loggers.webhook.info("Worker %d is stopping", worker)
+        # New connections go to other workers
+        await public_site.stop()
+        # Queued updates are processed (ingestion queue and journal are drained)
+        # before shutdown of the dispatcher
+        await ipc_runner.cleanup()
+        await public_runner.cleanup()
+
+    def _run_worker(self, worker: int, ready_fd: int) -> None:
+        # Supervisor handles Ctrl+C and stops workers with SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            asyncio.run(self._serve(worker, ready_fd))
+        except BaseException:
+            loggers.webhook.exception("Worker %d failed", worker)
+            code = 1
+        finally:
+            os._exit(code)
+
+    # Supervisor process
+
+    def _spawn(self, worker: int) -> bool:
+        """
+        Start the worker and wait until it is ready
+
+        :return: False if the worker is not ready in time
+        """
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            os.close(ready_r)
+            self._run_worker(worker, ready_w)
+        os.close(ready_w)
+        self.pids[worker] = pid
+        try:
+            readable, _, _ = select.select([ready_r], [], [], self.ready_timeout)
+            ready = bool(readable) and os.read(ready_r, 1) == b"1"
+        finally:
+            os.close(ready_r)
+        if not ready:
+            loggers.webhook.error("Worker %d (pid %d) is not ready in %s s", worker, pid, self.ready_timeout)
+        return ready
+
+    def _wait(self, pid: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                finished, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                return True
+            if finished:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def _stop_worker(self, worker: int) -> None:
+        pid = self.pids.pop(worker, None)
+        if pid is None:
+            return
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        if not self._wait(pid, self.shutdown_timeout):
+            loggers.webhook.warning("Worker %d (pid %d) is killed after %s s", worker, pid, self.shutdown_timeout)
+            os.kill(pid, signal.SIGKILL)
+            self._wait(pid, self.shutdown_timeout)
+
+    def _kill_worker(self, worker: int) -> None:
+        pid = self.pids.pop(worker, None)
+        if pid is None:
+            return
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            return
+        self._wait(pid, self.shutdown_timeout)
+
+    def _start(self, worker: int) -> bool:
+        """
+        Start the worker, the worker which is not ready in time is killed and started again later
+
+        :return: False if the worker is not ready in time
+        """
+        self._respawn_at.pop(worker, None)
+        if self._spawn(worker):
+            return True
+        self._kill_worker(worker)
+        self._respawn_at[worker] = time.monotonic() + self.respawn_delay
+        return False
+
+    def rolling_restart(self) -> None:
+        """
+        Restart workers one by one
+
+        The restart is aborted when a worker is not ready, so the rest of workers keep serving.
+        """
+        loggers.webhook.info("Rolling restart of %d workers", self.workers)
+        for worker in range(self.workers):
+            if self._stop_requested:
+                return
+            self._stop_worker(worker)
+            if not self._start(worker):
+                loggers.webhook.error("Rolling restart is aborted, worker %d is not ready", worker)
+                return
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            for worker, worker_pid in list(self.pids.items()):
+                if worker_pid == pid:
+                    del self.pids[worker]
+                    loggers.webhook.error(
+                        "Worker %d (pid %d) exited with status %d, restarting", worker, pid, status
+                    )
+                    # Started by the supervisor loop, so other workers are reaped meanwhile
+                    self._respawn_at[worker] = time.monotonic() + self.respawn_delay
+
+    def _respawn(self) -> None:
+        now = time.monotonic()
+        for worker, respawn_at in list(self._respawn_at.items()):
+            if respawn_at <= now and not self._stop_requested:
+                self._start(worker)
+
+    def _request_restart(self, *args: Any) -> None:
+        self._restart_requested = True
+
+    def _request_stop(self, *args: Any) -> None:
+        self._stop_requested = True
+
+    def run(self) -> None:
+        """
+        Start workers and supervise them until :code:`SIGTERM` or :code:`SIGINT`
+        """
+        temporary_dir = None
+        if self.ipc_dir is None:
+            temporary_dir = tempfile.mkdtemp(prefix="aio-connect-")
+            self.ipc_dir = Path(temporary_dir)
+        self.ipc_dir.mkdir(parents=True, exist_ok=True)
+        signal.signal(signal.SIGHUP, self._request_restart)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        try:
+            for worker in range(self.workers):
+                self._start(worker)
+            loggers.webhook.info("%d workers are listening on %s:%d", self.workers, self.host, self.port)
+            while not self._stop_requested:
+                if self._restart_requested:
+                    self._restart_requested = False
+                    self.rolling_restart()
+                self._reap()
+                self._respawn()
+                time.sleep(0.2)
+        finally:
+            for worker in list(self.pids):
+                pid = self.pids[worker]
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            for worker in list(self.pids):
+                pid = self.pids.pop(worker)
+                if not self._wait(pid, self.shutdown_timeout):
+                    os.kill(pid, signal.SIGKILL)
+                    self._wait(pid, self.shutdown_timeout)
+            if temporary_dir is not None:
+                shutil.rmtree(temporary_dir, ignore_errors=True)
@@ -0,0 +1,62 @@
+"""
+Decoding of successful responses of get_* methods into typed results
+
+envelope - body is validated through the untyped Response[Any] and the result
+is converted into method.__returning__ by a reused TypeAdapter, as typed results were obtained before
+typed - BaseSession.decode_result validates the body straight into method.__returning__
+
+Bodies are generated by the fake server from __returning__ of each method.
+
+Run from the root of the repository: python -m benchmarks.decode_result
+"""
+import random
+import time
+from typing import Any, Callable, Dict
+
+from aio_connect import Bot
+from aio_connect.client.session.base import _get_result_adapter
+from aio_connect.methods import Response
+from aio_connect.utils.fake_server import FAKE_METHODS, sample_value
+
+ROUNDS = 15
+NUMBER = 50
+LIST_SIZE = 50
+
+bot = Bot("bench", "bench", "00000000-0000-0000-0000-000000000000", "http://localhost")
+session = bot.session
+context = {"bot": bot}
+
+
+def main() -> None:
+    print(f"{'method':26} {'envelope':>9} {'typed':>9}  us per call, {LIST_SIZE} objects per list")
+    for method_type in FAKE_METHODS:
+        if not method_type.__name__.startswith("Get"):
+            continue
+        body = session.json_dumpb(sample_value(method_type.__returning__, random.Random(1), list_size=LIST_SIZE))
+        method = method_type.model_construct()
+        adapter = _get_result_adapter(method_type)
+
+        def envelope() -> Any:
+            result = Response[Any].model_validate(
+                {"ok": True, "result": session.json_loads(body)}, context=context
+            ).result
+            return adapter.validate_python(result, context=context)
+
+        def typed() -> Any:
+            return session.decode_result(bot=bot, method=method, content=body)
+
+        assert envelope() == typed()
+        cases: Dict[str, Callable[[], Any]] = {"envelope": envelope, "typed": typed}
+        best = dict.fromkeys(cases, float("inf"))
+        for _ in range(ROUNDS):
+            # Rounds are interleaved, so both cases see the same noise of the machine
+            for name, case in cases.items():
+                started = time.perf_counter()
+                for _ in range(NUMBER):
+                    case()
+                best[name] = min(best[name], (time.perf_counter() - started) / NUMBER)
+        print(f"{method_type.__name__:26} {best['envelope'] * 1e6:9.1f} {best['typed'] * 1e6:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Encoding of requests in AiohttpSession.make_request
+
+legacy - every call builds the multipart form and dumps the method twice
+(three times for GET and DELETE), as make_request did before
+current - AiohttpSession.build_request_kwargs encodes the method once for the verb it uses
+
+Encoding alone is measured first, then requests to the fake server with both encodings.
+
+Run from the root of the repository: python -m benchmarks.encode_request
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aio_connect import Bot
+from aio_connect.client.session.aiohttp import AiohttpSession
+from aio_connect.methods import ConnectMethod, GetLines, SendMessageLine
+from aio_connect.methods.base import ConnectType
+from aio_connect.utils.fake_server import FakeConnectServer
+
+ROUNDS = 7
+NUMBER = 2000
+REQUESTS = 400
+
+
+class LegacySession(AiohttpSession):
+    def build_request_kwargs(
+        self, bot: Bot, method: ConnectMethod[ConnectType], type_request: str
+    ) -> Dict[str, Any]:
+        form = self.build_form_data(bot=bot, method=method)
+        json_data = method.model_dump()
+        if type_request == "POST-With-Attach":
+            return {"data": form}
+        if type_request in ("GET", "DELETE"):
+            return {"params": method.model_dump(exclude_none=True)}
+        # aiohttp serialized json= with the stdlib
+        return {"data": json.dumps(json_data).encode(), "headers": {"Content-Type": "application/json"}}
+
+
+async def bench(cases: Dict[str, Callable[[], Awaitable[Any]]], number: int) -> Dict[str, float]:
+    best = dict.fromkeys(cases, float("inf"))
+    for _ in range(ROUNDS):
+        # Rounds are interleaved, so all cases see the same noise of the machine
+        for name, case in cases.items():
+            started = time.perf_counter()
+            await case()
+            best[name] = min(best[name], (time.perf_counter() - started) / number)
+    return best
+
+
+async def main() -> None:
+    line_id = str(uuid.uuid4())
+    user_id = str(uuid.uuid4())
+    methods: Dict[str, Tuple[ConnectMethod[Any], str]] = {
+        "send_message_line": (SendMessageLine(line_id=line_id, user_id=user_id, text="hello"), "POST"),
+        "get_lines": (GetLines(), "GET"),
+    }
+
+    async with FakeConnectServer() as server:
+        sessions = {"legacy": LegacySession(), "current": AiohttpSession()}
+        bots = {
+            name: Bot(server.login, server.password, line_id, server.base, session=session)
+            for name, session in sessions.items()
+        }
+
+        print(f"{'':26} {'legacy':>9} {'current':>9}")
+        for title, (method, type_request) in methods.items():
+
+            def encode(name: str) -> Callable[[], Awaitable[None]]:
+                async def run() -> None:
+                    for _ in range(NUMBER):
+                        sessions[name].build_request_kwargs(bots[name], method, type_request)
+
+                return run
+
+            encoding = await bench({name: encode(name) for name in sessions}, NUMBER)
+            print(f"{title + ' encode':26} {encoding['legacy'] * 1e6:9.2f} {encoding['current'] * 1e6:9.2f}  us")
+
+            def call(name: str) -> Callable[[], Awaitable[None]]:
+                async def run() -> None:
+                    bot = bots[name]
+                    for _ in range(REQUESTS):
+                        if type_request == "GET":
+                            await bot.get_lines()
+                        else:
+                            await bot.send_message_line(user_id=user_id, text="hello", line_id=line_id)
+
+                return run
+
+            requests = await bench({name: call(name) for name in sessions}, REQUESTS)
+            print(f"{title + ' request':26} {requests['legacy'] * 1e6:9.2f} {requests['current'] * 1e6:9.2f}  us")
+
+        for session in sessions.values():
+            await session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
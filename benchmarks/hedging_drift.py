@@ -0,0 +1,63 @@
+"""
+Drift of the hedging delay under a latency tail
+
+The fake server answers get_lines with log-normal latency and rare slow spikes. The hedging delay
+should stay near the configured percentile of the real latency. Calls won by the hedge are recorded
+with the elapsed time of the cancelled primary request, a lower bound of its latency. If they were
+recorded with the latency of the hedge, slow samples would leave the window and the delay would
+drift down to the body of the distribution.
+
+Run from the root of the repository: python -m benchmarks.hedging_drift
+"""
+import asyncio
+import random
+import uuid
+
+from aio_connect import Bot
+from aio_connect.client.session.aiohttp import AiohttpSession
+from aio_connect.client.session.middlewares.hedging import HedgingMiddleware
+from aio_connect.methods import GetLines
+from aio_connect.utils.fake_server import FakeConnectServer, Latency
+
+LATENCY = Latency(median=0.01, sigma=0.3, spike_rate=0.07, spike=0.1)
+PERCENTILE = 0.95
+BLOCKS = 10
+CALLS = 400
+CONCURRENCY = 20
+
+
+def true_percentile() -> float:
+    rng = random.Random(0)
+    samples = sorted(LATENCY.sample(rng) for _ in range(100000))
+    return samples[int(PERCENTILE * len(samples))]
+
+
+async def main() -> None:
+    hedging = HedgingMiddleware(percentile=PERCENTILE, min_delay=0.005)
+    endpoint = GetLines.__api_path__
+    print(f"p{PERCENTILE * 100:g} of server latency: {true_percentile() * 1000:.1f} ms")
+    print(f"{'calls':>6} {'delay ms':>9} {'hedged':>7} {'budget exhausted':>17}")
+    async with FakeConnectServer(latency=LATENCY, seed=1) as server:
+        bot = Bot(
+            server.login, server.password, str(uuid.uuid4()), server.base,
+            session=AiohttpSession(coalesce_requests=False),
+        )
+        bot.session.middleware(hedging)
+
+        async def worker() -> None:
+            for _ in range(CALLS // CONCURRENCY):
+                await bot.get_lines()
+
+        for block in range(1, BLOCKS + 1):
+            await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+            stats = hedging.stats[endpoint]
+            delay = hedging.trackers[endpoint].delay
+            print(
+                f"{block * CALLS:6} {(delay or 0) * 1000:9.1f} {stats.hedged / stats.calls:7.1%} "
+                f"{stats.budget_exhausted / stats.calls:17.1%}"
+            )
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+JSON backends on realistic payloads
+
+Codecs - loads and dumpb of each installed backend on a webhook Update body and a TicketShort
+response body (generated by the fake server). Requests - get_ticket against the fake server
+by sessions with each installed backend, response body is decoded from bytes.
+
+Run from the root of the repository: python -m benchmarks.json_backend
+"""
+import asyncio
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List
+
+from aio_connect import Bot
+from aio_connect.client.session.aiohttp import AiohttpSession
+from aio_connect.methods import GetTicket
+from aio_connect.utils.fake_server import FakeConnectServer, sample_value
+from aio_connect.utils.json_backend import (
+    JsonBackend,
+    OrjsonBackend,
+    StdlibJsonBackend,
+    UjsonBackend,
+)
+
+ROUNDS = 7
+NUMBER = 5000
+REQUESTS = 400
+
+UPDATE = {
+    "event_type": "line",
+    "event_source": "bot",
+    "message_id": str(uuid.uuid4()),
+    "message_type": 1,
+    "message_time": "2024-01-01T00:00:00",
+    "line_id": str(uuid.uuid4()),
+    "user_id": str(uuid.uuid4()),
+    "author_id": str(uuid.uuid4()),
+    "treatment_id": str(uuid.uuid4()),
+    "text": "Здравствуйте, у меня вопрос по 1С" * 3,
+}
+TICKET = sample_value(GetTicket.__returning__, random.Random(1))
+
+
+def installed_backends() -> List[JsonBackend]:
+    backends: List[JsonBackend] = [StdlibJsonBackend()]
+    for backend in (OrjsonBackend, UjsonBackend):
+        try:
+            backends.append(backend())
+        except ImportError:
+            continue
+    return backends
+
+
+def bench(cases: Dict[str, Callable[[], Any]]) -> Dict[str, float]:
+    best = dict.fromkeys(cases, float("inf"))
+    for _ in range(ROUNDS):
+        # Rounds are interleaved, so all cases see the same noise of the machine
+        for name, case in cases.items():
+            started = time.perf_counter()
+            for _ in range(NUMBER):
+                case()
+            best[name] = min(best[name], (time.perf_counter() - started) / NUMBER)
+    return best
+
+
+async def bench_requests(cases: Dict[str, Callable[[], Awaitable[Any]]]) -> Dict[str, float]:
+    best = dict.fromkeys(cases, float("inf"))
+    for _ in range(ROUNDS):
+        for name, case in cases.items():
+            started = time.perf_counter()
+            for _ in range(REQUESTS):
+                await case()
+            best[name] = min(best[name], (time.perf_counter() - started) / REQUESTS)
+    return best
+
+
+async def main() -> None:
+    backends = installed_backends()
+    print(f"{'payload':12} {'backend':8} {'loads':>9} {'dumpb':>9}  us")
+    for title, payload in (("Update", UPDATE), ("TicketShort", TICKET)):
+        encoded = {backend.name: backend.dumpb(payload) for backend in backends}
+        cases: Dict[str, Callable[[], Any]] = {}
+        for backend in backends:
+            cases[f"{backend.name} loads"] = lambda b=backend: b.loads(encoded[b.name])
+            cases[f"{backend.name} dumpb"] = lambda b=backend: b.dumpb(payload)
+        best = bench(cases)
+        for backend in backends:
+            loads, dumpb = best[f"{backend.name} loads"], best[f"{backend.name} dumpb"]
+            print(f"{title:12} {backend.name:8} {loads * 1e6:9.2f} {dumpb * 1e6:9.2f}")
+
+    ticket_id = str(uuid.uuid4())
+    async with FakeConnectServer() as server:
+        bots = {
+            backend.name: Bot(
+                server.login, server.password, str(uuid.uuid4()), server.base,
+                session=AiohttpSession(json_backend=backend, coalesce_requests=False),
+            )
+            for backend in backends
+        }
+        best = await bench_requests({name: lambda b=bot: b.get_ticket(id=ticket_id) for name, bot in bots.items()})
+        for bot in bots.values():
+            await bot.session.close()
+    for name, value in best.items():
+        print(f"get_ticket request, {name:8} {value * 1e6:9.2f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
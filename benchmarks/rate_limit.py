@@ -0,0 +1,82 @@
+"""
+Overhead of RateLimitMiddleware when limits are not hit
+
+middleware - RateLimitMiddleware.__call__ with all four scopes and a request which returns at once
+plain / limited - Bot.send_message_line against the fake server without and with the middleware
+
+Run from the root of the repository: python -m benchmarks.rate_limit
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict
+
+from aio_connect import Bot
+from aio_connect.client.session.middlewares.rate_limit import Rate, RateLimitMiddleware
+from aio_connect.methods import SendMessageLine
+from aio_connect.utils.fake_server import FakeConnectServer
+
+ROUNDS = 7
+NUMBER = 500
+CONCURRENCY = 8
+
+UNREACHABLE = Rate(limit=10**9)
+
+
+def build_middleware() -> RateLimitMiddleware:
+    return RateLimitMiddleware(
+        global_rate=UNREACHABLE, line_rate=UNREACHABLE, endpoint_rate=UNREACHABLE, user_rate=UNREACHABLE
+    )
+
+
+async def bench(cases: Dict[str, Callable[[], Awaitable[Any]]], number: int) -> Dict[str, float]:
+    best = dict.fromkeys(cases, float("inf"))
+    for _ in range(ROUNDS):
+        # Rounds are interleaved, so all cases see the same noise of the machine
+        for name, case in cases.items():
+            started = time.perf_counter()
+            await case()
+            best[name] = min(best[name], (time.perf_counter() - started) / number)
+    return best
+
+
+async def main() -> None:
+    line_id = str(uuid.uuid4())
+    user_id = str(uuid.uuid4())
+    middleware = build_middleware()
+    method = SendMessageLine(line_id=line_id, user_id=user_id, text="hello")
+
+    async def make_request(bot: Bot, method: Any) -> Any:
+        return None
+
+    async with FakeConnectServer() as server:
+        plain = Bot(server.login, server.password, line_id, server.base)
+        limited = Bot(server.login, server.password, line_id, server.base)
+        limited.session.middleware(build_middleware())
+
+        async def calls() -> None:
+            for _ in range(NUMBER * 100):
+                await middleware(make_request, plain, method)
+
+        def send(bot: Bot) -> Callable[[], Awaitable[Any]]:
+            async def worker() -> None:
+                for _ in range(NUMBER // CONCURRENCY):
+                    await bot.send_message_line(user_id=user_id, text="hello", line_id=line_id)
+
+            async def run() -> None:
+                await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+
+            return run
+
+        overhead = await bench({"middleware": calls}, NUMBER * 100)
+        requests = await bench({"plain": send(plain), "limited": send(limited)}, NUMBER // CONCURRENCY * CONCURRENCY)
+        await plain.session.close()
+        await limited.session.close()
+
+    print(f"middleware: {overhead['middleware'] * 1e6:7.2f} us per call")
+    print(f"     plain: {requests['plain'] * 1e6:7.2f} us per request")
+    print(f"   limited: {requests['limited'] * 1e6:7.2f} us per request")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
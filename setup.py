@@ -22,6 +22,9 @@ setup(
         'aiohttp~=3.9.0',
         'pydantic>=2.4.1,<2.6'
     ],
+    extras_require={
+        'fast': ['orjson>=3.8'],
+    },
     classifiers=[
         "License :: OSI Approved :: MIT License",
         "Development Status :: 5 - Production/Stable",
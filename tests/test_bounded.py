@@ -0,0 +1,69 @@
+import asyncio
+from typing import AsyncIterator, List
+
+import pytest
+
+from aio_connect.utils.bounded import bounded_map
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+async def endless() -> AsyncIterator[int]:
+    index = 0
+    while True:
+        yield index
+        index += 1
+
+
+def test_results():
+    async def main() -> List[int]:
+        async def double(item: int) -> int:
+            await asyncio.sleep(0)
+            return item * 2
+
+        return [result async for result in bounded_map(range(100), double, 4)]
+
+    assert sorted(run(main())) == [item * 2 for item in range(100)]
+
+
+def test_early_stop_cancels_workers():
+    async def main() -> None:
+        before = asyncio.all_tasks()
+        started = []
+
+        async def echo(item: int) -> int:
+            started.append(item)
+            return item
+
+        results = bounded_map(endless(), echo, 4)
+        async for _ in results:
+            # Let workers fill both queues before the iteration is stopped
+            await asyncio.sleep(0.01)
+            break
+        await results.aclose()
+        count = len(started)
+        await asyncio.sleep(0.01)
+        assert len(started) == count
+        assert asyncio.all_tasks() == before
+
+    run(main())
+
+
+def test_error_cancels_workers():
+    async def main() -> None:
+        before = asyncio.all_tasks()
+
+        async def fail(item: int) -> int:
+            if item == 5:
+                raise ValueError(item)
+            await asyncio.sleep(0.01)
+            return item
+
+        with pytest.raises(ValueError):
+            async for _ in bounded_map(endless(), fail, 10):
+                pass
+        assert asyncio.all_tasks() == before
+
+    run(main())
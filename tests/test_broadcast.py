@@ -0,0 +1,24 @@
+import asyncio
+from typing import List
+
+from aio_connect.utils.broadcast import Broadcaster, BroadcastResult, Recipient
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_progress_is_reset_for_each_run():
+    async def main() -> None:
+        async def send(recipient: Recipient) -> None:
+            await asyncio.sleep(0)
+
+        broadcaster = Broadcaster(None, rate=None)  # type: ignore[arg-type]
+        recipients = [(str(index), str(index)) for index in range(10)]
+        for _ in range(2):
+            results: List[BroadcastResult] = await broadcaster.broadcast_all(recipients, send)
+            assert len(results) == 10
+            assert broadcaster.progress.total == 10
+            assert broadcaster.progress.sent == 10
+
+    run(main())
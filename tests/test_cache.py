@@ -0,0 +1,73 @@
+import asyncio
+import uuid
+from typing import Any, Dict
+
+from aio_connect import Bot
+from aio_connect.client.cache.memory import MemoryCache
+from aio_connect.dispatcher.middlewares.cache import CacheInvalidationMiddleware
+from aio_connect.methods import GetCompetences
+from aio_connect.types import Update
+from aio_connect.utils.fake_server import FakeConnectServer
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_cached_result_is_not_shared():
+    async def main() -> None:
+        async with FakeConnectServer() as server:
+            bot = Bot(server.login, server.password, str(uuid.uuid4()), server.base, cache=MemoryCache())
+            first = await bot.get_competences()
+            first.clear()
+            second = await bot.get_competences()
+            third = await bot.get_competences()
+            await bot.session.close()
+        assert server.stats.requests[GetCompetences.__name__] == 1
+        assert second and second == third
+        assert all(a is not b for a, b in zip(second, third))
+        assert second[0].bot is bot
+
+    run(main())
+
+
+def test_invalidation_by_line():
+    async def main() -> None:
+        changed, other = str(uuid.uuid4()), str(uuid.uuid4())
+        cache = MemoryCache()
+        methods = {
+            "changed": GetCompetences(line_id=changed),
+            "other": GetCompetences(line_id=other),
+            "all": GetCompetences(),
+        }
+        for method in methods.values():
+            await cache.set(cache.build_key(method, method.api_path), [], 60)
+
+        bot = Bot("login", "password", str(uuid.uuid4()), "http://localhost", cache=cache)
+        update = Update.model_validate(
+            {
+                "event_type": "competence",
+                "event_source": "bot",
+                "competence": {
+                    "action": "update",
+                    "competence": {
+                        "line_id": changed,
+                        "specialist_id": str(uuid.uuid4()),
+                        "pool_priority": 1,
+                        "is_franch_spec": False,
+                    },
+                },
+            }
+        )
+
+        async def handler(event: Any, data: Dict[str, Any]) -> None:
+            pass
+
+        await CacheInvalidationMiddleware()(handler, update, {"bot": bot})
+        cached = {
+            name: await cache.get(cache.build_key(method, method.api_path)) for name, method in methods.items()
+        }
+        await bot.session.close()
+        assert cached == {"changed": None, "other": [], "all": None}
+
+    run(main())
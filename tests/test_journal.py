@@ -0,0 +1,53 @@
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from aio_connect.webhook.journal import UpdateJournal
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_failed_write_breaks_journal_until_new_segment(tmp_path: Path):
+    async def main() -> None:
+        journal = UpdateJournal(tmp_path, reopen_delay=0.05)
+        await journal.open()
+        written = [await journal.append("bot", b"before")]
+
+        create_segment, write = journal._create_segment, journal._write
+
+        def torn_write(data: bytes, sync: bool) -> None:
+            # Half of the batch reaches the disk
+            assert journal._fd is not None
+            os.write(journal._fd, data[: len(data) // 2])
+            raise OSError(28, "No space left on device")
+
+        def fail_create(segment: int) -> int:
+            raise OSError(28, "No space left on device")
+
+        journal._write = torn_write  # type: ignore[method-assign]
+        journal._create_segment = fail_create  # type: ignore[method-assign]
+        with pytest.raises(OSError):
+            await journal.append("bot", b"torn")
+        journal._write = write  # type: ignore[method-assign]
+
+        assert journal.broken
+        with pytest.raises(RuntimeError):
+            await journal.append("bot", b"rejected")
+
+        journal._create_segment = create_segment  # type: ignore[method-assign]
+        while journal.broken:
+            await asyncio.sleep(0.01)
+        written.append(await journal.append("bot", b"after"))
+        await journal.close()
+
+        journal = UpdateJournal(tmp_path)
+        entries = await journal.open()
+        await journal.close()
+        assert [entry.id for entry in entries] == written
+        assert [entry.payload for entry in entries] == [b"before", b"after"]
+
+    run(main())
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from aio_connect.client.session.priority import PriorityLanes
+from aio_connect.enums import RequestPriority
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_waiter_cancelled_before_release():
+    async def main() -> None:
+        lanes = PriorityLanes(limit=1, reserved={})
+        await lanes.acquire(RequestPriority.BULK)
+        waiting = asyncio.create_task(lanes.acquire(RequestPriority.BULK))
+        await asyncio.sleep(0)
+        assert lanes.stats[RequestPriority.BULK].waiting == 1
+
+        # Slot is released after cancellation, before the waiting task resumes
+        waiting.cancel()
+        lanes.release(RequestPriority.BULK)
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        stats = lanes.stats[RequestPriority.BULK]
+        assert (stats.waiting, stats.in_use) == (0, 0)
+        await lanes.acquire(RequestPriority.BULK)
+        assert stats.in_use == 1
+
+    run(main())
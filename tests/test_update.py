@@ -0,0 +1,44 @@
+import uuid
+
+from aio_connect.types import Update
+
+LINE_ID = str(uuid.uuid4())
+COMPETENCE = {
+    "line_id": LINE_ID,
+    "specialist_id": str(uuid.uuid4()),
+    "pool_priority": 1,
+    "is_franch_spec": False,
+}
+
+
+def test_flat_line_event():
+    update = Update.model_validate(
+        {
+            "event_type": "line",
+            "event_source": "bot",
+            "message_id": str(uuid.uuid4()),
+            "message_type": 1,
+            "message_time": "2024-01-01T00:00:00",
+            "line_id": LINE_ID,
+            "user_id": str(uuid.uuid4()),
+            "text": "hello",
+        }
+    )
+    assert update.line is not None
+    assert update.line.text == "hello"
+
+
+def test_flat_event_with_field_named_as_event_type():
+    update = Update.model_validate(
+        {"event_type": "competence", "event_source": "bot", "action": "add", "competence": COMPETENCE}
+    )
+    assert update.competence is not None
+    assert update.competence.action == "add"
+    assert update.competence.competence.line_id == LINE_ID
+
+
+def test_nested_form():
+    update = Update.model_validate(
+        {"event_type": "competence", "event_source": "bot", "action": "add", "competence": COMPETENCE}
+    )
+    assert Update.model_validate(update.model_dump()) == update
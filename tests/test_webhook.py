@@ -0,0 +1,80 @@
+import asyncio
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from aio_connect import Bot, Dispatcher
+from aio_connect.webhook.aiohttp_server import SimpleRequestHandler
+from aio_connect.webhook.dedup import MemoryDedupStorage, UpdateDeduplicator
+from aio_connect.webhook.journal import UpdateJournal
+
+LINE_ID = str(uuid.uuid4())
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def build_update(text: str) -> Dict[str, Any]:
+    return {
+        "event_type": "line",
+        "event_source": "bot",
+        "message_id": str(uuid.uuid4()),
+        "message_type": 1,
+        "message_time": "2024-01-01T00:00:00",
+        "line_id": LINE_ID,
+        "user_id": str(uuid.uuid4()),
+        "text": text,
+    }
+
+
+def test_replay_after_crash_with_persistent_dedup(tmp_path: Path):
+    async def main() -> None:
+        bot = Bot("login", "password", LINE_ID, "http://localhost")
+        storage = MemoryDedupStorage()
+
+        # Handlers of the first process never finish, it crashes with updates in the journal
+        crashed = Dispatcher()
+
+        @crashed.line()
+        async def hang(event: Any) -> None:
+            await asyncio.Event().wait()
+
+        handler = SimpleRequestHandler(
+            crashed, bot, dedup=UpdateDeduplicator(storage), journal=UpdateJournal(tmp_path / "journal")
+        )
+        app = web.Application()
+        handler.register(app, path="/webhook")
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        for index in range(3):
+            response = await client.post("/webhook", json=build_update(str(index)))
+            assert response.status == 200
+
+        # Claims survive the crash like keys in Redis
+        survived = MemoryDedupStorage()
+        survived._keys = storage._keys.copy()
+
+        processed: List[str] = []
+        restarted = Dispatcher()
+
+        @restarted.line()
+        async def record(event: Any) -> None:
+            processed.append(event.text)
+
+        journal = UpdateJournal(tmp_path / "journal")
+        replaying = SimpleRequestHandler(restarted, bot, dedup=UpdateDeduplicator(survived), journal=journal)
+        await replaying.replay(await journal.open())
+        while len(processed) < 3:
+            await asyncio.sleep(0.01)
+        assert sorted(processed) == ["0", "1", "2"]
+        assert journal.pending == 0
+
+        await journal.close()
+        await client.close()
+        await bot.session.close()
+
+    run(main())